@@ -0,0 +1,95 @@
+"""
+Shared setup for the benchmark scripts.
+
+Benchmarks run against a throwaway database file in the temp directory, never
+against db.sqlite3. Run them from the project directory as modules, e.g.
+
+    python -m benchmarks.search --sizes 10000 100000
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+WORDS = [
+    'yoga', 'pilates', 'stretch', 'core', 'cardio', 'hiit', 'strength', 'mobility', 'running', 'cycling',
+    'boxing', 'dance', 'barre', 'balance', 'flexibility', 'warmup', 'cooldown', 'beginner', 'advanced',
+    'morning', 'evening', 'quick', 'full', 'body', 'legs', 'arms', 'back', 'shoulders', 'neck', 'hips',
+    'abs', 'glutes', 'recovery', 'breathing', 'meditation', 'tabata', 'kettlebell', 'dumbbell', 'bodyweight',
+]
+
+
+def setup_django(name='benchmark'):
+    """ Configure Django and create a fresh, migrated database to benchmark against """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()   # allows the test client's hosts, keeps outgoing email in memory
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tempfile.gettempdir(), f'video_{name}.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def teardown_django():
+    from django.db import connection
+    connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+def generate_videos(count, start=0, batch_size=5000, seed=None):
+    """ Insert `count` synthetic videos numbered from `start`, in batches, without Video.save() """
+    from django.db import transaction
+    from video_collection.models import Video
+
+    rng = random.Random(start if seed is None else seed)
+
+    with transaction.atomic():
+        for batch_start in range(start, start + count, batch_size):
+            batch = []
+            for n in range(batch_start, min(batch_start + batch_size, start + count)):
+                name = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+                notes = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 20)))
+                video_id = f'b{n:010d}'
+                batch.append(Video(name=f'{name} {n}', notes=notes, video_id=video_id,
+                    url=f'https://www.youtube.com/watch?v={video_id}'))
+            Video.objects.bulk_create(batch)
+
+
+def grow_to(count):
+    """ Add synthetic videos until the table holds `count` """
+    from video_collection.models import Video
+    existing = Video.objects.count()
+    if existing < count:
+        generate_videos(count - existing, start=existing)
+
+
+def timed(func, repeat=5):
+    """ Call func `repeat` times, return (median milliseconds, last result) """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+
+def percentile(values, percent):
+    """ The `percent`th percentile of values, nearest rank """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
@@ -0,0 +1,170 @@
+"""
+Concurrent reads and writes against one SQLite file, the way several server
+processes share db.sqlite3.
+
+Reader processes request the video list, video pages and the API while
+writer processes add, import and delete videos, all through the test
+client, for --seconds. Any request that fails, "database is locked" above
+all, is counted, and if any did this exits with status 1.
+
+    python -m benchmarks.concurrency --readers 8 --writers 4 --seconds 20
+    python -m benchmarks.concurrency --baseline
+
+--baseline runs Django's own SQLite backend with its defaults, no WAL,
+pragmas or BEGIN IMMEDIATE, to compare against the settings.DATABASES
+profile.
+"""
+
+import argparse
+import collections
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from benchmarks.common import PROJECT_DIR, setup_django, teardown_django, grow_to, percentile
+
+
+# the API token of the writers' bulk imports
+API_TOKEN = 'benchmark'
+
+
+def reader(number, seconds, results):
+    from django.test import Client
+    from django.urls import reverse
+    from video_collection.models import Video
+
+    client = Client()
+    rng = random.Random(number)
+    pks = list(Video.objects.values_list('pk', flat=True)[:1000])
+    pages = [
+        lambda: client.get(reverse('video_list')),
+        lambda: client.get(reverse('video_list'), {'search_term': 'yoga'}),
+        lambda: client.get(reverse('video_info', kwargs={'video_pk': rng.choice(pks)})),
+        lambda: client.get(reverse('api_videos')),
+    ]
+    run('read', lambda: rng.choice(pages)(), seconds, results)
+
+
+def writer(number, seconds, results):
+    from django.test import Client
+    from django.urls import reverse
+    from video_collection.models import Video
+
+    client = Client()
+    video_ids = (f'w{number}x{n}' for n in itertools.count())
+    added = []
+
+    def new_video():
+        video_id = next(video_ids)
+        return {'name': f'Concurrency {video_id}', 'url': f'https://www.youtube.com/watch?v={video_id}',
+            'notes': 'added by the benchmark'}
+
+    def add():
+        data = new_video()
+        response = client.post(reverse('add_video'), data)
+        if response.status_code == 302:
+            added.append(data['url'])
+        return response
+
+    def bulk_import():
+        # the import reads which videos exist, then inserts, in one transaction
+        data = [new_video() for _ in range(3)]
+        response = client.post(reverse('api_bulk_create'), data, content_type='application/json',
+            headers={'Authorization': f'Bearer {API_TOKEN}'})
+        if response.status_code == 201:
+            added.extend(video['url'] for video in data)
+        return response
+
+    def delete():
+        if not added:   # the writes before failed
+            return add()
+        pk = Video.objects.filter(url=added.pop(0)).values_list('pk', flat=True).get()
+        return client.post(reverse('delete_video', kwargs={'video_pk': pk}))
+
+    writes = itertools.cycle([add, bulk_import, delete, delete, delete, delete])
+    run('write', lambda: next(writes)(), seconds, results)
+
+
+def run(kind, request, seconds, results):
+    """ Make requests for `seconds`, put (kind, timings in ms, errors) on the results queue """
+    from django.db import connections
+    from django.test.utils import override_settings
+
+    timings = []
+    errors = collections.Counter()
+    with override_settings(VIDEO_CACHE_TIMEOUT=0, VIDEO_API_TOKEN=API_TOKEN):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            start = time.perf_counter()
+            try:
+                response = request()
+                if response.status_code >= 400:
+                    errors[f'status {response.status_code}'] += 1
+            except Exception as e:
+                errors[f'{type(e).__name__}: {e}'] += 1
+            timings.append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+    results.put((kind, timings, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--baseline', action='store_true', help="Django's SQLite backend with its defaults")
+    args = parser.parse_args()
+
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
+    if args.baseline:
+        from django.conf import settings
+        settings.DATABASES['default'].update(ENGINE='django.db.backends.sqlite3', CONN_MAX_AGE=0, OPTIONS={})
+
+    setup_django('concurrency')
+    from django.db import connection
+
+    try:
+        grow_to(args.rows)
+        connection.close()   # each process opens its own
+
+        # forked, so the children share the test database settings
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [context.Process(target=reader, args=(n, args.seconds, results)) for n in range(args.readers)]
+        processes += [context.Process(target=writer, args=(n, args.seconds, results)) for n in range(args.writers)]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        teardown_django()
+
+    timings = collections.defaultdict(list)
+    errors = collections.Counter()
+    for kind, kind_timings, kind_errors in collected:
+        timings[kind].extend(kind_timings)
+        errors.update(kind_errors)
+
+    print(f'{"requests":<10} {"count":>7} {"per s":>7} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8}')
+    for kind in ('read', 'write'):
+        values = timings[kind]
+        print(f'{kind:<10} {len(values):>7} {len(values) / args.seconds:>7.0f} {percentile(values, 50):>8.1f} '
+            f'{percentile(values, 95):>8.1f} {max(values, default=0):>8.1f}')
+
+    if errors:
+        print(f'{sum(errors.values())} requests failed')
+        for error, count in errors.most_common():
+            print(f'{count:>7}  {error}')
+        sys.exit(1)
+    print('No requests failed')
+
+
+if __name__ == '__main__':
+    main()
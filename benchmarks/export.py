@@ -0,0 +1,102 @@
+"""
+Export throughput, and a check that memory stays flat however many rows are
+exported.
+
+Each export runs in a fresh process, so its peak RSS is its own. The peak is
+measured after a small warm up export, and again after exporting every row.
+The difference must stay under --max-rss-growth MB, otherwise this exits
+with status 1.
+
+    python -m benchmarks.export --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from benchmarks.common import PROJECT_DIR, setup_django, teardown_django, grow_to
+
+
+def peak_rss_mb():
+    # VmHWM on Linux, ru_maxrss there would include the parent's peak from before the exec
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def export_child(db, format, gzip):
+    """ Export every row from database file `db` to /dev/null, print the measurements as JSON """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db
+    import django
+    django.setup()
+
+    from video_collection import exporter
+    from video_collection.models import Video
+
+    with open(os.devnull, 'wb') as devnull:
+        for chunk in exporter.export(format, gzip, videos=Video.objects.filter(pk__lte=10_000)):
+            devnull.write(chunk)
+        baseline = peak_rss_mb()
+
+        stats = exporter.ExportStats()
+        for chunk in exporter.export(format, gzip, stats=stats):
+            devnull.write(chunk)
+
+    print(json.dumps({'rows': stats.rows, 'bytes': stats.bytes, 'seconds': stats.seconds,
+        'baseline_mb': baseline, 'peak_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--max-rss-growth', type=float, default=20, help='MB')
+    parser.add_argument('--child', nargs=3, metavar=('DB', 'FORMAT', 'GZIP'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        db, format, gzip = args.child
+        return export_child(db, format, gzip == '1')
+
+    setup_django('export')
+    from django.db import connection
+
+    failed = False
+    try:
+        grow_to(args.rows)
+        db = connection.settings_dict['NAME']
+        connection.close()
+
+        print(f'{"export":<10} {"rows":>9} {"MB":>8} {"seconds":>8} {"rows/s":>9} {"RSS MB":>7} {"growth":>7}')
+        for format, gzip in [('csv', False), ('csv', True), ('jsonl', False), ('jsonl', True)]:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.export', '--child', db, format, str(int(gzip))],
+                cwd=PROJECT_DIR, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            growth = result['peak_mb'] - result['baseline_mb']
+            failed = failed or growth > args.max_rss_growth
+
+            name = format + ('.gz' if gzip else '')
+            print(f'{name:<10} {result["rows"]:>9} {result["bytes"] / 1e6:>8.1f} {result["seconds"]:>8.1f} '
+                f'{result["rows"] / result["seconds"]:>9.0f} {result["peak_mb"]:>7.1f} {growth:>7.1f}')
+    finally:
+        teardown_django()
+
+    if failed:
+        print(f'RSS grew more than {args.max_rss_growth:g} MB during an export')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
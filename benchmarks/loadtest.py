@@ -0,0 +1,205 @@
+"""
+Load test of the read pages and the API, served by the sync views over WSGI
+and by the async views over ASGI.
+
+Each server runs in its own process against the same benchmark database, with
+page caching off so every request reaches the views and the database. A
+fixed number of client threads request a mix of list, search, info and API
+pages for a while, and the latency percentiles and throughput are reported.
+
+    python -m benchmarks.loadtest --rows 100000 --concurrency 50 --duration 20
+
+The WSGI server is wsgiref with a thread per request. The ASGI server is
+uvicorn, or hypercorn, whichever is installed. Without either only WSGI runs.
+"""
+
+import argparse
+import http.client
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import PROJECT_DIR, setup_django, teardown_django, grow_to, percentile
+
+
+def serve(kind, db, port):
+    """ Run a server on `port` using database file `db`, in this process, until killed """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    if kind == 'asgi':
+        os.environ.setdefault('VIDEO_ASYNC_VIEWS', '1')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db
+    settings.VIDEO_CACHE_TIMEOUT = 0
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1']
+
+    if kind == 'wsgi':
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+        from video.wsgi import application
+
+        class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        make_server('127.0.0.1', port, application, ThreadingWSGIServer, QuietHandler).serve_forever()
+
+    elif importlib.util.find_spec('uvicorn'):
+        import uvicorn
+        uvicorn.run('video.asgi:application', host='127.0.0.1', port=port, log_level='warning',
+            backlog=1024, lifespan='off')
+
+    else:
+        import asyncio
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from hypercorn.config import Config
+        from video.asgi import application
+
+        config = Config()
+        config.bind = [f'127.0.0.1:{port}']
+        config.backlog = 1024
+        asyncio.run(hypercorn_serve(application, config))
+
+
+def asgi_server_available():
+    return any(importlib.util.find_spec(name) for name in ('uvicorn', 'hypercorn'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, db):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.loadtest', '--serve', kind, '--db', db,
+        '--port', str(port)], cwd=PROJECT_DIR)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f'{kind} server exited with {process.returncode}')
+            time.sleep(0.2)
+
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def request_paths(pks, words):
+    """ An endless mix of requests, weighted roughly like browsing the site """
+    rng = random.Random(0)
+    while True:
+        choice = rng.random()
+        if choice < 0.4:
+            yield f'/video/{rng.choice(pks)}'
+        elif choice < 0.7:
+            yield '/video_list'
+        elif choice < 0.9:
+            yield f'/video_list?search_term={rng.choice(words)}'
+        else:
+            yield '/api/videos?limit=20'
+
+
+def load(port, paths, concurrency, duration):
+    """ Run `concurrency` clients for `duration` seconds, return (latencies in ms, errors) """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < stop:
+            with lock:
+                path = next(paths)
+            start = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                failed = response.status != 200 and f'{response.status} {path}'
+            except OSError as e:
+                failed = f'{e} {path}'
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if failed:
+                    errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20, help='seconds per server')
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.db, args.port)
+
+    setup_django('loadtest')
+    from django.db import connection
+    from benchmarks.common import WORDS
+    from video_collection.models import Video
+
+    kinds = ['wsgi']
+    if asgi_server_available():
+        kinds.append('asgi')
+    else:
+        print('No ASGI server installed (pip install uvicorn), skipping ASGI')
+
+    try:
+        grow_to(args.rows)
+        pks = list(Video.objects.order_by('?').values_list('pk', flat=True)[:1000])
+        db = connection.settings_dict['NAME']
+        connection.close()
+
+        print(f'{args.rows} rows, {args.concurrency} clients, {args.duration:g}s per server')
+        print(f'{"server":<6} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+        for kind in kinds:
+            process, port = start_server(kind, db)
+            try:
+                latencies, errors = load(port, request_paths(pks, WORDS), args.concurrency, args.duration)
+            finally:
+                process.terminate()
+                process.wait()
+
+            print(f'{kind:<6} {len(latencies):>9} {len(errors):>7} {len(latencies) / args.duration:>8.1f} '
+                f'{percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f}')
+            for error in errors[:5]:
+                print(f'    {error}')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
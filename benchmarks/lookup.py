@@ -0,0 +1,72 @@
+"""
+Video info pages for videos that exist and pks that don't, as a crawler
+would request them, with the video lookup cache off and on.
+
+--requests requests are made to random pks of --videos videos, and as many
+to the 500 pks past the last one, which 404. Page caching is off, so every
+request runs its view, and DEBUG is off, so the 404s are the plain page.
+Reported: ms per request, median and 95th percentile, and database queries
+per request.
+
+    python -m benchmarks.lookup --videos 10000 --requests 2000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from benchmarks.common import setup_django, teardown_django, grow_to, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django('lookup')
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from django.urls import reverse
+    from video_collection import lookup
+    from video_collection.cache import get_cache
+    from video_collection.models import Video
+
+    def request_times(client, pks):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for pk in pks:
+                start = time.perf_counter()
+                client.get(reverse('video_info', kwargs={'video_pk': pk}))
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings, len(queries) / len(pks)
+
+    logging.getLogger('django.request').setLevel(logging.ERROR)   # not a warning per 404
+
+    try:
+        grow_to(args.videos)
+        last = Video.objects.order_by('-pk').values_list('pk', flat=True).first()
+        rng = random.Random(0)
+        # the missing pks come up again and again, as a crawler's do
+        existing = [rng.randint(1, last) for _ in range(args.requests)]
+        missing = [last + rng.randint(1, 500) for _ in range(args.requests)]
+
+        client = Client()
+        print(f'Video info requests, {args.requests} each, ms median and 95th percentile, queries per request')
+        print(f'{"lookup":<8} {"videos":<9} {"median":>8} {"p95":>8} {"queries":>8}')
+        for timeout in (0, 60 * 60):
+            for name, pks in (('existing', existing), ('missing', missing)):
+                get_cache().clear()
+                lookup.reset()
+                with override_settings(DEBUG=False, VIDEO_CACHE_TIMEOUT=0, VIDEO_LOOKUP_TIMEOUT=timeout):
+                    timings, queries = request_times(client, pks)
+                print(f'{"on" if timeout else "off":<8} {name:<9} {percentile(timings, 50):>8.2f} '
+                    f'{percentile(timings, 95):>8.2f} {queries:>8.2f}')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
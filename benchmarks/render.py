@@ -0,0 +1,98 @@
+"""
+Render time of the video list's videos, per 1000 rows, with the fragment
+cache cold and warm.
+
+Each run renders the same --rows videos, each with a couple of tags:
+
+    uncached  every video rendered, VIDEO_FRAGMENT_CACHE_TIMEOUT=0
+    cold      every video rendered and cached, the cache emptied first
+    warm      every video from the cache
+
+The videos are fetched before the clock starts, their tags are fetched in
+the time for the videos rendered. Then a video list page of --rows videos is
+requested through the test client, streamed and not, for the time to its
+first chunk and to the whole page, with page caching off and the fragments
+warm.
+
+    python -m benchmarks.render --rows 1000 --repeat 20
+"""
+
+import argparse
+import time
+
+from benchmarks.common import setup_django, teardown_django, grow_to, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django('render')
+    from django.db.models.functions import Lower
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from video_collection import fragments
+    from video_collection.cache import get_cache
+    from video_collection.models import Tag, Video
+
+    def videos():
+        return list(Video.objects.annotate(lower_name=Lower('name')).order_by('lower_name', 'pk')[:args.rows])
+
+    def render_times(clear_cache):
+        timings = []
+        for _ in range(args.repeat):
+            page = videos()
+            if clear_cache:
+                get_cache().clear()
+            start = time.perf_counter()
+            fragments.render_items(page)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def request_times(client):
+        first, whole = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.get(reverse('video_list'))
+            chunks = iter(response) if response.streaming else iter([response.content])
+            next(chunks)
+            first.append((time.perf_counter() - start) * 1000)
+            for _ in chunks:
+                pass
+            whole.append((time.perf_counter() - start) * 1000)
+        return first, whole
+
+    try:
+        grow_to(args.rows)
+        tags = [Tag.objects.get_or_create(name=name, slug=name)[0] for name in ('yoga', 'core', 'cardio')]
+        through = Video.tags.through
+        through.objects.bulk_create([through(video_id=video.pk, tag_id=tag.pk)
+            for n, video in enumerate(videos()) for tag in (tags[n % 3], tags[(n + 1) % 3])], ignore_conflicts=True)
+
+        per_1k = 1000 / args.rows
+        print(f'Render times of {args.rows} videos, scaled to ms per 1000, median and 95th percentile')
+        with override_settings(VIDEO_FRAGMENT_CACHE_TIMEOUT=0):
+            results = {'uncached': render_times(clear_cache=False)}
+        results['cold'] = render_times(clear_cache=True)
+        results['warm'] = render_times(clear_cache=False)
+        for name, timings in results.items():
+            print(f'{name:<10} {percentile(timings, 50) * per_1k:>9.2f} {percentile(timings, 95) * per_1k:>9.2f}')
+
+        print(f'\nVideo list page of {args.rows} videos, ms to the first chunk and to the whole page, median')
+        client = Client()
+        with override_settings(VIDEO_CACHE_TIMEOUT=0, VIDEO_LIST_PAGE_SIZE=args.rows):
+            for streamed in (False, True):
+                with override_settings(VIDEO_STREAM_LIST=streamed):
+                    request_times(client)   # warm up
+                    first, whole = request_times(client)
+                print(f'{"streamed" if streamed else "rendered":<10} {percentile(first, 50):>9.2f} '
+                    f'{percentile(whole, 50):>9.2f}')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
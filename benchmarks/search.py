@@ -0,0 +1,52 @@
+"""
+Search latency, full text index against icontains, as the table grows.
+
+Each query is timed the way video_list runs it: the first page of results
+in backend order, plus the COUNT(*) for the heading.
+
+    python -m benchmarks.search --sizes 10000 100000 1000000
+"""
+
+import argparse
+
+from benchmarks.common import setup_django, teardown_django, grow_to, timed
+
+
+QUERIES = ['yoga', 'kettlebell recovery', 'medit', 'zumba']
+
+
+def run_query(backend, term, page_size):
+    from django.db.models.functions import Lower
+    from video_collection.models import Video
+
+    videos = backend.search(Video.objects.all(), term)
+    page = list(videos.annotate(lower_name=Lower('name')).order_by(*backend.keys)[:page_size + 1])
+    return len(page), videos.count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django('search')
+    from django.conf import settings
+    from video_collection import search
+
+    backends = {'contains': search.get_backend('contains'), 'fulltext': search.get_backend('fulltext')}
+
+    try:
+        print(f'{"rows":>9} {"query":<22} {"matches":>8} {"contains ms":>12} {"fulltext ms":>12} {"speedup":>8}')
+        for size in sorted(args.sizes):
+            grow_to(size)
+            for term in QUERIES:
+                contains_ms, _ = timed(lambda: run_query(backends['contains'], term, settings.VIDEO_LIST_PAGE_SIZE), args.repeat)
+                fulltext_ms, (_, matches) = timed(lambda: run_query(backends['fulltext'], term, settings.VIDEO_LIST_PAGE_SIZE), args.repeat)
+                print(f'{size:>9} {term:<22} {matches:>8} {contains_ms:>12.2f} {fulltext_ms:>12.2f} {contains_ms / fulltext_ms:>7.1f}x')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Startup cost of each settings profile: the time django.setup() takes and
+how many modules it imports, in a new Python process each time, so nothing
+is already imported.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --profiles worker --top 15
+
+--top also lists the slowest imports of the first profile, from
+python -X importtime.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import PROJECT_DIR
+
+
+PROFILES = ['dev', 'prod', 'worker']
+
+# run in the child, prints the time and module counts as JSON
+MEASURE = '''
+import json, sys, time
+before = len(sys.modules)
+start = time.perf_counter()
+import django
+django.setup()
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "imported": len(sys.modules) - before,
+    "requests": "requests" in sys.modules, "admin": "django.contrib.admin" in sys.modules}))
+'''
+
+
+def environment(profile):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='video.settings', VIDEO_ENV=profile)
+    env.setdefault('DJANGO_SECRET_KEY', 'benchmark')   # prod requires one
+    return env
+
+
+def measure(profile):
+    output = subprocess.run([sys.executable, '-c', MEASURE], cwd=PROJECT_DIR, env=environment(profile),
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def slowest_imports(profile, top):
+    """ (cumulative microseconds, module) of the `top` slowest imports, from -X importtime """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import django; django.setup()'],
+        cwd=PROJECT_DIR, env=environment(profile), capture_output=True, text=True, check=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                imports.append((int(cumulative), module.rstrip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=PROFILES)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=0, help='list the slowest imports of the first profile')
+    args = parser.parse_args()
+
+    print(f'{"profile":<8} {"setup ms":>9} {"min ms":>8} {"modules":>8}  imports')
+    for profile in args.profiles:
+        runs = [measure(profile) for _ in range(args.runs)]
+        times = [run['seconds'] * 1000 for run in runs]
+        loaded = [name for name in ('requests', 'admin') if runs[0][name]]
+        print(f'{profile:<8} {statistics.median(times):>9.1f} {min(times):>8.1f} {runs[0]["imported"]:>8}  '
+            f'{", ".join(loaded) or "-"}')
+
+    if args.top:
+        print(f'\nSlowest imports of {args.profiles[0]}, cumulative ms')
+        for microseconds, module in slowest_imports(args.profiles[0], args.top):
+            print(f'{microseconds / 1000:>9.1f}  {module}')
+
+
+if __name__ == '__main__':
+    main()
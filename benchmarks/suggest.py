@@ -0,0 +1,85 @@
+"""
+Suggestion latency, the in-memory index of names against the database query,
+as the table grows.
+
+Each prefix is looked up in the index (suggest.suggest, once it's built) and
+with the database query it falls back to (suggest.database_suggest), and
+requested from api/videos/suggest through the test client. Also reports how
+long the index takes to build and about how much memory it holds.
+
+    python -m benchmarks.suggest --sizes 10000 100000
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import setup_django, teardown_django, grow_to, percentile
+
+
+PREFIXES = ['y', 'yo', 'yog', 'kettle', 'morning st', 'zumba']
+
+
+def latencies(func, repeat):
+    """ Milliseconds for each of `repeat` calls of func with each prefix """
+    timings = []
+    for _ in range(repeat):
+        for prefix in PREFIXES:
+            start = time.perf_counter()
+            func(prefix)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def index_size_mb(index):
+    # keys, their pks and the names, leaving out the ints of the names dict
+    size = sys.getsizeof(index.keys) + sum(map(sys.getsizeof, index.keys)) + sys.getsizeof(index.pks)
+    size += sys.getsizeof(index.names) + sum(map(sys.getsizeof, index.names.values()))
+    return size / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django('suggest')
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+    from video_collection import suggest
+
+    client = Client()
+    url = reverse('api_suggest')
+    limit = settings.VIDEO_SUGGEST_LIMIT
+
+    try:
+        print('Lookup times are the median and 95th percentile')
+        print(f'{"rows":>9} {"keys":>9} {"build s":>8} {"MB":>6} {"index ms":>16} {"database ms":>16} {"request ms":>16}')
+        for size in sorted(args.sizes):
+            grow_to(size)
+            suggest.reset()
+
+            start = time.perf_counter()
+            suggest.suggest('warm up')
+            build_seconds = time.perf_counter() - start
+            index = suggest._index
+            if index is None:
+                print(f'{size:>9} more than VIDEO_SUGGEST_MAX_KEYS keys, not indexed')
+                continue
+
+            results = {
+                'index': latencies(lambda prefix: suggest.suggest(prefix, limit), args.repeat),
+                'database': latencies(lambda prefix: suggest.database_suggest(prefix, limit), max(1, args.repeat // 10)),
+                'request': latencies(lambda prefix: client.get(url, {'q': prefix}), args.repeat),
+            }
+            columns = ' '.join(f'{percentile(values, 50):.3f}/{percentile(values, 95):.3f}'.rjust(16)
+                for values in results.values())
+            print(f'{size:>9} {len(index.keys):>9} {build_seconds:>8.2f} {index_size_mb(index):>6.1f} {columns}')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
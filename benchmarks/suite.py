@@ -0,0 +1,198 @@
+"""
+Benchmark suite for the video pages and the Video model, as the table grows.
+
+At each size the table is filled with synthetic videos (see common.py, the
+same seed gives the same rows), then list, search, detail, add and delete
+are timed through the test client, the whole request and response, and
+through the ORM calls the views make. Page caching is off so every request
+does its work. Results go to a JSON file.
+
+    python -m benchmarks.suite run --sizes 1000 10000 100000 1000000 --output before.json
+    python -m benchmarks.suite run --sizes 1000 10000 100000 1000000 --output after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 10
+
+compare prints each benchmark's change in median time and exits with
+status 1 if any got slower by more than --threshold percent. Requests of a
+few milliseconds vary by 20% or more from run to run on a busy machine, so
+use a generous --repeat, or a threshold above that.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.common import setup_django, teardown_django, grow_to
+
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+SEARCH_TERM = 'kettlebell recovery'
+
+
+def measure(func, repeat, setup=None):
+    """ Time `repeat` calls of func(setup()), return the median and 95th percentile in ms """
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        func(argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, round(0.95 * len(timings)))],
+        'repeat': repeat,
+    }
+
+
+def benchmarks(size):
+    """ (name, func, setup) for each benchmark, with the table at `size` rows """
+    from django.conf import settings
+    from django.db.models.functions import Lower
+    from django.test import Client
+    from django.urls import reverse
+    from video_collection import search
+    from video_collection.models import Video
+    from video_collection.pagination import KeysetPaginator
+
+    client = Client()
+    rng = random.Random(size)
+    pks = list(Video.objects.values_list('pk', flat=True)[:10_000])
+    numbers = itertools.count()
+
+    def new_video_data(_=None):
+        n = next(numbers)
+        return {'name': f'Benchmark video {n}', 'url': f'https://www.youtube.com/watch?v=new{size}x{n}',
+            'notes': 'added by the benchmark'}
+
+    def new_video():
+        return Video.objects.create(**new_video_data())
+
+    def check(response, status=200):
+        assert response.status_code == status, f'{response.status_code} from {response.request["PATH_INFO"]}'
+
+    def orm_list(_):
+        queryset = Video.objects.annotate(lower_name=Lower('name'))
+        page = KeysetPaginator(queryset, ('lower_name', 'pk'), settings.VIDEO_LIST_PAGE_SIZE).page()
+        list(page)
+        Video.objects.count()
+
+    def orm_search(_):
+        backend = search.get_backend()
+        videos = backend.search(Video.objects.all(), SEARCH_TERM)
+        page = KeysetPaginator(videos.annotate(lower_name=Lower('name')), backend.keys,
+            settings.VIDEO_LIST_PAGE_SIZE).page()
+        list(page)
+        videos.count()
+
+    return [
+        ('client.list', lambda _: check(client.get(reverse('video_list'))), None),
+        ('client.search', lambda _: check(client.get(reverse('video_list'), {'search_term': SEARCH_TERM})), None),
+        ('client.detail', lambda pk: check(client.get(reverse('video_info', kwargs={'video_pk': pk}))),
+            lambda: rng.choice(pks)),
+        ('client.add', lambda data: check(client.post(reverse('add_video'), data), 302), new_video_data),
+        ('client.delete', lambda video: check(client.post(reverse('delete_video', kwargs={'video_pk': video.pk})), 302),
+            new_video),
+        ('orm.list', orm_list, None),
+        ('orm.search', orm_search, None),
+        ('orm.detail', lambda pk: Video.objects.get(pk=pk), lambda: rng.choice(pks)),
+        ('orm.add', lambda data: Video.objects.create(**data), new_video_data),
+        ('orm.delete', lambda video: video.delete(), new_video),
+    ]
+
+
+def run(args):
+    setup_django('suite')
+    import django
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    results = {}
+    try:
+        with override_settings(VIDEO_CACHE_TIMEOUT=0):
+            print(f'{"benchmark":<16} {"rows":>9} {"median ms":>10} {"p95 ms":>10}')
+            for size in sorted(args.sizes):
+                grow_to(size)
+                # add leaves its few dozen videos behind, small next to the next size up
+                for name, func, setup in benchmarks(size):
+                    func(setup() if setup else None)   # warm up
+                    result = measure(func, args.repeat, setup)
+                    results[f'{name}@{size}'] = result
+                    print(f'{name:<16} {size:>9} {result["median_ms"]:>10.2f} {result["p95_ms"]:>10.2f}')
+
+        report = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f'{connection.vendor} {connection.Database.sqlite_version}'
+                if connection.vendor == 'sqlite' else connection.vendor,
+            'platform': platform.platform(),
+            'results': results,
+        }
+    finally:
+        teardown_django()
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Results written to {args.output}')
+
+
+def compare(args):
+    with open(args.before) as file:
+        before = json.load(file)['results']
+    with open(args.after) as file:
+        after = json.load(file)['results']
+
+    regressions = []
+    print(f'{"benchmark":<28} {"before ms":>10} {"after ms":>10} {"change":>8}')
+    for name in sorted(before.keys() & after.keys(), key=_sort_key):
+        old, new = before[name]['median_ms'], after[name]['median_ms']
+        change = (new - old) / old * 100 if old else 0
+        flag = ''
+        if change > args.threshold:
+            regressions.append(name)
+            flag = '  slower'
+        print(f'{name:<28} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}')
+
+    for name in sorted(before.keys() ^ after.keys(), key=_sort_key):
+        print(f'{name:<28} only in {args.before if name in before else args.after}')
+
+    if regressions:
+        print(f'{len(regressions)} benchmarks more than {args.threshold:g}% slower')
+        sys.exit(1)
+
+
+def _sort_key(name):
+    benchmark, _, size = name.partition('@')
+    return benchmark, int(size or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and save the results')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    run_parser.add_argument('--repeat', type=int, default=20)
+    run_parser.add_argument('--output', default='benchmark.json')
+
+    compare_parser = commands.add_parser('compare', help='Compare two saved runs')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='percent slower that counts as a regression')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Template render times at startup and in the steady state, with and without
+the cached template loader.
+
+Each page is rendered by --starts new template engines, as in processes
+that have just started, and the medians reported:
+
+    cold      the first render, reading and compiling the page, its base
+              and its includes
+    warmed    the first render after warm_templates() compiled every template
+    steady    --repeat renders after that, median and 95th percentile
+
+with the loaders of the production settings (cached) and with the file
+system and app directories loaders alone (uncached), which read and compile
+every template on every render, as Django did in DEBUG before 4.1.
+
+    python -m benchmarks.templates --starts 20 --repeat 200
+"""
+
+import argparse
+import time
+
+from benchmarks.common import setup_django, teardown_django, grow_to, percentile
+
+
+LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+CONFIGURATIONS = {
+    'uncached': LOADERS,
+    'cached': [('django.template.loaders.cached.Loader', LOADERS)],
+}
+
+
+def new_backend(loaders):
+    from django.conf import settings
+    from django.template.backends.django import DjangoTemplates
+
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=loaders)
+    return DjangoTemplates({'NAME': 'benchmark', 'DIRS': [], 'APP_DIRS': False, 'OPTIONS': options})
+
+
+def contexts():
+    """ (template, context) of each page """
+    from django.conf import settings
+    from django.db.models.functions import Lower
+    from video_collection import fragments
+    from video_collection.forms import SearchForm, VideoForm
+    from video_collection.models import Video
+
+    videos = list(Video.objects.annotate(lower_name=Lower('name')).order_by('lower_name', 'pk')
+        [:settings.VIDEO_LIST_PAGE_SIZE])
+    return [
+        ('video_collection/home.html', {'app_name': 'Exercise Videos'}),
+        ('video_collection/video_list.html', {'videos': videos, 'items': fragments.render_items(videos),
+            'video_count': len(videos), 'search_form': SearchForm(), 'next_url': '?cursor=x', 'prev_url': None}),
+        ('video_collection/video_info.html', {'video': videos[0]}),
+        ('video_collection/add.html', {'new_video_form': VideoForm()}),
+    ]
+
+
+def render_ms(backend, name, context, request):
+    start = time.perf_counter()
+    backend.get_template(name).render(context, request)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--starts', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django('templates')
+    from django.test import RequestFactory
+    from video_collection import warmup
+
+    request = RequestFactory().get('/')
+
+    try:
+        grow_to(100)
+        pages = contexts()
+
+        print('Render times in ms')
+        print(f'{"loaders":<10} {"page":<18} {"cold":>8} {"warmed":>8} {"steady":>16}')
+        for configuration, loaders in CONFIGURATIONS.items():
+            for name, context in pages:
+                cold, warmed = [], []
+                for _ in range(args.starts):
+                    cold.append(render_ms(new_backend(loaders), name, context, request))
+                    backend = new_backend(loaders)
+                    warmup.warm_templates(backend.engine)
+                    warmed.append(render_ms(backend, name, context, request))
+
+                steady = [render_ms(backend, name, context, request) for _ in range(args.repeat)]
+                steady_column = f'{percentile(steady, 50):.3f}/{percentile(steady, 95):.3f}'
+                page = name.split('/')[-1]
+                print(f'{configuration:<10} {page:<18} {percentile(cold, 50):>8.2f} '
+                    f'{percentile(warmed, 50):>8.2f} {steady_column:>16}')
+
+        backend = new_backend(CONFIGURATIONS['cached'])
+        start = time.perf_counter()
+        count = len(warmup.warm_templates(backend.engine))
+        print(f'\nwarm_templates() compiled {count} templates in {(time.perf_counter() - start) * 1000:.1f} ms')
+    finally:
+        teardown_django()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+YouTube URL parser micro-benchmark.
+
+Parses a list of URLs, mostly watch URLs with a mix of the other shapes and
+some invalid ones, with the urlparse/parse_qs code that used to be in
+Video.save(), with the precompiled parser, and with the parser's LRU cache.
+
+    python -m benchmarks.url_parser --count 1000000 --distinct 5000
+"""
+
+import argparse
+import random
+import sys
+import time
+from urllib import parse
+
+from benchmarks.common import PROJECT_DIR
+
+sys.path.insert(0, PROJECT_DIR)
+
+from video_collection import youtube   # noqa: E402  plain module, no Django setup needed
+
+
+def legacy_parse(url):
+    # the checks Video.save() made before the parser module
+    url_components = parse.urlparse(url)
+    if url_components.scheme != 'https' or url_components.netloc != 'www.youtube.com' \
+            or url_components.path != '/watch' or not url_components.query:
+        raise ValueError(url)
+    v_parameters_list = parse.parse_qs(url_components.query, strict_parsing=True).get('v')
+    if not v_parameters_list:
+        raise ValueError(url)
+    return v_parameters_list[0]
+
+
+def make_urls(count, distinct):
+    rng = random.Random(1)
+    shapes = [
+        'https://www.youtube.com/watch?v={}',
+        'https://www.youtube.com/watch?v={}',
+        'https://www.youtube.com/watch?v={}&t=42',
+        'https://youtu.be/{}',
+        'https://www.youtube.com/shorts/{}',
+        'https://github.com/{}',
+    ]
+    pool = [rng.choice(shapes).format(f'{n:011d}') for n in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run(parse_url, urls):
+    start = time.perf_counter()
+    for url in urls:
+        try:
+            parse_url(url)
+        except ValueError:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1_000_000, help='URLs to parse')
+    parser.add_argument('--distinct', type=int, default=5000, help='Distinct URLs among them')
+    args = parser.parse_args()
+
+    urls = make_urls(args.count, args.distinct)
+
+    def uncached(url):
+        video_id, error = youtube._parse.__wrapped__(url)
+        if error:
+            raise ValueError(error)
+
+    youtube.cache_clear()
+    results = [
+        ('legacy urlparse + parse_qs', run(legacy_parse, urls)),
+        ('precompiled, no cache', run(uncached, urls)),
+        ('precompiled, LRU cache', run(youtube.parse_video_id, urls)),
+    ]
+
+    print(f'{args.count} URLs, {args.distinct} distinct')
+    for name, seconds in results:
+        print(f'{name:<28} {seconds:7.3f}s {args.count / seconds:>12,.0f} URLs/s')
+    print(youtube.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
+os.environ['VIDEO_ASGI'] = '1'   # no persistent database connections, see settings/base.py
+os.environ.setdefault('VIDEO_ASYNC_VIEWS', '1')   # route to the async views, see video_collection/async_views.py
 
 application = get_asgi_application()
+
+from django.conf import settings   # noqa: E402  configured by the line above
+
+if settings.VIDEO_WARM_TEMPLATES:
+    from video_collection.warmup import warm_templates
+    warm_templates()
@@ -0,0 +1,29 @@
+"""
+Settings, in layers. base.py holds everything the profiles share, and each
+profile starts from it:
+
+    dev     the development server and tests, DEBUG on, the default
+    prod    processes serving pages, secret key and hosts from the environment
+    worker  run_workers and other commands that don't serve pages, without
+            the admin, auth, sessions, middleware or templates
+
+The VIDEO_ENV environment variable picks the profile for
+DJANGO_SETTINGS_MODULE=video.settings, or name one directly, like
+DJANGO_SETTINGS_MODULE=video.settings.worker.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+VIDEO_ENV = os.environ.get('VIDEO_ENV', 'dev')
+
+if VIDEO_ENV == 'dev':
+    from .dev import *   # noqa: F401,F403
+elif VIDEO_ENV == 'prod':
+    from .prod import *   # noqa: F401,F403
+elif VIDEO_ENV == 'worker':
+    from .worker import *   # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f'Unknown VIDEO_ENV {VIDEO_ENV!r}, use dev, prod or worker')
@@ -0,0 +1,311 @@
+"""
+Django settings for video project, shared by every profile, see __init__.py.
+
+Generated by 'django-admin startproject' using Django 3.0.4.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.0/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/3.0/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# SECRET_KEY, DEBUG and ALLOWED_HOSTS are set by each profile
+
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'video_collection',
+]
+
+MIDDLEWARE = [
+    'video_collection.middleware.RequestMetricsMiddleware',   # first, to time everything after it
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',   # 304 for cached pages too
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'video.urls'
+
+# Templates are compiled once and cached by Django's cached loader, on by
+# default, and reloaded when the development server sees them change. See
+# prod.py for the loaders listed explicitly
+TEMPLATES = [
+    {
+        'BACKEND': 'video_collection.metrics.TimedDjangoTemplates',   # DjangoTemplates, timed for the metrics
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'video.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+
+# SQLite tuned for concurrent readers and writers, see backends/sqlite3/base.py.
+# WAL lets pages read while a video is added or deleted, and the writer wait
+# up to busy_timeout ms for another writer rather than fail. synchronous
+# NORMAL syncs at checkpoints instead of every commit, safe from corruption in
+# WAL mode, though a power cut can lose the last few commits. mmap_size bytes
+# of the file are read through memory mapping, and cache_size is the page
+# cache of each connection, negative for KiB.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,   # first, so switching to WAL waits for other connections too
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# Connections are kept for CONN_MAX_AGE seconds and reused by later requests
+# on the same thread, checked before reuse by CONN_HEALTH_CHECKS. Not under
+# ASGI (asgi.py sets VIDEO_ASGI): the async views' queries run in threads
+# that aren't tied to a request, so kept connections wouldn't be reused, or
+# closed, and would pile up. Django's docs say to turn them off there.
+VIDEO_ASGI = os.environ.get('VIDEO_ASGI', '') == '1'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'video_collection.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 0 if VIDEO_ASGI else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Read only copy of db.sqlite3, kept up to date by Litestream, LiteFS or the
+# like, for the read-only views, see routers.py
+if os.environ.get('VIDEO_DB_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': f'file:{os.environ["VIDEO_DB_REPLICA"]}?mode=ro',
+        # journal_mode is the file's own, and the copy can't be written to change it
+        'OPTIONS': {'pragmas': {name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'}},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['video_collection.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# In-process by default. Set VIDEO_CACHE_URL to share the cache between
+# processes, e.g. file:///var/tmp/video-cache or redis://localhost:6379/0
+
+VIDEO_CACHE_URL = os.environ.get('VIDEO_CACHE_URL', '')
+
+if VIDEO_CACHE_URL.startswith('file://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': VIDEO_CACHE_URL[len('file://'):],
+    }}
+elif VIDEO_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': VIDEO_CACHE_URL,
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'video-collection',
+        # room for the HTML of each video on the list as well as whole pages,
+        # the default of 300 entries holds only a few pages of videos
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    }}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/3.0/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/3.0/howto/static-files/
+
+STATIC_URL = '/static/'
+
+# Where collectstatic puts them, to be served by StaticFilesMiddleware in
+# production, see prod.py
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+
+# Video collection
+
+# Number of videos on each page of the video list
+VIDEO_LIST_PAGE_SIZE = 20
+
+# How the video list is searched: 'auto' uses full text search if the database
+# supports it (SQLite FTS5 or Postgres), 'fulltext' requires it, 'contains' is
+# a substring match on name only.
+VIDEO_SEARCH_BACKEND = 'auto'
+
+# Cache used for pages, and how long cached pages live in seconds, 0 to turn
+# page caching off. Pages are invalidated when videos change, see cache.py
+VIDEO_CACHE_ALIAS = 'default'
+VIDEO_CACHE_TIMEOUT = 60 * 60
+
+# How long the HTML of each video on the video list is cached, 0 to render
+# them every time, see fragments.py. With VIDEO_STREAM_LIST the list page is
+# streamed, its header and search form sent before the videos are fetched
+VIDEO_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+VIDEO_STREAM_LIST = False
+
+# Videos looked up one at a time, for the video and delete pages, are cached
+# in each process, the latest VIDEO_LOOKUP_CACHE_SIZE for up to
+# VIDEO_LOOKUP_LOCAL_TIMEOUT seconds, and with VIDEO_LOOKUP_SHARED in the cache
+# above for VIDEO_LOOKUP_TIMEOUT seconds, 0 to turn the lookups' caching off.
+# A video that isn't there is remembered for VIDEO_LOOKUP_MISSING_TIMEOUT
+# seconds, see lookup.py
+VIDEO_LOOKUP_TIMEOUT = 60 * 60
+VIDEO_LOOKUP_MISSING_TIMEOUT = 30
+VIDEO_LOOKUP_LOCAL_TIMEOUT = 5
+VIDEO_LOOKUP_CACHE_SIZE = 10_000
+VIDEO_LOOKUP_SHARED = bool(VIDEO_CACHE_URL)
+
+# How long browsers keep a static file requested by its plain name, rather
+# than by the hashed name {% static %} gives in production, see middleware.py
+VIDEO_STATIC_MAX_AGE = 60
+
+# Compile every template when wsgi.py or asgi.py starts, rather than on the
+# first request to each page, see warmup.py
+VIDEO_WARM_TEMPLATES = False
+
+# Largest page of videos from the JSON API, and how many rows at a time are
+# fetched from the database for a streamed NDJSON list
+VIDEO_API_PAGE_SIZE = 100
+VIDEO_API_CHUNK_SIZE = 2000
+
+# Token the API's POST and DELETE requests and imports send as
+# Authorization: Bearer <token>, they're refused without one set, see auth.py
+VIDEO_API_TOKEN = os.environ.get('VIDEO_API_TOKEN', '')
+
+# Serve the video list, video info and the API with the async views, set by
+# asgi.py. Under WSGI the sync views avoid running an event loop per request
+VIDEO_ASYNC_VIEWS = os.environ.get('VIDEO_ASYNC_VIEWS', '') == '1'
+
+# YouTube Data API used to fill in video titles, durations, channels and
+# thumbnails, see enrichment.py. VIDEO_ENRICH_WORKERS is the number of lookups
+# running at once, VIDEO_ENRICH_RATE the most API calls a second, 0 for no limit
+VIDEO_YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', '')
+VIDEO_YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/videos'
+VIDEO_ENRICH_WORKERS = 4
+VIDEO_ENRICH_RATE = 10
+
+# Background jobs, see jobs.py. A failed job is retried after
+# VIDEO_JOB_RETRY_DELAY seconds, doubled for each attempt after that, up to
+# VIDEO_JOB_MAX_ATTEMPTS attempts. A job running longer than VIDEO_JOB_TIMEOUT
+# seconds is run again. Idle workers check for jobs every
+# VIDEO_JOB_POLL_INTERVAL seconds.
+VIDEO_JOB_MAX_ATTEMPTS = 5
+VIDEO_JOB_RETRY_DELAY = 30
+VIDEO_JOB_TIMEOUT = 10 * 60
+VIDEO_JOB_POLL_INTERVAL = 1
+
+# Rows fetched from the database at a time by export_videos and the export download
+VIDEO_EXPORT_CHUNK_SIZE = 2000
+
+# How alike two video names must be to be near duplicates, from 0 to 1, the
+# share of their three letter pieces in common, see duplicates.py
+VIDEO_DUPLICATE_THRESHOLD = 0.7
+
+# Search as you type suggestions, see suggest.py. The most suggestions
+# returned, how old in seconds the index of names in each process can get
+# before it's built again to pick up other processes' changes, and the most
+# keys it holds, about 100 bytes each, a key for each word of a name
+VIDEO_SUGGEST_LIMIT = 10
+VIDEO_SUGGEST_MAX_AGE = 5 * 60
+VIDEO_SUGGEST_MAX_KEYS = 500_000
+
+# Deleted videos are hidden and can be restored for this many seconds, after
+# which purge_deleted deletes them for good
+VIDEO_UNDO_DELETE_SECONDS = 15 * 60
+
+# Database the read-only views read from when it's in DATABASES, see routers.py
+VIDEO_READ_REPLICA = 'replica'
+
+# Request metrics, see metrics.py. Percentiles are over each view's last
+# VIDEO_METRICS_WINDOW requests, and the metrics page answers only requests
+# from VIDEO_METRICS_ALLOWED_IPS, or with the API token, see auth.py.
+VIDEO_METRICS_WINDOW = 1000
+VIDEO_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# A line per request from RequestMetricsMiddleware at INFO, set
+# VIDEO_REQUEST_LOG_LEVEL=INFO in the environment to see them
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'video_collection.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('VIDEO_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
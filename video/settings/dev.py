@@ -0,0 +1,13 @@
+"""
+Development settings, for runserver and the tests.
+"""
+
+from .base import *   # noqa: F401,F403
+
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'rsov-5y+ytv7+o@6#i0ey$lx7s8x)#+@n-0a$o$p&k@3gm9jrh'
+
+DEBUG = True
+
+ALLOWED_HOSTS = []
@@ -0,0 +1,46 @@
+"""
+Production settings, for the processes serving pages.
+
+    VIDEO_ENV=prod DJANGO_SECRET_KEY=... python manage.py collectstatic --no-input
+    VIDEO_ENV=prod DJANGO_SECRET_KEY=... VIDEO_ALLOWED_HOSTS=videos.example.com gunicorn video.wsgi
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *   # noqa: F401,F403
+
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set the DJANGO_SECRET_KEY environment variable for VIDEO_ENV=prod')
+
+ALLOWED_HOSTS = os.environ.get('VIDEO_ALLOWED_HOSTS', 'localhost').split(',')
+
+# compiled once per process and never read from disk again, a deploy restarts
+# the processes to pick up changed templates. APP_DIRS is replaced by the
+# app_directories loader, Django allows one or the other
+TEMPLATES = [dict(TEMPLATES[0], APP_DIRS=False, OPTIONS=dict(TEMPLATES[0]['OPTIONS'], loaders=[
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]))]
+
+VIDEO_WARM_TEMPLATES = True
+
+# behind the reverse proxy every request comes from its address, so a scraper
+# of the metrics page sends the API token instead
+VIDEO_METRICS_ALLOWED_IPS = []
+
+# static files get hashed names and gzip and brotli copies from collectstatic,
+# and are served from STATIC_ROOT by the app itself, see storage.py
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'video_collection.storage.CompressedManifestStaticFilesStorage'},
+}
+
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'video_collection.middleware.StaticFilesMiddleware')
@@ -0,0 +1,27 @@
+"""
+Settings for processes that don't serve pages: run_workers, and commands
+like export_videos or purge_deleted. Only the video_collection app is
+loaded, with no middleware or templates, so a worker starts without
+importing the admin, auth and sessions.
+
+    VIDEO_ENV=worker python manage.py run_workers --concurrency 4
+"""
+
+import os
+
+from .base import *   # noqa: F401,F403
+
+
+# nothing is signed without sessions, forms or messages, the key is only
+# needed if something starts signing
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+
+INSTALLED_APPS = ['video_collection']
+
+MIDDLEWARE = []
+
+ROOT_URLCONF = 'video.worker_urls'
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
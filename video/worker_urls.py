@@ -0,0 +1,6 @@
+"""
+URLs of the worker settings profile, none, workers don't serve pages. The
+URLs of the site need the admin and auth apps, which workers don't load.
+"""
+
+urlpatterns = []
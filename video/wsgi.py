@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'video.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings   # noqa: E402  configured by the line above
+
+if settings.VIDEO_WARM_TEMPLATES:
+    from video_collection.warmup import warm_templates
+    warm_templates()
@@ -1,5 +1,16 @@
 from django.contrib import admin
-from .models import Video
+from .models import Playlist, PlaylistEntry, Tag, Video
 # Register your models here.
 
-admin.site.register(Video)
\ No newline at end of file
+admin.site.register(Video, filter_horizontal=['tags'])
+admin.site.register(Tag, prepopulated_fields={'slug': ['name']})
+
+
+class PlaylistEntryInline(admin.TabularInline):
+    model = PlaylistEntry
+    raw_id_fields = ['video']
+
+
+@admin.register(Playlist)
+class PlaylistAdmin(admin.ModelAdmin):
+    inlines = [PlaylistEntryInline]
@@ -0,0 +1,204 @@
+"""
+JSON API for videos.
+
+    GET    api/videos               a page of videos, same order and search as the video list
+    GET    api/videos?format=ndjson every matching video, streamed one JSON object per line
+    POST   api/videos               add a video from a JSON object with name, url and notes
+    POST   api/videos/bulk          add videos from a JSON array, or JSON Lines streamed in the body
+    GET    api/videos/suggest?q=yo  names of videos with a word starting with q, for search as you type
+    GET    api/videos/<pk>          one video
+    DELETE api/videos/<pk>          delete a video, hidden until purge_deleted deletes it for good
+
+POST and DELETE need the API token in an Authorization: Bearer header, see
+auth.py. GET requests take ?fields=name,url to return only some fields, and the list
+takes ?search_term= and the ?cursor= from the previous page's next or previous.
+"""
+
+import codecs
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from .auth import token_required
+from .forms import VideoForm
+from .models import Video
+from .pagination import KeysetPaginator, InvalidCursor
+from .views import search_videos
+from .routers import read_replica
+from . import importer, suggest
+
+
+FIELDS = ('id', 'name', 'url', 'notes', 'video_id', 'created', 'updated', 'title', 'duration', 'channel',
+    'thumbnail_url')
+
+NDJSON = 'application/x-ndjson'
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _fields(request):
+    requested = request.GET.get('fields')
+    if not requested:
+        return FIELDS
+
+    fields = tuple(field.strip() for field in requested.split(',') if field.strip())
+    if not fields:
+        # values() of no fields would be every column, the internal ones too
+        raise BadRequest('fields must name at least one field')
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise BadRequest(f'Unknown fields {", ".join(unknown)}, choose from {", ".join(FIELDS)}')
+    return fields
+
+
+def _serialize(video, fields):
+    return {field: getattr(video, field) for field in fields}
+
+
+def _json_object(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise BadRequest('Request body is not valid JSON')
+    if not isinstance(data, dict):
+        raise BadRequest('Expected a JSON object')
+    return data
+
+
+@csrf_exempt   # called by other services with the API token, not from a form
+@require_http_methods(['GET', 'POST'])
+@token_required
+@read_replica
+def videos(request):
+    try:
+        if request.method == 'POST':
+            return _create(request)
+        if request.GET.get('format') == 'ndjson' or request.headers.get('Accept') == NDJSON:
+            return _stream(request)
+        return _page(request)
+    except BadRequest as e:
+        return _error(str(e))
+
+
+def _page(request):
+    fields = _fields(request)
+    _, matches, keys = search_videos(request)
+
+    page_size = settings.VIDEO_API_PAGE_SIZE
+    if 'limit' in request.GET:
+        try:
+            page_size = min(max(int(request.GET['limit']), 1), settings.VIDEO_API_PAGE_SIZE)
+        except ValueError:
+            raise BadRequest('limit must be a number')
+
+    paginator = KeysetPaginator(matches.annotate(lower_name=Lower('name')), keys=keys, page_size=page_size)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise BadRequest('Invalid cursor')
+
+    return JsonResponse({
+        'count': matches.count(),
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+        'videos': [_serialize(video, fields) for video in page],
+    })
+
+
+def _stream(request):
+    fields = _fields(request)
+    _, matches, keys = search_videos(request)
+
+    # values() rows straight from a server-side cursor, no model instances and
+    # no list of every row, so memory doesn't grow with the collection
+    rows = matches.annotate(lower_name=Lower('name')).order_by(*keys).values(*fields) \
+        .iterator(chunk_size=settings.VIDEO_API_CHUNK_SIZE)
+
+    encoder = DjangoJSONEncoder()
+    lines = (encoder.encode(row) + '\n' for row in rows)
+    return StreamingHttpResponse(lines, content_type=NDJSON)
+
+
+def _create(request):
+    form = VideoForm(_json_object(request))
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    try:
+        with transaction.atomic():
+            video = form.save()
+    except ValidationError as e:
+        return JsonResponse({'errors': {'url': e.messages}}, status=400)
+    except IntegrityError:
+        return JsonResponse({'errors': {'url': ['You already added that video']}}, status=409)
+
+    return JsonResponse(_serialize(video, FIELDS), status=201)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+def bulk_create(request):
+    if request.content_type == 'application/json':
+        try:
+            rows = json.loads(request.body)
+        except ValueError:
+            return _error('Request body is not valid JSON')
+        if not isinstance(rows, list):
+            return _error('Expected a JSON array, or JSON Lines with content type application/x-ndjson')
+        # numbered from 1 in the report, like the lines of a file
+        rows = ((number, row, None) if isinstance(row, dict) else (number, None, 'Expected a JSON object')
+            for number, row in enumerate(rows, start=1))
+    else:
+        rows = importer.read_rows(codecs.iterdecode(request, request.encoding or 'utf-8'), 'jsonl')
+
+    try:
+        report = importer.import_rows(rows)
+    except UnicodeDecodeError:
+        return _error('Request body is not valid UTF-8')
+
+    return JsonResponse(report.as_dict(), status=201 if report.created else 200)
+
+
+@require_GET
+def suggestions(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', settings.VIDEO_SUGGEST_LIMIT)), 1), settings.VIDEO_SUGGEST_LIMIT)
+    except ValueError:
+        return _error('limit must be a number')
+    found = suggest.suggest(request.GET.get('q', ''), limit)
+    return JsonResponse({'suggestions': [{'pk': pk, 'name': name} for pk, name in found]})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'DELETE'])
+@token_required
+@read_replica
+def video(request, video_pk):
+    try:
+        fields = _fields(request)
+    except BadRequest as e:
+        return _error(str(e))
+
+    found = Video.objects.filter(pk=video_pk).first()
+    if found is None:
+        return _error('Video not found', status=404)
+
+    if request.method == 'DELETE':
+        found.soft_delete()
+        return HttpResponse(status=204)
+
+    return JsonResponse(_serialize(found, fields))
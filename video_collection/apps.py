@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class VideoCollectionConfig(AppConfig):
     name = 'video_collection'
+
+    def ready(self):
+        from . import signals   # noqa: F401  connects the receivers
+        from .search import restore_sqlite_triggers
+        post_migrate.connect(restore_sqlite_triggers, sender=self)
+        from .metrics import install_query_counter
+        connection_created.connect(install_query_counter)
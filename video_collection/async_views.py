@@ -0,0 +1,213 @@
+"""
+Async versions of the read-only views and the JSON API, for ASGI deployments.
+
+They make the same queries as views.py and api.py through the async ORM
+(aget, aaggregate, async iteration), so a request waiting on the database
+doesn't hold a worker thread. urls.py routes to them when the
+VIDEO_ASYNC_VIEWS setting is on, which asgi.py turns on by default.
+
+Django's condition and require_http_methods decorators can't wrap async
+views before Django 5.0, so the conditional GET and the method checks are
+done here directly.
+"""
+
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, prefetch_related_objects
+from django.db.models.functions import Lower
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, \
+    StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import cache_page, LIST_GENERATION, video_generation
+from .models import Video
+from .pagination import KeysetPaginator, InvalidCursor
+from .routers import read_replica
+from .views import search_videos, _video_list_etag, _video_info_etag, _video_list_head_and_tail, \
+    _video_list_rows
+from . import api, auth, lookup
+
+
+def _not_modified(request, etag, last_modified):
+    # a 304 (or 412) response if the client's copy is current, otherwise None
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag,
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None)
+
+
+def _set_validators(response, etag, last_modified):
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    return response
+
+
+@read_replica
+@cache_page(lambda: [LIST_GENERATION])
+async def video_list(request):
+
+    # the tag filter is validated against the database
+    search_form, videos, keys = await sync_to_async(search_videos)(request)
+
+    # the same stats views.video_list uses for its ETag and count, fetched asynchronously
+    request._video_list_stats = stats = await videos.aaggregate(count=Count('pk'), updated=Max('updated'))
+    etag = _video_list_etag(request)
+    not_modified = _not_modified(request, etag, None)   # only the ETag, as views.video_list
+    if not_modified:
+        return not_modified
+
+    paginator = KeysetPaginator(videos.annotate(lower_name=Lower('name')), keys=keys,
+        page_size=settings.VIDEO_LIST_PAGE_SIZE)
+    cursor = request.GET.get('cursor')
+    context = {'video_count': stats['count'], 'search_form': search_form}
+
+    try:
+        if settings.VIDEO_STREAM_LIST:
+            paginator.check(cursor)
+            # the search form's tag choices are queried as the template renders
+            head, tail = await sync_to_async(_video_list_head_and_tail)(request, context)
+
+            async def content():
+                yield head
+                page = await paginator.apage(cursor)
+                rows = await sync_to_async(_video_list_rows)(request, page)
+                yield render_to_string('video_collection/_video_list_rows.html', rows)
+                yield tail
+
+            return _set_validators(StreamingHttpResponse(content()), etag, None)
+        page = await paginator.apage(cursor)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+
+    # the videos not in the fragment cache have their tags queried, and the
+    # search form's tag choices are queried as the template renders
+    def render_page():
+        return render(request, 'video_collection/video_list.html', {**context, **_video_list_rows(request, page)})
+
+    response = await sync_to_async(render_page)()
+    return _set_validators(response, etag, None)
+
+
+@read_replica
+@cache_page(lambda video_pk: [video_generation(video_pk)], vary_on_csrf=True)
+async def video_info(request, video_pk):
+
+    request._video = video = await sync_to_async(lookup.get_video)(video_pk)
+    if video is None:
+        raise Http404('No Video matches the given query.')
+
+    etag = _video_info_etag(request, video_pk)
+    not_modified = _not_modified(request, etag, video.updated)
+    if not_modified:
+        return not_modified
+
+    # tags fetched here, the template can't query from the event loop
+    await sync_to_async(prefetch_related_objects)([video], 'tags')
+
+    response = render(request, 'video_collection/video_info.html', {'video': video})
+    return _set_validators(response, etag, video.updated)
+
+
+@read_replica
+async def videos(request):
+    if request.method not in ('GET', 'POST'):
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    if not auth.authorized(request):
+        return auth.unauthorized()
+
+    try:
+        if request.method == 'POST':
+            return await sync_to_async(api._create)(request)
+        if request.GET.get('format') == 'ndjson' or request.headers.get('Accept') == api.NDJSON:
+            return await _stream(request)
+        return await _page(request)
+    except api.BadRequest as e:
+        return api._error(str(e))
+
+
+videos.csrf_exempt = True   # what @csrf_exempt sets, the decorator itself is sync only, auth.py instead
+
+
+async def _page(request):
+    fields = api._fields(request)
+    _, matches, keys = await sync_to_async(search_videos)(request)
+
+    page_size = settings.VIDEO_API_PAGE_SIZE
+    if 'limit' in request.GET:
+        try:
+            page_size = min(max(int(request.GET['limit']), 1), settings.VIDEO_API_PAGE_SIZE)
+        except ValueError:
+            raise api.BadRequest('limit must be a number')
+
+    paginator = KeysetPaginator(matches.annotate(lower_name=Lower('name')), keys=keys, page_size=page_size)
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise api.BadRequest('Invalid cursor')
+
+    return JsonResponse({
+        'count': await matches.acount(),
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+        'videos': [api._serialize(video, fields) for video in page],
+    })
+
+
+async def _stream(request):
+    fields = api._fields(request)
+    _, matches, keys = await sync_to_async(search_videos)(request)
+
+    rows = matches.annotate(lower_name=Lower('name')).order_by(*keys).values(*fields) \
+        .aiterator(chunk_size=settings.VIDEO_API_CHUNK_SIZE)
+    encoder = DjangoJSONEncoder()
+
+    async def lines():
+        async for row in rows:
+            yield encoder.encode(row) + '\n'
+
+    return StreamingHttpResponse(lines(), content_type=api.NDJSON)
+
+
+@read_replica
+async def video(request, video_pk):
+    if request.method not in ('GET', 'DELETE'):
+        return HttpResponseNotAllowed(['GET', 'DELETE'])
+    if not auth.authorized(request):
+        return auth.unauthorized()
+
+    try:
+        fields = api._fields(request)
+    except api.BadRequest as e:
+        return api._error(str(e))
+
+    found = await Video.objects.filter(pk=video_pk).afirst()
+    if found is None:
+        return api._error('Video not found', status=404)
+
+    if request.method == 'DELETE':
+        await sync_to_async(found.soft_delete)()
+        return HttpResponse(status=204)
+
+    return JsonResponse(api._serialize(found, fields))
+
+
+video.csrf_exempt = True
+
+
+async def bulk_create(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not auth.authorized(request):
+        return auth.unauthorized()
+    return await sync_to_async(api.bulk_create)(request)
+
+
+bulk_create.csrf_exempt = True
@@ -0,0 +1,53 @@
+"""
+Token for the endpoints that write videos for scripts and other services:
+the JSON API's POST and DELETE, and the CSV and JSON Lines import.
+
+They're exempt from CSRF, since their callers have no form to get a token
+from, so they take the VIDEO_API_TOKEN setting instead, sent as
+
+    Authorization: Bearer <token>
+
+A browser won't add that header to a request another site makes it send, so
+the CSRF check isn't needed. Without VIDEO_API_TOKEN set every write through
+them is refused, scripts on the server can use the import_videos command.
+
+The metrics page takes the same token, from a scraper that isn't in
+VIDEO_METRICS_ALLOWED_IPS.
+"""
+
+import functools
+import hmac
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def authorized(request):
+    """ Whether the request is safe, or carries the API token """
+    return request.method in SAFE_METHODS or has_token(request)
+
+
+def has_token(request):
+    """ Whether the request's Authorization header has the API token """
+    token = settings.VIDEO_API_TOKEN
+    scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(given.strip().encode(), token.encode())
+
+
+def unauthorized():
+    response = JsonResponse({'error': 'Send the API token in an Authorization: Bearer header'}, status=401)
+    response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def token_required(view):
+    """ Refuse unsafe requests to a sync view without the API token, with 401 """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not authorized(request):
+            return unauthorized()
+        return view(request, *args, **kwargs)
+    return wrapper
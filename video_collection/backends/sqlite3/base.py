@@ -0,0 +1,51 @@
+"""
+Django's SQLite backend, with pragmas set on every new connection and a
+choice of how transactions begin. Set as the ENGINE in settings.DATABASES:
+
+    'ENGINE': 'video_collection.backends.sqlite3',
+    'OPTIONS': {
+        'pragmas': {'journal_mode': 'wal', 'busy_timeout': 5000},
+        'transaction_mode': 'IMMEDIATE',
+    },
+
+With the default BEGIN (DEFERRED) a transaction that reads and then writes,
+like deleting a video and its tags and playlist entries, asks for the write
+lock at its first write. If another connection wrote since its read began
+SQLite can't hand it the lock at all, and it fails with "database is locked"
+at once, whatever the busy timeout. BEGIN IMMEDIATE takes the write lock up
+front, waiting up to busy_timeout for it.
+
+Django 5.1 has a transaction_mode option of its own, and init_command for
+pragmas. This does the same for 4.2.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # our options, sqlite3.connect() would reject them
+        kwargs.pop('pragmas', None)
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}, '
+                f'not {transaction_mode!r}')
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {transaction_mode.upper()}')
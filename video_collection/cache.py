@@ -0,0 +1,156 @@
+"""
+Response caching for the video pages.
+
+Cached pages are keyed by a generation number as well as the path and query.
+Saving or deleting a video bumps the generation of the list pages and of that
+video's info page (see signals.py), so those keys change and every other
+cached page stays valid. Stale entries are never looked up again and expire
+on their own.
+
+Uses the cache named by the VIDEO_CACHE_ALIAS setting, entries live for
+VIDEO_CACHE_TIMEOUT seconds, 0 turns page caching off.
+"""
+
+import asyncio
+import functools
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+
+
+LIST_GENERATION = 'video_collection:generation:list'
+
+
+def video_generation(pk):
+    return f'video_collection:generation:video:{pk}'
+
+
+def get_cache():
+    return caches[settings.VIDEO_CACHE_ALIAS]
+
+
+def generations(keys):
+    cache = get_cache()
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # start from the clock so a counter that was evicted never
+            # comes back to a number it has already been
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:   # not set yet, nothing cached under it
+            pass
+
+
+def invalidate(keys):
+    # now, and again once the transaction commits, in case a request cached
+    # the old data in between
+    bump(keys)
+    transaction.on_commit(lambda: bump(keys))
+
+
+def invalidate_video(pk):
+    invalidate([LIST_GENERATION, video_generation(pk)])
+
+
+def invalidate_list():
+    invalidate([LIST_GENERATION])
+
+
+def page_key(request, generation_keys, vary_on_csrf):
+    # same search with different case or spacing is the same page
+    params = []
+    for name, values in sorted(request.GET.lists()):
+        if name == 'search_term':
+            values = [' '.join(value.lower().split()) for value in values]
+        params.append((name, values))
+
+    parts = [request.path, repr(params), repr(generations(generation_keys))]
+    if vary_on_csrf:
+        parts.append(request.META['CSRF_COOKIE'])
+
+    digest = hashlib.md5('\n'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'video_collection:page:{digest}'
+
+
+def cache_page(generation_keys, vary_on_csrf=False):
+    """
+    Cache GET responses of a sync or async view. `generation_keys(**view_kwargs)`
+    returns the generation keys whose bump invalidates the page.
+
+    Pages with a form need `vary_on_csrf`: the CSRF token in the form only
+    works with its own cookie, so each cookie gets its own copy of the page,
+    and nothing is cached for a request without one.
+    """
+    def decorator(view):
+
+        if asyncio.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = await sync_to_async(_request_key)(request, generation_keys(**kwargs), vary_on_csrf)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+
+                cache = get_cache()
+                response = await cache.aget(key)
+                if response is not None:
+                    return response
+
+                response = await view(request, *args, **kwargs)
+                if _cacheable(request, response, vary_on_csrf):
+                    await cache.aset(key, response, settings.VIDEO_CACHE_TIMEOUT)
+                return response
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = _request_key(request, generation_keys(**kwargs), vary_on_csrf)
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if _cacheable(request, response, vary_on_csrf):
+                cache.set(key, response, settings.VIDEO_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _request_key(request, generation_keys, vary_on_csrf):
+    # None if the response to this request shouldn't come from the cache
+    if request.method not in ('GET', 'HEAD') or not settings.VIDEO_CACHE_TIMEOUT:
+        return None
+    if len(get_messages(request)):
+        return None   # the page shows messages for this request only, like a warning after adding a video
+    if vary_on_csrf and (not request.META.get('CSRF_COOKIE') or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+        return None   # no CSRF cookie yet, this response sets one
+    return page_key(request, generation_keys, vary_on_csrf)
+
+
+def _cacheable(request, response, vary_on_csrf):
+    # a page that shows a CSRF token it didn't plan for can't be shared
+    uses_csrf = request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    return response.status_code == 200 and not response.streaming and not response.cookies \
+        and (vary_on_csrf or not uses_csrf)
@@ -0,0 +1,194 @@
+"""
+Near-duplicate videos.
+
+The same clip is already caught whatever its URL shape, the URL is reduced
+to its video ID (see youtube.py) and video_id is unique. This finds videos
+with nearly the same name, "Morning Yoga Flow" and "morning yoga flow!" or
+"Mornng Yoga Flow", without comparing every pair of names.
+
+Names are compared as sets of character trigrams of their lowercased words,
+and are near duplicates when the Jaccard similarity of the sets, shared
+trigrams over all trigrams, is at least VIDEO_DUPLICATE_THRESHOLD. Names with
+different numbers in them, "Yoga day 1" and "Yoga day 2", are parts of a
+series, not duplicates.
+
+Candidates are found with MinHash locality sensitive hashing. A name's
+signature is the smallest of its trigrams' hashes under each of HASHES hash
+functions, and two names agree on any one of them with probability equal to
+their similarity. The signature is cut into BANDS bands of ROWS hashes and
+each band hashed to a key, stored in DuplicateKey. Names sharing a key are
+candidates, then checked with the exact similarity. With 10 bands of 3,
+names 0.7 similar share a key 99% of the time, names 0.3 similar 24% of the
+time and unrelated names almost never, so a lookup reads a few rows rather
+than the whole collection.
+"""
+
+import functools
+import hashlib
+import random
+import re
+import struct
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import DuplicateKey, Video
+
+
+# changing any of these changes every key, run find_duplicates --reindex after.
+# Migration 0009 keeps its own copy of them as they were
+BANDS = 10
+ROWS = 3
+HASHES = BANDS * ROWS
+
+# hash functions (a * x + b) mod PRIME, the same in every process
+PRIME = (1 << 61) - 1
+_random = random.Random(20261018)
+_COEFFICIENTS = [(_random.randrange(1, PRIME), _random.randrange(PRIME)) for _ in range(HASHES)]
+
+# keys are (band << KEY_BITS) + a hash of the band, fitting a signed 64 bit column
+KEY_BITS = 58
+
+# the most candidates checked for one name, the ones sharing the most keys
+CANDIDATES = 50
+
+BATCH_SIZE = 2000
+
+WORD = re.compile(r'\w+')
+NUMBER = re.compile(r'\d+')
+
+
+def trigrams(name):
+    """ The set of three character pieces of the name's lowercased words """
+    text = f' {" ".join(WORD.findall(name.lower()))} '
+    if text == '  ':
+        return frozenset()
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def similarity(name, other):
+    """ Jaccard similarity of the two names' trigrams, 0 to 1 """
+    return _jaccard(trigrams(name), trigrams(other))
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def is_duplicate(name, other, threshold=None):
+    if threshold is None:
+        threshold = settings.VIDEO_DUPLICATE_THRESHOLD
+    return NUMBER.findall(name) == NUMBER.findall(other) and similarity(name, other) >= threshold
+
+
+@functools.lru_cache(maxsize=65536)
+def _hashes(trigram):
+    # the trigram under every hash function, the same trigrams recur across names
+    x = int.from_bytes(hashlib.blake2b(trigram.encode(), digest_size=8).digest(), 'big')
+    return tuple((a * x + b) % PRIME for a, b in _COEFFICIENTS)
+
+
+def signature(name):
+    """ MinHash signature of the name's trigrams, None for a name without any """
+    shingles = trigrams(name)
+    if not shingles:
+        return None
+    return tuple(map(min, zip(*map(_hashes, shingles))))
+
+
+def keys(name):
+    """ The name's DuplicateKey keys, one for each band of its signature """
+    minhashes = signature(name)
+    if minhashes is None:
+        return []
+    result = []
+    for band in range(BANDS):
+        rows = struct.pack(f'>{ROWS}Q', *minhashes[band * ROWS:(band + 1) * ROWS])
+        digest = int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big')
+        result.append((band << KEY_BITS) + (digest >> (64 - KEY_BITS)))
+    return result
+
+
+def index(videos):
+    """ Replace the keys of (pk, name) pairs, after videos are added or renamed """
+    videos = list(videos)
+    DuplicateKey.objects.filter(video_id__in=[pk for pk, _ in videos]).delete()
+    DuplicateKey.objects.bulk_create((DuplicateKey(video_id=pk, key=key) for pk, name in videos for key in keys(name)),
+        batch_size=BATCH_SIZE * BANDS)
+
+
+def rebuild():
+    """ Index every video again, return how many """
+    DuplicateKey.objects.all().delete()
+    count = 0
+    batch = []
+    for pk, name in Video.objects.order_by('pk').values_list('pk', 'name').iterator(chunk_size=BATCH_SIZE):
+        batch.extend(DuplicateKey(video_id=pk, key=key) for key in keys(name))
+        count += 1
+        if len(batch) >= BATCH_SIZE * BANDS:
+            DuplicateKey.objects.bulk_create(batch)
+            batch = []
+    DuplicateKey.objects.bulk_create(batch)
+    return count
+
+
+def similar(video, threshold=None):
+    """ Other videos with nearly the same name as `video`, most similar first """
+    candidates = (Video.objects.filter(duplicate_keys__key__in=keys(video.name)).exclude(pk=video.pk)
+        .annotate(shared=Count('duplicate_keys')).order_by('-shared')[:CANDIDATES])
+    matches = [candidate for candidate in candidates if is_duplicate(video.name, candidate.name, threshold)]
+    return sorted(matches, key=lambda candidate: similarity(video.name, candidate.name), reverse=True)
+
+
+def find(threshold=None):
+    """
+    Groups of near-duplicate videos in the whole collection, as lists of
+    (pk, name) in pk order. Only videos sharing a key with another are read,
+    and compared with the others sharing that key.
+    """
+    if threshold is None:
+        threshold = settings.VIDEO_DUPLICATE_THRESHOLD
+
+    shared_keys = DuplicateKey.objects.values('key').annotate(count=Count('pk')).filter(count__gt=1).values('key')
+    rows = (DuplicateKey.objects.filter(key__in=shared_keys, video__deleted_at__isnull=True).order_by('key', 'video_id')
+        .values_list('key', 'video_id', 'video__name').iterator(chunk_size=BATCH_SIZE))
+
+    names = {}
+    features = {}   # numbers and trigrams of each name
+    parents = {}
+
+    def root(pk):
+        while parents[pk] != pk:
+            parents[pk] = parents[parents[pk]]
+            pk = parents[pk]
+        return pk
+
+    def compare_bucket(bucket):
+        # only names with the same numbers can be duplicates, most buckets have no pairs to compare
+        by_numbers = {}
+        for pk in bucket:
+            by_numbers.setdefault(features[pk][0], []).append(pk)
+        for group in by_numbers.values():
+            for i, pk in enumerate(group):
+                for other in group[:i]:
+                    if root(pk) != root(other) and _jaccard(features[pk][1], features[other][1]) >= threshold:
+                        parents[root(pk)] = root(other)
+
+    bucket, bucket_key = [], None
+    for key, pk, name in rows:
+        if key != bucket_key:
+            compare_bucket(bucket)
+            bucket, bucket_key = [], key
+        if pk not in names:
+            names[pk] = name
+            features[pk] = (tuple(NUMBER.findall(name)), trigrams(name))
+            parents[pk] = pk
+        bucket.append(pk)
+    compare_bucket(bucket)
+
+    groups = {}
+    for pk in parents:
+        groups.setdefault(root(pk), []).append(pk)
+    return [[(pk, names[pk]) for pk in sorted(group)] for group in sorted(groups.values(), key=min) if len(group) > 1]
@@ -0,0 +1,255 @@
+"""
+Fills in the YouTube title, duration, channel and thumbnail of videos.
+
+A Fetcher looks up metadata for a batch of video IDs. YouTubeFetcher asks the
+YouTube Data API, up to 50 IDs a call, over a pooled HTTP session, waiting
+on a per-host rate limit and retrying failed calls with exponential backoff.
+Tests point it at a local stub of the API with the VIDEO_YOUTUBE_API_URL
+setting.
+
+enrich() splits the videos into batches and fetches them on a bounded thread
+pool. The results are saved from the calling thread, so the worker threads
+never touch the database. Run it with the enrich_videos command.
+"""
+
+import abc
+import collections
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import parse
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_duration
+
+from . import cache, lookup
+from .models import Video
+
+
+VideoMetadata = collections.namedtuple('VideoMetadata', 'video_id title duration channel thumbnail_url')
+
+# statuses worth asking again for, anything else is the request's fault
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class FetchError(Exception):
+    pass
+
+
+class Fetcher(abc.ABC):
+    """ Looks up metadata for videos by ID, in batches of up to `batch_size` """
+
+    batch_size = 50
+
+    @abc.abstractmethod
+    def fetch(self, video_ids):
+        """ Return {video ID: VideoMetadata} for the IDs found, raise FetchError if the lookup fails """
+
+
+class RateLimiter:
+    """ Spaces calls to wait() so there are at most `rate` a second, after an initial burst of `burst` """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # take a token even if there isn't one yet, and sleep until it's due,
+            # so waiting threads queue up in order without holding the lock
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def rate_limiter(host):
+    """ The rate limiter shared by every fetcher calling `host`, None if VIDEO_ENRICH_RATE is 0 """
+    if not settings.VIDEO_ENRICH_RATE:
+        return None
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter(settings.VIDEO_ENRICH_RATE, burst=settings.VIDEO_ENRICH_WORKERS)
+        return _rate_limiters[host]
+
+
+class YouTubeFetcher(Fetcher):
+    """ Fetcher for the videos endpoint of the YouTube Data API v3 """
+
+    def __init__(self, api_key, url, retries=3, backoff=1.0, timeout=10, pool_size=10):
+        self.api_key = api_key
+        self.url = url
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter(parse.urlsplit(url).netloc)
+
+        # one keep-alive connection pool shared by the worker threads
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, video_ids):
+        data = self._get({'part': 'snippet,contentDetails', 'id': ','.join(video_ids), 'key': self.api_key,
+            'maxResults': self.batch_size})
+        try:
+            return {item['id']: self._metadata(item) for item in data.get('items', [])}
+        except (KeyError, TypeError, AttributeError) as e:
+            raise FetchError(f'Unexpected response from {self.url}: {e!r}') from e
+
+    def _get(self, params):
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.wait()
+
+            retry_after = None
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = f'Unable to reach {self.url}: {e}'
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise FetchError(f'Response from {self.url} is not JSON') from e
+                error = f'{response.status_code} from {self.url}: {response.text[:200]}'
+                if response.status_code not in RETRY_STATUSES:
+                    raise FetchError(error)
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt < self.retries:
+                if retry_after and retry_after.isdigit():
+                    time.sleep(int(retry_after))
+                else:
+                    # jittered, so threads that failed together don't retry together
+                    time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        raise FetchError(error)
+
+    def _metadata(self, item):
+        snippet = item.get('snippet', {})
+        thumbnails = snippet.get('thumbnails', {})
+        # largest thumbnail that fits the 420 pixel wide player
+        thumbnail = thumbnails.get('high') or thumbnails.get('medium') or thumbnails.get('default') or {}
+        return VideoMetadata(
+            video_id=item['id'],
+            title=snippet.get('title', '')[:200],
+            duration=parse_duration(item.get('contentDetails', {}).get('duration', '')),
+            channel=snippet.get('channelTitle', '')[:200],
+            thumbnail_url=thumbnail.get('url', '')[:400],
+        )
+
+
+def get_fetcher():
+    if not settings.VIDEO_YOUTUBE_API_KEY:
+        raise ImproperlyConfigured('Set VIDEO_YOUTUBE_API_KEY, or the YOUTUBE_API_KEY environment variable, '
+            'to fetch video metadata')
+    return _youtube_fetcher(settings.VIDEO_YOUTUBE_API_KEY, settings.VIDEO_YOUTUBE_API_URL,
+        settings.VIDEO_ENRICH_WORKERS)
+
+
+@functools.lru_cache(maxsize=1)
+def _youtube_fetcher(api_key, url, pool_size):
+    # one per process, so workers reuse its connections from one batch to the next
+    return YouTubeFetcher(api_key, url, pool_size=pool_size)
+
+
+class EnrichReport:
+
+    def __init__(self):
+        self.enriched = 0
+        self.missing = 0   # not found on YouTube, deleted or private
+        self.failed = []   # (video IDs, error message) for each failed batch
+
+    @property
+    def failed_count(self):
+        return sum(len(video_ids) for video_ids, _ in self.failed)
+
+
+def enrich(videos=None, fetcher=None, workers=None):
+    """
+    Fetch and save metadata for `videos`, a queryset, by default every video
+    that hasn't been enriched yet. Videos in a failed batch are left as they
+    were, to be tried again next time.
+    """
+    if videos is None:
+        videos = Video.objects.filter(enriched_at__isnull=True)
+    fetcher = fetcher or get_fetcher()
+    workers = workers or settings.VIDEO_ENRICH_WORKERS
+
+    report = EnrichReport()
+
+    def fetch(batch):
+        try:
+            return batch, fetcher.fetch(batch), None
+        except FetchError as e:
+            return batch, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map() would queue every batch up front, keep at most two per worker in flight
+        pending = collections.deque()
+        for batch in _batches(videos, fetcher.batch_size):
+            pending.append(executor.submit(fetch, batch))
+            if len(pending) >= workers * 2:
+                _save(*pending.popleft().result(), report)
+        while pending:
+            _save(*pending.popleft().result(), report)
+
+    return report
+
+
+def _batches(videos, size):
+    # lists of video IDs in pk order, a query per batch rather than one cursor
+    # held open while the batches before it are saved
+    last = 0
+    while True:
+        rows = list(videos.filter(pk__gt=last).order_by('pk').values_list('pk', 'video_id')[:size])
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [video_id for _, video_id in rows]
+
+
+def _save(batch, found, error, report):
+    if error:
+        report.failed.append((batch, error))
+        return
+
+    now = timezone.now()
+    videos = list(Video.objects.filter(video_id__in=batch))
+    for video in videos:
+        metadata = found.get(video.video_id)
+        if metadata:
+            video.title = metadata.title
+            video.duration = metadata.duration
+            video.channel = metadata.channel
+            video.thumbnail_url = metadata.thumbnail_url
+            report.enriched += 1
+        else:
+            report.missing += 1
+        video.enriched_at = now
+        video.updated = now   # bulk_update skips auto_now, and the pages' ETags depend on it
+
+    with transaction.atomic():
+        Video.objects.bulk_update(videos, ['title', 'duration', 'channel', 'thumbnail_url', 'enriched_at', 'updated'])
+        # no post_save signals from bulk_update
+        cache.invalidate([cache.LIST_GENERATION] + [cache.video_generation(video.pk) for video in videos])
+        lookup.forget([video.pk for video in videos])
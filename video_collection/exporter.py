@@ -0,0 +1,119 @@
+"""
+Export of the whole video collection as CSV or JSON Lines, optionally gzipped.
+
+Rows come from values_list() through iterator(), a chunk of
+VIDEO_EXPORT_CHUNK_SIZE rows at a time, and are encoded and written as they
+arrive. No model instances are built and the export is never held in memory
+whole, so memory use doesn't grow with the collection. The CSV has the
+name, url and notes columns import_videos reads, so an export can be
+imported again.
+"""
+
+import csv
+import time
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Video
+
+
+FORMATS = ('csv', 'jsonl')
+
+FIELDS = ('name', 'url', 'notes', 'video_id', 'title', 'duration', 'channel', 'thumbnail_url', 'created', 'updated')
+
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+# output is written in pieces of about this many bytes, rather than a line at a time
+WRITE_SIZE = 64 * 1024
+
+
+class ExportStats:
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def __str__(self):
+        seconds = self.seconds
+        return (f'Exported {self.rows} videos, {self.bytes / 1e6:.1f} MB in {seconds:.1f}s, '
+            f'{self.rows / seconds if seconds else 0:.0f} videos/s')
+
+
+def export(format, gzip=False, videos=None, stats=None):
+    """ Yield `videos`, every video by default, as bytes of a file in `format` """
+    exported = rows(videos)
+    if stats:
+        exported = counted(exported, stats)
+    return encode(lines(exported, format), gzip, stats)
+
+
+def rows(videos=None, chunk_size=None):
+    """ Yield a tuple of FIELDS for each of `videos`, every video by default, in pk order """
+    if videos is None:
+        videos = Video.objects.all()
+    return videos.order_by('pk').values_list(*FIELDS).iterator(
+        chunk_size=chunk_size or settings.VIDEO_EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    # file-like object for csv.writer, hands each formatted row straight back
+    def write(self, value):
+        return value
+
+
+def lines(rows, format):
+    """ Yield the export in `format` one line of text at a time, starting with any header """
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+
+    elif format == 'jsonl':
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(FIELDS, row))) + '\n'
+
+    else:
+        raise ValueError(f'Unknown export format {format}, expected one of {", ".join(FORMATS)}')
+
+
+def encode(lines, gzip=False, stats=None):
+    """ Yield the lines as UTF-8 bytes, gzipped if `gzip`, in pieces of about WRITE_SIZE bytes """
+    compressor = zlib.compressobj(wbits=31) if gzip else None   # 31 makes a gzip file, not a raw zlib stream
+    pending = []
+    pending_size = 0
+
+    for line in lines:
+        data = line.encode()
+        if compressor:
+            data = compressor.compress(data)   # often nothing, until zlib has a block's worth
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+
+        if pending_size >= WRITE_SIZE:
+            if stats:
+                stats.bytes += pending_size
+            yield b''.join(pending)
+            pending, pending_size = [], 0
+
+    if compressor:
+        pending.append(compressor.flush())
+        pending_size += len(pending[-1])
+    if stats:
+        stats.bytes += pending_size
+    yield b''.join(pending)
+
+
+def counted(rows, stats):
+    for row in rows:
+        stats.rows += 1
+        yield row
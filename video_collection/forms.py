@@ -1,5 +1,6 @@
 from django import forms
-from .models import Video
+from .models import Tag, Video
+from . import search
 
 
 class VideoForm(forms.ModelForm):
@@ -11,5 +12,17 @@ class VideoForm(forms.ModelForm):
 
 class SearchForm(forms.Form):
 
-    search_term = forms.CharField()
-    
\ No newline at end of file
+    # suggestions from api/videos/suggest as you type, see suggest.js
+    search_term = forms.CharField(required=False,
+        widget=forms.TextInput(attrs={'list': 'video-suggestions', 'autocomplete': 'off'}))
+    tag = forms.ModelChoiceField(Tag.objects.all(), required=False, to_field_name='slug', empty_label='Any tag')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('search_term') and not cleaned_data.get('tag'):
+            raise forms.ValidationError('Enter a search term or choose a tag')
+        return cleaned_data
+
+    def get_backend(self):
+        # full text search where the database supports it, see search.py
+        return search.get_backend()
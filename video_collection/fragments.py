@@ -0,0 +1,66 @@
+"""
+Cached HTML of each video on the video list.
+
+The list renders each video with _video_list_item.html, and caches the HTML
+under the video's pk and updated time. Saving a video, or changing its tags
+(see signals.touch_videos), moves updated on, so a changed video gets a new
+key and is rendered again while the rest of the page comes from the cache.
+Only the videos missing from the cache have their tags fetched.
+
+Keys also hold a hash of the templates, so a deploy that changes them
+doesn't serve HTML rendered from the old ones. Uses the page cache
+(VIDEO_CACHE_ALIAS), entries live for VIDEO_FRAGMENT_CACHE_TIMEOUT seconds,
+0 renders every video every time.
+"""
+
+import functools
+import hashlib
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.template import Engine
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .cache import get_cache
+
+
+ITEM_TEMPLATE = 'video_collection/_video_list_item.html'
+
+# the item template and the templates it includes
+TEMPLATES = [ITEM_TEMPLATE, 'video_collection/_tags.html', 'video_collection/_player.html']
+
+# where the rows go in a video list page rendered with streamed=True
+ROWS_MARKER = '<!-- video rows -->'
+
+
+@functools.lru_cache(maxsize=None)
+def template_version():
+    engine = Engine.get_default()
+    sources = [engine.get_template(name).source for name in TEMPLATES]
+    return hashlib.md5('\n'.join(sources).encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def fragment_key(video):
+    return f'video_collection:fragment:{template_version()}:{video.pk}:{video.updated.timestamp()}'
+
+
+def render_items(videos):
+    """ The HTML of each of `videos`, from the cache or rendered and cached """
+    videos = list(videos)
+    timeout = settings.VIDEO_FRAGMENT_CACHE_TIMEOUT
+    keys = [fragment_key(video) for video in videos]
+    cache = get_cache()
+    found = cache.get_many(keys) if timeout else {}
+
+    missing = [(key, video) for key, video in zip(keys, videos) if key not in found]
+    if missing:
+        # the tags of only the videos being rendered, in one query
+        prefetch_related_objects([video for _, video in missing], 'tags')
+        template = get_template(ITEM_TEMPLATE)
+        rendered = {key: str(template.render({'video': video})) for key, video in missing}
+        if timeout:
+            cache.set_many(rendered, timeout)
+        found.update(rendered)
+
+    return [mark_safe(found[key]) for key in keys]
@@ -0,0 +1,138 @@
+"""
+Bulk import of videos from CSV or JSON Lines exports.
+
+Rows are read lazily and handled in chunks. Each row is validated with
+VideoForm and its video ID found with the same parser as Video.save(). Each
+chunk is then inserted with one bulk_create. The whole import runs in one
+transaction. A bad row is recorded in the report with its line number and
+doesn't stop the rows around it.
+"""
+
+import csv
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import cache, duplicates, jobs, lookup
+from .forms import VideoForm
+from .models import Video, extract_video_id
+
+
+FORMATS = ('csv', 'jsonl')
+
+BATCH_SIZE = 1000
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.created = 0
+        self.duplicates = 0
+        self.rejected = []   # (line number, [error messages])
+
+    def reject(self, line, errors):
+        self.rejected.append((line, errors))
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'rejected': [{'line': line, 'errors': errors} for line, errors in self.rejected],
+        }
+
+
+def read_rows(lines, format):
+    """ Yield (line number, row dict or None, parse error or None) from an iterable of text lines """
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, row, None
+        except csv.Error as e:
+            yield reader.line_num, None, f'Unable to parse CSV: {e}'
+
+    elif format == 'jsonl':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Unable to parse JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, row, None
+
+    else:
+        raise ValueError(f'Unknown import format {format}, expected one of {", ".join(FORMATS)}')
+
+
+def import_rows(rows, batch_size=BATCH_SIZE):
+    """ Import (line number, row, error) tuples from read_rows, return an ImportReport """
+    rows = iter(rows)
+    report = ImportReport()
+    seen = set()   # video IDs from earlier rows of this import
+
+    with transaction.atomic():
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+
+            videos = []
+            for line, row, error in chunk:
+                if error:
+                    report.reject(line, [error])
+                    continue
+
+                video = _validate(line, row, report)
+                if video is None:
+                    continue
+                if video.video_id in seen:
+                    report.duplicates += 1
+                    continue
+
+                seen.add(video.video_id)
+                videos.append(video)
+
+            # one query per chunk to count videos already in the database, the
+            # unique constraint and ignore_conflicts still skip any added meanwhile
+            existing = set(Video.objects.filter(video_id__in=[video.video_id for video in videos])
+                .values_list('video_id', flat=True))
+            new_videos = [video for video in videos if video.video_id not in existing]
+
+            Video.objects.bulk_create(new_videos, ignore_conflicts=True)
+            jobs.enqueue_enrichment([video.video_id for video in new_videos])
+            if new_videos:
+                # ignore_conflicts leaves the new videos without pks, they're read back to index their names
+                duplicates.index(Video.objects.filter(video_id__in=[video.video_id for video in new_videos])
+                    .values_list('pk', 'name'))
+            # their IDs may have been looked up, and cached as missing, before
+            lookup.forget(video_ids=[video.video_id for video in new_videos])
+            report.created += len(new_videos)
+            report.duplicates += len(existing)
+
+    # bulk_create doesn't send post_save, so the cached list pages are invalidated here
+    if report.created:
+        cache.invalidate_list()
+
+    return report
+
+
+def _validate(line, row, report):
+    form = VideoForm({field: row.get(field) for field in VideoForm.Meta.fields})
+    if not form.is_valid():
+        report.reject(line, [f'{field}: {message}' for field, messages in form.errors.items() for message in messages])
+        return None
+
+    video = form.save(commit=False)
+    try:
+        video.video_id = extract_video_id(video.url)
+    except ValidationError as e:
+        report.reject(line, e.messages)
+        return None
+    return video
@@ -0,0 +1,211 @@
+"""
+Database backed job queue, for work that shouldn't hold up a request.
+
+enqueue() adds a Job row in the caller's transaction, so a job is queued if
+and only if the change that needs it is saved. Jobs for a video are
+de-duplicated: while one is queued or running, queueing another for the same
+kind and video does nothing.
+
+Workers, see the run_workers command, claim due jobs and run the handler
+registered for their kind. Postgres claims with SELECT ... FOR UPDATE SKIP
+LOCKED. SQLite has no row locks, so a claim there is an UPDATE that only
+takes rows that are still due, and any a concurrent worker got first are
+simply not taken. A handler may take a batch of jobs of its kind at once.
+
+A job whose handler raises is retried after VIDEO_JOB_RETRY_DELAY seconds,
+doubling each time, and after VIDEO_JOB_MAX_ATTEMPTS attempts it's marked
+dead and left in the table. A job still running after VIDEO_JOB_TIMEOUT
+seconds is assumed to have lost its worker and is claimed again.
+"""
+
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import Job, Video
+
+
+log = logging.getLogger(__name__)
+
+
+class Handler:
+
+    def __init__(self, func, batch_size):
+        self.func = func
+        self.batch_size = batch_size
+
+
+HANDLERS = {}
+
+
+def handler(kind, batch_size=1):
+    """ Register the decorated function to run jobs of `kind`, a list of up to `batch_size` at a time """
+    def decorator(func):
+        HANDLERS[kind] = Handler(func, batch_size)
+        return func
+    return decorator
+
+
+class JobError(Exception):
+    """ Raised by a handler to fail its jobs with a message, without a traceback """
+
+
+def enqueue(kind, video_id='', payload=None):
+    enqueue_many(kind, [video_id], payload)
+
+
+def enqueue_many(kind, video_ids, payload=None):
+    """ Queue a job of `kind` for each video ID, skipping videos that have one queued already """
+    # the conditional unique constraint turns the duplicates into ignored conflicts
+    Job.objects.bulk_create([Job(kind=kind, video_id=video_id, payload=payload or {}) for video_id in video_ids],
+        ignore_conflicts=True)
+
+
+def enqueue_enrichment(video_ids):
+    """ Queue fetching YouTube metadata for the videos, if there's an API key to fetch it with """
+    if settings.VIDEO_YOUTUBE_API_KEY:
+        enqueue_many('enrich', video_ids)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """ Mark a batch of due jobs, all of one kind, as running for `worker` and return them """
+    now = timezone.now()
+    due = Q(status=Job.PENDING, run_after__lte=now) \
+        | Q(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.VIDEO_JOB_TIMEOUT))
+    queue = Job.objects.filter(due).order_by('run_after', 'pk')
+
+    kind = queue.values_list('kind', flat=True).first()
+    if kind is None:
+        return []
+    batch_size = HANDLERS[kind].batch_size if kind in HANDLERS else 1
+    queue = queue.filter(kind=kind)
+
+    token = f'{worker}:{uuid.uuid4().hex}'
+    running = {'status': Job.RUNNING, 'locked_by': token, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(queue.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+            Job.objects.filter(pk__in=pks).update(**running)
+    else:
+        # compare and swap, the UPDATE checks again that each row is due
+        pks = list(queue.values_list('pk', flat=True)[:batch_size])
+        Job.objects.filter(due, pk__in=pks).update(**running)
+
+    return list(Job.objects.filter(locked_by=token).order_by('pk'))
+
+
+def run_next(worker):
+    """ Claim and run one batch of jobs, return how many were claimed """
+    jobs = claim(worker)
+    if not jobs:
+        return 0
+
+    # a job that keeps timing out never gets to fail, stop it here
+    expired = [job for job in jobs if job.attempts > settings.VIDEO_JOB_MAX_ATTEMPTS]
+    if expired:
+        _fail(expired, 'Timed out on every attempt')
+        jobs = [job for job in jobs if job not in expired]
+        if not jobs:
+            return len(expired)
+
+    kind = jobs[0].kind
+    try:
+        if kind not in HANDLERS:
+            raise JobError(f'No handler for {kind} jobs')
+        HANDLERS[kind].func(jobs)
+    except JobError as e:
+        _fail(jobs, str(e))
+    except Exception:
+        log.exception('%s jobs %s failed', kind, ', '.join(str(job.pk) for job in jobs))
+        _fail(jobs, traceback.format_exc())
+    else:
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+
+    return len(jobs) + len(expired)
+
+
+def _fail(jobs, error):
+    now = timezone.now()
+    for job in jobs:
+        job.last_error = error
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts >= settings.VIDEO_JOB_MAX_ATTEMPTS:
+            job.status = Job.DEAD
+            log.error('%s gave up: %s', job, error)
+        else:
+            job.status = Job.PENDING
+            job.run_after = now + timedelta(seconds=settings.VIDEO_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    Job.objects.bulk_update(jobs, ['status', 'run_after', 'last_error', 'locked_by', 'locked_at'])
+
+
+def work(worker=None, burst=False, stop=None):
+    """
+    Run jobs until `stop`, a threading or multiprocessing Event, is set. With
+    `burst`, return as soon as no job is due. Returns how many jobs were run.
+    """
+    worker = worker or worker_name()
+    count = 0
+    while not (stop and stop.is_set()):
+        close_old_connections()   # as at the start of a request, drop broken or expired connections
+        claimed = run_next(worker)
+        count += claimed
+        if not claimed:
+            if burst:
+                break
+            if stop:
+                stop.wait(settings.VIDEO_JOB_POLL_INTERVAL)
+            else:
+                time.sleep(settings.VIDEO_JOB_POLL_INTERVAL)
+    return count
+
+
+def retry_dead(kind=None):
+    """ Queue dead jobs to run again from their first attempt, return how many """
+    dead = Job.objects.filter(status=Job.DEAD)
+    if kind:
+        dead = dead.filter(kind=kind)
+
+    # a video may have had a new job queued since, that one will do
+    queued = Job.objects.filter(status__in=[Job.PENDING, Job.RUNNING], kind=OuterRef('kind'),
+        video_id=OuterRef('video_id')).exclude(video_id='')
+    dead.filter(Exists(queued)).delete()
+
+    return dead.update(status=Job.PENDING, attempts=0, run_after=timezone.now(), last_error='')
+
+
+@handler('enrich', batch_size=50)
+def enrich_videos(jobs):
+    from . import enrichment   # and requests, imported by the workers that run these jobs only
+
+    report = enrichment.enrich(Video.objects.filter(video_id__in=[job.video_id for job in jobs]), workers=1)
+    if report.failed:
+        raise JobError('; '.join(error for _, error in report.failed))
+
+
+@handler('import')
+def import_file(jobs):
+    from . import importer   # which imports this module to queue enrichment
+
+    for job in jobs:
+        path, format = job.payload['path'], job.payload['format']
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                report = importer.import_rows(importer.read_rows(file, format))
+        except OSError as e:
+            raise JobError(f'Unable to read {path}: {e}') from e
+        log.info('Imported %s: %s', path, report.as_dict())
@@ -0,0 +1,150 @@
+"""
+Read-through cache of single videos, by pk and by YouTube video ID, for the
+pages that look one video up: video_info, and delete_video.
+
+A lookup tries this process's LRU of recently found videos, then the shared
+cache if VIDEO_LOOKUP_SHARED, then the database, and keeps what it found in
+the caches it missed. A video that isn't there, or is deleted, is kept too,
+for VIDEO_LOOKUP_MISSING_TIMEOUT seconds, so a crawler asking for pks that
+don't exist gets its 404s without a query each.
+
+Saving or deleting a video forgets it here and in the shared cache, now and
+again once the transaction commits (see signals.py), and so do the bulk
+updates that don't send signals. Other processes' LRUs aren't told, their
+entries only last VIDEO_LOOKUP_LOCAL_TIMEOUT seconds.
+
+The cached values are the video's field values, not the instance, so every
+lookup returns a new Video, with nothing prefetched on it. Hits, misses and
+evictions are counted on the metrics page.
+"""
+
+import collections
+import threading
+import time
+
+from django.conf import settings
+from django.db import router, transaction
+
+from .cache import get_cache
+from .models import Video
+from . import metrics
+
+
+FIELDS = [field.attname for field in Video._meta.concrete_fields]
+
+# cached for a video that isn't there, cache.get() gives None for no entry
+MISSING = 0
+
+
+def pk_key(pk):
+    return f'video_collection:video:{pk}'
+
+
+def video_id_key(video_id):
+    return f'video_collection:video_id:{video_id}'
+
+
+_local = collections.OrderedDict()   # key: (expires, value), least recently used first
+_lock = threading.Lock()
+
+
+def get_video(pk):
+    """ The video with this pk, None if there's none or it's deleted """
+    values = _get(pk_key(pk), lambda: Video.objects.filter(pk=pk).values_list(*FIELDS).first())
+    if not values:
+        return None
+    return Video.from_db(router.db_for_read(Video), FIELDS, values)
+
+
+def get_video_by_video_id(video_id):
+    """ The video of this YouTube video ID, None if there's none or it's deleted """
+    pk = _get(video_id_key(video_id), lambda: Video.objects.filter(video_id=video_id).values_list('pk', flat=True).first())
+    if not pk:
+        return None
+    video = get_video(pk)
+    if video is None or video.video_id != video_id:
+        # its URL was changed, or it was deleted, by a process that didn't know the ID pointed to it
+        forget(video_ids=[video_id])
+        return Video.objects.filter(video_id=video_id).first()
+    return video
+
+
+def forget(pks=(), video_ids=()):
+    """ Drop these videos from the caches, now and once the transaction commits """
+    keys = [pk_key(pk) for pk in pks] + [video_id_key(video_id) for video_id in video_ids if video_id]
+    if keys:
+        _forget(keys)
+        transaction.on_commit(lambda: _forget(keys))
+
+
+def reset():
+    with _lock:
+        _local.clear()
+
+
+def _forget(keys):
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+    if settings.VIDEO_LOOKUP_SHARED:
+        get_cache().delete_many(keys)
+
+
+def _get(key, query):
+    if not settings.VIDEO_LOOKUP_TIMEOUT:
+        return query()
+
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _local.move_to_end(key)
+            value = entry[1]
+        else:
+            value = None
+    if value is not None:
+        _count_hit('local', value)
+        return value
+
+    shared = get_cache() if settings.VIDEO_LOOKUP_SHARED else None
+    if shared is not None:
+        value = shared.get(key)
+        if value is not None:
+            _count_hit('shared', value)
+            _remember(key, value)
+            return value
+
+    value = query()
+    if value is None:
+        value = MISSING
+    metrics.count('video_lookup_cache_misses_total', result=_result(value))
+    if shared is not None:
+        shared.set(key, value, _timeout(value))
+    _remember(key, value)
+    return value
+
+
+def _remember(key, value):
+    if settings.VIDEO_LOOKUP_CACHE_SIZE <= 0:
+        return
+    expires = time.monotonic() + min(settings.VIDEO_LOOKUP_LOCAL_TIMEOUT, _timeout(value))
+    evicted = 0
+    with _lock:
+        _local[key] = (expires, value)
+        _local.move_to_end(key)
+        while len(_local) > settings.VIDEO_LOOKUP_CACHE_SIZE:
+            _local.popitem(last=False)
+            evicted += 1
+    if evicted:
+        metrics.count('video_lookup_cache_evictions_total', evicted)
+
+
+def _timeout(value):
+    return settings.VIDEO_LOOKUP_TIMEOUT if value != MISSING else settings.VIDEO_LOOKUP_MISSING_TIMEOUT
+
+
+def _result(value):
+    return 'found' if value != MISSING else 'missing'
+
+
+def _count_hit(layer, value):
+    metrics.count('video_lookup_cache_hits_total', layer=layer, result=_result(value))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ImproperlyConfigured
+
+from video_collection import enrichment
+from video_collection.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Fill in the title, duration, channel and thumbnail of videos from the YouTube Data API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+            help='Fetch again for every video, not only the ones never fetched')
+        parser.add_argument('--workers', type=int, help='Lookups running at once, VIDEO_ENRICH_WORKERS by default')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.all() if options['all'] else Video.objects.filter(enriched_at__isnull=True)
+        try:
+            report = enrichment.enrich(videos, workers=options['workers'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e)) from e
+
+        for video_ids, error in report.failed:
+            self.stderr.write(f'Failed for {", ".join(video_ids)}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Enriched {report.enriched} videos, {report.missing} not found on YouTube, {report.failed_count} failed'))
@@ -0,0 +1,48 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_collection import exporter
+
+
+class Command(BaseCommand):
+    help = 'Export every video to a CSV or JSON Lines file, gzipped if the file name ends in .gz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='File to write, or - for standard output')
+        parser.add_argument('--format', choices=exporter.FORMATS,
+            help='File format, by default from the file extension')
+        parser.add_argument('--gzip', action='store_true', help='Compress with gzip')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name, extension = os.path.splitext(path)
+        gzip = options['gzip'] or extension == '.gz'
+        if extension == '.gz':
+            extension = os.path.splitext(name)[1]
+
+        format = options['format'] or extension.lstrip('.').lower() or 'csv'
+        if format == 'json':
+            format = 'jsonl'
+        if format not in exporter.FORMATS:
+            raise CommandError(f'Unknown format for {path}, use --format')
+
+        stats = exporter.ExportStats()
+        chunks = exporter.export(format, gzip, stats=stats)
+        if path == '-':
+            self._write(sys.stdout.buffer, chunks)
+            sys.stdout.buffer.flush()
+        else:
+            try:
+                with open(path, 'wb') as file:
+                    self._write(file, chunks)
+            except OSError as e:
+                raise CommandError(f'Unable to write {path}: {e}') from e
+
+        # on stderr, stdout may be the export itself
+        self.stderr.write(self.style.SUCCESS(str(stats)))
+
+    def _write(self, file, chunks):
+        for chunk in chunks:
+            file.write(chunk)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from video_collection import duplicates
+
+
+class Command(BaseCommand):
+    help = 'List groups of videos with nearly the same name, found through the index of name keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float,
+            help='How alike names must be, from 0 to 1, VIDEO_DUPLICATE_THRESHOLD by default')
+        parser.add_argument('--reindex', action='store_true',
+            help='Index every video first, for videos added without Video.save() or the importer')
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is not None and not 0 < threshold <= 1:
+            raise CommandError('--threshold must be between 0 and 1')
+
+        if options['reindex']:
+            self.stderr.write(f'Indexed {duplicates.rebuild()} videos')
+
+        groups = duplicates.find(threshold)
+        for group in groups:
+            self.stdout.write('\n'.join(f'{pk}\t{name}' for pk, name in group) + '\n')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {len(groups)} groups of near duplicates, {sum(map(len, groups))} videos'))
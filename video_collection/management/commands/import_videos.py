@@ -0,0 +1,51 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_collection import importer, jobs
+
+
+class Command(BaseCommand):
+    help = 'Import videos from a CSV file (name, url, notes columns) or a JSON Lines file of objects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input')
+        parser.add_argument('--format', choices=importer.FORMATS,
+            help='File format, by default from the file extension')
+        parser.add_argument('--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Rows validated and inserted together')
+        parser.add_argument('--queue', action='store_true',
+            help='Leave the import to a background worker, see run_workers')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if format == 'json':
+            format = 'jsonl'
+        if format not in importer.FORMATS:
+            raise CommandError(f'Unknown format for {path}, use --format')
+
+        if options['queue']:
+            if path == '-':
+                raise CommandError('Only a file can be queued, not standard input')
+            if not os.path.isfile(path):
+                raise CommandError(f'No file {path}')
+            jobs.enqueue('import', payload={'path': os.path.abspath(path), 'format': format})
+            self.stdout.write(self.style.SUCCESS(f'Queued import of {path}'))
+            return
+
+        if path == '-':
+            report = importer.import_rows(importer.read_rows(sys.stdin, format), options['batch_size'])
+        else:
+            try:
+                with open(path, newline='', encoding='utf-8') as file:
+                    report = importer.import_rows(importer.read_rows(file, format), options['batch_size'])
+            except OSError as e:
+                raise CommandError(f'Unable to read {path}: {e}') from e
+
+        for line, errors in report.rejected:
+            self.stderr.write(f'Line {line}: {"; ".join(errors)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} videos, {report.duplicates} duplicates skipped, {len(report.rejected)} rejected'))
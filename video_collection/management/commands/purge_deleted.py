@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from video_collection.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Delete videos for good once they have been deleted for longer than the undo window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None,
+            help='Seconds since they were deleted, VIDEO_UNDO_DELETE_SECONDS by default')
+        parser.add_argument('--batch-size', type=int, default=500,
+            help='Videos deleted in each transaction')
+        parser.add_argument('--pause', type=float, default=0.1,
+            help='Seconds to wait between batches, letting other writers in')
+
+    def handle(self, *args, **options):
+        older_than = options['older_than']
+        if older_than is None:
+            older_than = settings.VIDEO_UNDO_DELETE_SECONDS
+        if older_than < 0 or options['batch_size'] < 1:
+            raise CommandError('--older-than and --batch-size must be positive')
+
+        before = timezone.now() - timedelta(seconds=older_than)
+        purged = 0
+        # oldest first, in the order of the index of deleted videos
+        deleted = Video.all_objects.filter(deleted_at__lt=before).order_by('deleted_at', 'pk')
+        for count in deleted.purge(options['batch_size']):
+            purged += count
+            if options['verbosity'] > 1:
+                self.stderr.write(f'Purged {purged} videos')
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} deleted videos'))
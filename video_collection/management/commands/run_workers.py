@@ -0,0 +1,62 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from video_collection import jobs
+
+
+def _work(stop, burst):
+    # in a child process, which stops on the parent's signal instead of its own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    jobs.work(burst=burst, stop=stop)
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs, such as fetching video metadata, until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker processes')
+        parser.add_argument('--burst', action='store_true', help='Stop once there are no jobs due')
+        parser.add_argument('--retry-dead', action='store_true', help='Queue dead jobs to run again first')
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            self.stdout.write(f'Queued {jobs.retry_dead()} dead jobs again')
+
+        concurrency = max(options['concurrency'], 1)
+        if concurrency == 1:
+            try:
+                count = jobs.work(burst=options['burst'])
+            except KeyboardInterrupt:
+                return
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+            return
+
+        # children must open their own database connections, not share the parent's
+        connections.close_all()
+        # forked, so the children start with Django set up as it is here, spawned
+        # ones would have to import and set it up again before their first job
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        workers = [context.Process(target=_work, args=(stop, options['burst']), daemon=True)
+            for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+
+        # SIGTERM stops the workers after their current jobs, like Ctrl-C
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        failed = [worker.exitcode for worker in workers if worker.exitcode]
+        if failed:
+            raise CommandError(f'{len(failed)} of {concurrency} workers failed, exit codes {failed}')
+        self.stdout.write(self.style.SUCCESS(f'{concurrency} workers stopped'))
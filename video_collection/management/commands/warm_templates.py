@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import TemplateSyntaxError
+
+from video_collection.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = 'Compile every template of the app, failing on one that does not compile'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            names = warm_templates()
+        except TemplateSyntaxError as e:
+            raise CommandError(f'Template does not compile, {e}')
+
+        if options['verbosity'] > 1:
+            for name in names:
+                self.stderr.write(name)
+        milliseconds = (time.perf_counter() - start) * 1000
+        self.stdout.write(self.style.SUCCESS(f'Compiled {len(names)} templates in {milliseconds:.0f} ms'))
@@ -0,0 +1,204 @@
+"""
+Per-request cost: database queries and their time, template render time,
+response size and wall time.
+
+RequestMetricsMiddleware (middleware.py) starts a RequestMetrics for each
+request in a context variable. Database queries are counted by an execute
+wrapper on every connection, installed as connections open, and templates
+are timed by the TimedDjangoTemplates backend set in TEMPLATES. Both record
+into the current request's metrics, whichever thread they run in.
+
+The latest VIDEO_METRICS_WINDOW requests of each URL name are kept to report
+rolling percentiles, in Prometheus text format from the metrics view. Every
+process keeps its own, so with several workers each reports its own share.
+Counters of things that aren't per request, like the hits of the video
+lookup cache (lookup.py), are reported with them.
+"""
+
+import collections
+import contextvars
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+
+_current = contextvars.ContextVar('video_collection_request_metrics', default=None)
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_queries(execute, sql, params, many, context):
+    """ Execute wrapper counting the queries of the current request, see connection_created in apps.py """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - start
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # connection_created receiver, every new connection counts its queries
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+class TimedTemplate:
+    """ Wraps a DjangoTemplates template to add its render time to the current request """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """ The Django template backend, with render times recorded for RequestMetricsMiddleware """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class Window:
+    """ Totals of every request to one URL name, and the measurements of the latest few """
+
+    def __init__(self, size):
+        self.counts = collections.Counter()
+        self.totals = collections.Counter()
+        self.recent = collections.defaultdict(lambda: collections.deque(maxlen=size))
+
+    def add(self, measurements):
+        for name, value in measurements.items():
+            self.counts[name] += 1
+            self.totals[name] += value
+            self.recent[name].append(value)
+
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+# measurement, metric name and help of the summaries reported for each URL name
+SUMMARIES = [
+    ('seconds', 'video_request_duration_seconds', 'Wall time of requests'),
+    ('queries', 'video_request_db_queries', 'Database queries per request'),
+    ('db_seconds', 'video_request_db_duration_seconds', 'Time in database queries per request'),
+    ('template_seconds', 'video_request_template_duration_seconds', 'Template render time per request'),
+    ('bytes', 'video_response_size_bytes', 'Size of response bodies, streamed responses not included'),
+]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# metric name and help of the counters, see count()
+COUNTERS = [
+    ('video_lookup_cache_hits_total', 'Video lookups answered from the process\'s LRU or the shared cache'),
+    ('video_lookup_cache_misses_total', 'Video lookups that queried the database'),
+    ('video_lookup_cache_evictions_total', 'Videos dropped from the process\'s LRU to make room for others'),
+]
+
+_counts = collections.Counter()   # (metric name, labels): count
+
+
+def observe(url_name, measurements):
+    with _windows_lock:
+        if url_name not in _windows:
+            _windows[url_name] = Window(settings.VIDEO_METRICS_WINDOW)
+        _windows[url_name].add(measurements)
+
+
+def count(metric, amount=1, **labels):
+    """ Add to a counter in COUNTERS, labels as keyword arguments """
+    with _windows_lock:
+        _counts[metric, tuple(sorted(labels.items()))] += amount
+
+
+def reset():
+    with _windows_lock:
+        _windows.clear()
+        _counts.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def percentile(values, quantile):
+    """ Nearest rank percentile of sorted `values` """
+    if not values:
+        return math.nan
+    return values[max(0, math.ceil(quantile * len(values)) - 1)]
+
+
+def prometheus():
+    """ The rolling percentiles and totals of every URL name as Prometheus text """
+    with _windows_lock:
+        snapshot = {url_name: (dict(window.counts), dict(window.totals), {name: sorted(values)
+            for name, values in window.recent.items()}) for url_name, window in _windows.items()}
+        counters = dict(_counts)
+
+    lines = []
+    for name, metric, help in SUMMARIES:
+        lines.append(f'# HELP {metric} {help}, quantiles over the last {settings.VIDEO_METRICS_WINDOW} requests')
+        lines.append(f'# TYPE {metric} summary')
+        for url_name, (counts, totals, recent) in sorted(snapshot.items()):
+            if name not in recent:
+                continue
+            label = _label(url_name)
+            for quantile in QUANTILES:
+                lines.append(f'{metric}{{view="{label}",quantile="{quantile}"}} {percentile(recent[name], quantile):g}')
+            lines.append(f'{metric}_sum{{view="{label}"}} {totals[name]:g}')
+            lines.append(f'{metric}_count{{view="{label}"}} {counts[name]}')
+
+    for metric, help in COUNTERS:
+        lines.append(f'# HELP {metric} {help}')
+        lines.append(f'# TYPE {metric} counter')
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                label = ','.join(f'{key}="{_label(text)}"' for key, text in labels)
+                lines.append(f'{metric}{{{label}}} {value}' if label else f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
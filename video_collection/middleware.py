@@ -0,0 +1,172 @@
+import logging
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+
+from . import metrics
+
+
+log = logging.getLogger('video_collection.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request, see metrics.py. Adds a Server-Timing header with
+    the database, template and total times, logs a line per request, and
+    records the request in the rolling percentiles of its URL name.
+
+    First in MIDDLEWARE so the total includes the other middleware and cached
+    responses. A streamed response is measured up to the start of its body.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request_metrics, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self.report(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        return self.report(request, response, request_metrics)
+
+    def report(self, request, response, request_metrics):
+        seconds = request_metrics.seconds
+        match = request.resolver_match
+        url_name = match.view_name if match and match.url_name else 'unmatched'
+
+        measurements = {
+            'seconds': seconds,
+            'queries': request_metrics.queries,
+            'db_seconds': request_metrics.db_seconds,
+            'template_seconds': request_metrics.template_seconds,
+        }
+        if not response.streaming:
+            measurements['bytes'] = len(response.content)
+        metrics.observe(url_name, measurements)
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={request_metrics.db_seconds * 1000:.1f};desc="{request_metrics.queries} queries"',
+            f'template;dur={request_metrics.template_seconds * 1000:.1f}',
+            f'total;dur={seconds * 1000:.1f}',
+        ])
+
+        log.info('%s %s %s view=%s total_ms=%.1f queries=%d db_ms=%.1f template_ms=%.1f bytes=%s',
+            request.method, request.get_full_path(), response.status_code, url_name, seconds * 1000,
+            request_metrics.queries, request_metrics.db_seconds * 1000, request_metrics.template_seconds * 1000,
+            measurements.get('bytes', '-'),
+            extra={'request_metrics': dict(measurements, method=request.method, path=request.path,
+                status=response.status_code, view=url_name)})
+        return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serves the files collectstatic put in STATIC_ROOT, so a WSGI or ASGI
+    server needs nothing in front of it for them. The files are listed once
+    at startup, a request for one is a dictionary lookup and the file sent
+    as it is, the brotli or gzip copy (see storage.py) if the client takes it.
+
+    Files by their hashed name never change and are cached for a year,
+    immutable, so browsers don't even revalidate them. By their plain name
+    they're cached for VIDEO_STATIC_MAX_AGE seconds. Put it after
+    SecurityMiddleware, which adds its headers to these responses too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    HASHED_MAX_AGE = 365 * 24 * 60 * 60
+
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed('STATIC_ROOT has not been collected, runserver serves static files instead')
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = _index_static_files(settings.STATIC_ROOT)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        # the response for a static file, None for anything else
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        found = self.files.get(request.path[len(self.prefix):])
+        if found is None:
+            return None
+
+        path, content_type, hashed, encodings = found
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = next((encoding for encoding in encodings if encoding in accepted), None)
+        if encoding:
+            path += dict(self.ENCODINGS)[encoding]
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.headers['Vary'] = 'Accept-Encoding'
+        if hashed:
+            response.headers['Cache-Control'] = f'public, max-age={self.HASHED_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={settings.VIDEO_STATIC_MAX_AGE}'
+        return response
+
+
+def _index_static_files(root):
+    # name under STATIC_URL: (path, content type, hashed name, compressed copies' encodings)
+    hashed_names = set(ManifestStaticFilesStorage(location=root).hashed_files.values())
+
+    files = {}
+    for directory, _, names in os.walk(root):
+        for file_name in names:
+            path = os.path.join(directory, file_name)
+            if file_name.endswith(('.gz', '.br')) and os.path.exists(path[:-3]):
+                continue   # the compressed copy of another file
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            content_type, _ = mimetypes.guess_type(file_name)
+            encodings = [encoding for encoding, extension in StaticFilesMiddleware.ENCODINGS
+                if os.path.exists(path + extension)]
+            files[name] = (path, content_type or 'application/octet-stream', name in hashed_names, encodings)
+    return files
+
+
+def _accepted_encodings(header):
+    # the codings in an Accept-Encoding header, less any refused with q=0
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:58
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0002_video_video_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(django.db.models.functions.text.Lower('name'), models.F('id'), name='video_lower_name_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import video_collection.models
+
+
+# SQLite: an FTS5 index over name and notes that reads its text from the video
+# table, kept up to date by triggers. Postgres: a GIN index on the tsvector
+# expression that search.PostgresFullTextSearch queries.
+
+SQLITE_CREATE = [
+    '''CREATE VIRTUAL TABLE video_collection_video_fts USING fts5(
+        name, notes, content='video_collection_video', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )''',
+    '''CREATE TRIGGER video_collection_video_fts_insert AFTER INSERT ON video_collection_video BEGIN
+        INSERT INTO video_collection_video_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes);
+    END''',
+    '''CREATE TRIGGER video_collection_video_fts_delete AFTER DELETE ON video_collection_video BEGIN
+        INSERT INTO video_collection_video_fts(video_collection_video_fts, rowid, name, notes)
+        VALUES ('delete', old.id, old.name, old.notes);
+    END''',
+    '''CREATE TRIGGER video_collection_video_fts_update AFTER UPDATE ON video_collection_video BEGIN
+        INSERT INTO video_collection_video_fts(video_collection_video_fts, rowid, name, notes)
+        VALUES ('delete', old.id, old.name, old.notes);
+        INSERT INTO video_collection_video_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes);
+    END''',
+    # index the videos already in the table
+    "INSERT INTO video_collection_video_fts(video_collection_video_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS video_collection_video_fts_insert',
+    'DROP TRIGGER IF EXISTS video_collection_video_fts_delete',
+    'DROP TRIGGER IF EXISTS video_collection_video_fts_update',
+    'DROP TABLE IF EXISTS video_collection_video_fts',
+]
+
+
+def postgres_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('name', 'notes', config='english'), name='video_search_vector_idx')
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute('CREATE VIRTUAL TABLE temp.fts5_check USING fts5(content)')
+                cursor.execute('DROP TABLE temp.fts5_check')
+            except Exception:
+                return   # SQLite built without FTS5, search falls back to contains
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('video_collection', 'Video'), postgres_index())
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('video_collection', 'Video'), postgres_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0003_video_lower_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoSearchDocument',
+            fields=[
+                ('video', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='video_collection.video')),
+                ('name', models.TextField()),
+                ('notes', models.TextField()),
+                ('document', video_collection.models.FullTextDocumentField(db_column='video_collection_video_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'video_collection_video_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0004_video_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
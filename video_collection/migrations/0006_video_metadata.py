@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0005_video_created_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='channel',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='duration',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='enriched_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, max_length=400),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='title',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+    ]
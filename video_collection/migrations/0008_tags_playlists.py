@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0007_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('notes', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', models.SlugField(unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaylistEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='video_collection.playlist')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_entries', to='video_collection.video')),
+            ],
+            options={
+                'ordering': ['playlist', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='playlist',
+            name='videos',
+            field=models.ManyToManyField(related_name='playlists', through='video_collection.PlaylistEntry', to='video_collection.video'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='videos', to='video_collection.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='playlistentry',
+            constraint=models.UniqueConstraint(fields=('playlist', 'position'), name='playlist_entry_unique_position'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:39
+
+import hashlib
+import random
+import re
+import struct
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# MinHash keys as duplicates.py computed them when this migration was written,
+# copied so that later changes to its parameters don't change this migration.
+# Reindex with find_duplicates --reindex after changing them.
+BANDS = 10
+ROWS = 3
+PRIME = (1 << 61) - 1
+KEY_BITS = 58
+BATCH_SIZE = 2000
+WORD = re.compile(r'\w+')
+
+_random = random.Random(20261018)
+COEFFICIENTS = [(_random.randrange(1, PRIME), _random.randrange(PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def trigrams(name):
+    text = f' {" ".join(WORD.findall(name.lower()))} '
+    if text == '  ':
+        return frozenset()
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def hashes(trigram):
+    x = int.from_bytes(hashlib.blake2b(trigram.encode(), digest_size=8).digest(), 'big')
+    return tuple((a * x + b) % PRIME for a, b in COEFFICIENTS)
+
+
+def keys(name):
+    shingles = trigrams(name)
+    if not shingles:
+        return []
+    minhashes = tuple(map(min, zip(*map(hashes, shingles))))
+    result = []
+    for band in range(BANDS):
+        rows = struct.pack(f'>{ROWS}Q', *minhashes[band * ROWS:(band + 1) * ROWS])
+        digest = int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big')
+        result.append((band << KEY_BITS) + (digest >> (64 - KEY_BITS)))
+    return result
+
+
+def index_existing_videos(apps, schema_editor):
+    # videos added from now on are indexed as they're saved or imported
+    Video = apps.get_model('video_collection', 'Video')
+    DuplicateKey = apps.get_model('video_collection', 'DuplicateKey')
+    DuplicateKey.objects.bulk_create((DuplicateKey(video_id=pk, key=key)
+        for pk, name in Video.objects.values_list('pk', 'name').iterator(chunk_size=BATCH_SIZE) for key in keys(name)),
+        batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0008_tags_playlists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_keys', to='video_collection.video')),
+            ],
+        ),
+        migrations.RunPython(index_existing_videos, migrations.RunPython.noop),
+    ]
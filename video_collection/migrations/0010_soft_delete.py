@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:50
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_collection', '0009_duplicate_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='video',
+            name='video_lower_name_idx',
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='video_id',
+            field=models.CharField(max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(django.db.models.functions.text.Lower('name'), models.F('id'), condition=models.Q(('deleted_at__isnull', True)), name='video_lower_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='video_deleted_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='video',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('video_id',), name='video_unique_video_id'),
+        ),
+    ]
@@ -1,60 +1,219 @@
-from django.db import models
-from urllib import parse
-import requests
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from . import youtube
+
+
+class Tag(models.Model):
+    """ A workout type, such as yoga or cardio, videos can be filtered by """
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=50, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+def extract_video_id(url):
+    """ Return the video ID from a YouTube URL, raise ValidationError if it isn't one """
+    try:
+        return youtube.parse_video_id(url)
+    except youtube.InvalidYouTubeURL as e:
+        raise ValidationError(str(e)) from e
+
+
+class VideoQuerySet(models.QuerySet):
+
+    def purge(self, batch_size=500):
+        """
+        Delete the videos and everything of theirs for good, batch_size at a
+        time, each batch in a transaction of its own so the table is never
+        locked for long. Yields the number deleted in each batch.
+        """
+        videos = self if self.ordered else self.order_by('pk')
+        while True:
+            with transaction.atomic():
+                pks = list(videos.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    return
+                Video.all_objects.filter(pk__in=pks).delete()
+            yield len(pks)
+
+
+class VideoManager(models.Manager.from_queryset(VideoQuerySet)):
+    """ Videos that aren't deleted, see Video.soft_delete() """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Video(models.Model):
     name = models.CharField(max_length=200)
     url = models.CharField(max_length=400)
     notes = models.TextField(blank=True, null=True)
-    video_id = models.CharField(max_length=40, unique=True)
-
+    video_id = models.CharField(max_length=40)   # unique among videos not deleted, see Meta
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)   # indexed for the list's Max('updated')
+
+    # filled in from YouTube by enrichment.py, blank until then
+    title = models.CharField(max_length=200, blank=True)
+    duration = models.DurationField(blank=True, null=True)
+    channel = models.CharField(max_length=200, blank=True)
+    thumbnail_url = models.CharField(max_length=400, blank=True)
+    enriched_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    tags = models.ManyToManyField(Tag, blank=True, related_name='videos')
+
+    # set by soft_delete(), the video is hidden until purge_deleted deletes it for good
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = VideoManager()
+    all_objects = VideoQuerySet.as_manager()   # deleted videos too
+
+    class Meta:
+        indexes = [
+            # backs the video list's ORDER BY lower(name), id and its keyset seeks, deleted videos left out
+            models.Index(Lower('name'), 'id', name='video_lower_name_idx', condition=Q(deleted_at__isnull=True)),
+            # finds the deleted videos for purge_deleted, only they're in it
+            models.Index(fields=['deleted_at'], name='video_deleted_at_idx', condition=Q(deleted_at__isnull=False)),
+        ]
+        constraints = [
+            # a deleted video can be added again
+            models.UniqueConstraint(fields=['video_id'], condition=Q(deleted_at__isnull=True),
+                name='video_unique_video_id'),
+        ]
+
+    # URL as loaded from the database, to skip parsing it again if it's unchanged
+    _loaded_url = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        video = super().from_db(db, field_names, values)
+        video._loaded_url = video.__dict__.get('url')   # None if the url field was deferred
+        return video
 
     def save(self, *args, **kwargs):
-
-        # if not self.url.startswith('https://www.youtube.com/watch'):
-        #     raise ValidationError(f'Not a Youtube URL {self.url}')
-        try:
-
-            # extract the video ID from URL
-            url_components = parse.urlparse(self.url)
-
-            if url_components.scheme != 'https':
-                raise ValidationError(f'Not a YouTube URL {self.url}')
-            if url_components.netloc != 'www.youtube.com':
-                raise ValidationError(f'Not a YouTube URL {self.url}')
-            if url_components.path != '/watch':
-                raise ValidationError(f'Not a YouTube URL {self.url}')
-
-            query_string = url_components.query
-
-            if not query_string:
-                raise ValidationError(f'Invalid YouTube URL {self.url}')
-            
-            parameters = parse.parse_qs(query_string, strict_parsing=True) # dictionary
-            v_parameters_list = parameters.get('v') # return None if no key found
-
-            # true if at least one entry in the list
-            # save
-            if not v_parameters_list: # checking if none or emtpy list
-                raise ValidationError(f'Invalid YouTube URL, missing parameters {self.url}')
-            
-            self.video_id = v_parameters_list[0]
-
-        except ValueError as e:
-            raise ValidationError(f'Unable to parse URL {self.url}') from e
-        
-        
+        if not self.video_id or self.url != self._loaded_url:
+            self.video_id = extract_video_id(self.url)
         super().save(*args, **kwargs)
-             
-
+        self._loaded_url = self.url
 
 
+    def soft_delete(self):
+        """ Hide the video, it can be restored until purge_deleted deletes it for good """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated'])
 
+    def restore(self):
+        """ Show a deleted video again, IntegrityError if the same video was added since """
+        self.deleted_at = None
+        self.save(update_fields=['deleted_at', 'updated'])
 
     def __str__(self):
         return f'ID: {self.pk}, Name: {self.name}, URL: {self.url}, Notes: {self.notes[:200]}, Video ID: {self.video_id}'
-    
-    
 
 
+class DuplicateKey(models.Model):
+    """ One band of a video name's MinHash signature, videos sharing a key may be near duplicates, see duplicates.py """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='duplicate_keys')
+    key = models.BigIntegerField(db_index=True)
+
+
+class Playlist(models.Model):
+    name = models.CharField(max_length=200)
+    notes = models.TextField(blank=True)
+    videos = models.ManyToManyField(Video, through='PlaylistEntry', related_name='playlists')
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PlaylistEntry(models.Model):
+    """ A video's place in a playlist, the same video can come up more than once """
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='entries')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='playlist_entries')
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['playlist', 'position']
+        constraints = [
+            # also the index for reading a playlist in order
+            models.UniqueConstraint(fields=['playlist', 'position'], name='playlist_entry_unique_position'),
+        ]
+
+    def __str__(self):
+        return f'{self.position}. {self.video.name}'
+
+
+class FullTextDocumentField(models.TextField):
+    """ The hidden column of an SQLite FTS5 table named after the table itself, used to MATCH against all columns """
+
+
+@FullTextDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class VideoSearchDocument(models.Model):
+    """
+    Row of the SQLite FTS5 index over Video name and notes. The table is created
+    and kept in sync with triggers by migration 0004, see search.py for queries.
+    """
+    video = models.OneToOneField(Video, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING,
+        related_name='search_document')
+    name = models.TextField()
+    notes = models.TextField()
+    document = FullTextDocumentField(db_column='video_collection_video_fts')
+    rank = models.FloatField()   # bm25 of the row for the current MATCH, lower is a better match
+
+    class Meta:
+        managed = False
+        db_table = 'video_collection_video_fts'
+
+
+class Job(models.Model):
+    """
+    Background work, run by the run_workers command, see jobs.py. A job for a
+    video is queued at most once at a time. Jobs are deleted once they've run,
+    failed jobs are retried later, and after too many attempts are left dead
+    for someone to look at.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DEAD, 'Dead')]
+
+    kind = models.CharField(max_length=50)
+    video_id = models.CharField(max_length=40, blank=True)   # the video the job is for, if any
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)   # claim token of the worker running it
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # workers look for the next due job
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'video_id'], name='job_unique_queued_video',
+                condition=Q(status__in=['pending', 'running']) & ~Q(video_id='')),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} job {self.pk} {self.video_id} ({self.status}, {self.attempts} attempts)'
@@ -0,0 +1,155 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET paging, each page is fetched with a WHERE clause that seeks
+past the last row of the previous page, so the cost of a page doesn't depend
+on how far into the list it is. Cursors are opaque url-safe tokens holding the
+direction and the sort key values of the row to seek from.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, list(values)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, key_count):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:   # bad base64, bad JSON or wrong shape
+        raise InvalidCursor(f'Invalid cursor {token}') from e
+
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != key_count:
+        raise InvalidCursor(f'Invalid cursor {token}')
+    # sort key values are strings and numbers, never null, lists or objects
+    if not all(isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursor(f'Invalid cursor {token}')
+
+    return direction, values
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate `queryset` on `keys`, a sequence of field or annotation names
+    (prefix with '-' for descending). The last key must be unique, e.g. 'pk',
+    so that every row has a distinct position.
+    """
+
+    def __init__(self, queryset, keys, page_size):
+        self.queryset = queryset
+        self.keys = [(key.lstrip('-'), key.startswith('-')) for key in keys]
+        self.page_size = page_size
+
+    def page(self, cursor=None):
+        values, backwards = self._decode(cursor)
+        page = self._page(list(self._query(values, backwards)), values, backwards)
+
+        # rows around the cursor may have been deleted since it was handed out,
+        # start over rather than show an empty page with no way back
+        if not page.object_list and values is not None:
+            return self.page()
+        return page
+
+    async def apage(self, cursor=None):
+        """ page() for async views """
+        values, backwards = self._decode(cursor)
+        page = self._page([row async for row in self._query(values, backwards)], values, backwards)
+        if not page.object_list and values is not None:
+            return await self.apage()
+        return page
+
+    def check(self, cursor):
+        """ Raise InvalidCursor for a cursor page() would, before the page is fetched """
+        values, backwards = self._decode(cursor)
+        self._query(values, backwards)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None, False
+        direction, values = decode_cursor(cursor, len(self.keys))
+        return values, direction == 'prev'
+
+    def _query(self, values, backwards):
+        queryset = self.queryset
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._seek(values, backwards))
+            except (ValueError, TypeError, ValidationError) as e:   # a value the key's field can't take
+                raise InvalidCursor(f'Invalid cursor values {values}') from e
+
+        ordering = []
+        for name, descending in self.keys:
+            ordering.append(name if descending == backwards else f'-{name}')
+
+        # one extra row tells us whether there's another page in this direction
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def _page(self, rows, values, backwards):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = prev_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor('next', self._values(rows[-1]))
+        if rows and has_previous:
+            prev_cursor = encode_cursor('prev', self._values(rows[0]))
+
+        return KeysetPage(rows, next_cursor, prev_cursor)
+
+    def _seek(self, values, backwards):
+        # (k1, k2, k3) > (v1, v2, v3) expands to
+        # k1 > v1 OR (k1 = v1 AND k2 > v2) OR (k1 = v1 AND k2 = v2 AND k3 > v3)
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+
+        # redundant range on the leading key, so an index on the keys can seek
+        # straight to the cursor instead of scanning from the start of the index
+        name, descending = self.keys[0]
+        lookup = 'lte' if descending != backwards else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def _values(self, row):
+        return [getattr(row, name) for name, _ in self.keys]
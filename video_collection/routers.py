@@ -0,0 +1,76 @@
+"""
+Reads from a replica of the database for the read-only views.
+
+Views wrapped in read_replica send their queries to the VIDEO_READ_REPLICA
+database for GET and HEAD requests. Everything else, writes and every
+other view, uses the default database, so a page shown after a change,
+like the video list after adding a video, never reads a replica that's a
+moment behind. The replica is a copy kept up to date outside Django, by
+Litestream or LiteFS for SQLite, or database replication.
+
+Without a VIDEO_READ_REPLICA database configured, reads stay on default.
+Rows streamed from an iterator after the view has returned, the NDJSON
+list and the videos of a streamed video list, are read from default too.
+"""
+
+import asyncio
+import contextvars
+import functools
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_reading = contextvars.ContextVar('video_collection_read_replica', default=False)
+
+
+def read_replica(view):
+    """ Send the view's queries to the read replica for GET and HEAD requests """
+
+    def reads_only(request):
+        return request.method in ('GET', 'HEAD')
+
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not reads_only(request):
+                return await view(request, *args, **kwargs)
+            token = _reading.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _reading.reset(token)
+
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not reads_only(request):
+                return view(request, *args, **kwargs)
+            token = _reading.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _reading.reset(token)
+
+    return wrapper
+
+
+class ReadReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = settings.VIDEO_READ_REPLICA
+        if _reading.get() and alias in connections.settings:
+            return alias
+        return None   # the next router, or default
+
+    def db_for_write(self, model, **hints):
+        # even for a video read from the replica, which Django would otherwise save back there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # a replica copies the migrated default database, it's never migrated itself
+        return db != settings.VIDEO_READ_REPLICA
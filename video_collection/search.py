@@ -0,0 +1,142 @@
+"""
+Search backends for the video list.
+
+Each backend filters a Video queryset by a search term and says which keys
+the results should be sorted (and keyset paginated) on. The full text backends
+match whole words or word prefixes in name and notes using an index, and rank
+the best matches first. The contains backend is the original case-insensitive
+substring match on name, which can't use an index.
+
+The backend is chosen by the VIDEO_SEARCH_BACKEND setting: 'auto' picks full
+text search for the database in use, or 'fulltext' or 'contains'.
+"""
+
+import functools
+import re
+import sqlite3
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import F, FloatField, Value
+
+from . import cache
+
+
+NAME_ORDER = ('lower_name', 'pk')
+
+WORD = re.compile(r'\w+')
+
+
+class ContainsSearch:
+
+    keys = NAME_ORDER
+
+    def search(self, queryset, term):
+        return queryset.filter(name__icontains=term)
+
+
+class SQLiteFullTextSearch:
+
+    # bm25 is lower for better matches, equal ranks are sorted by name
+    keys = ('rank',) + NAME_ORDER
+
+    def search(self, queryset, term):
+        words = WORD.findall(term.lower())
+        if not words:   # only punctuation, nothing the index can match
+            return ContainsSearch().search(queryset, term).annotate(rank=Value(0.0, output_field=FloatField()))
+
+        # every word must match, as a word or the start of one
+        query = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(search_document__document__match=query).annotate(rank=F('search_document__rank'))
+
+
+class PostgresFullTextSearch:
+
+    keys = ('-rank',) + NAME_ORDER
+
+    def search(self, queryset, term):
+        # imported here, needs psycopg which is only installed with Postgres
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        words = WORD.findall(term.lower())
+        if not words:
+            return ContainsSearch().search(queryset, term).annotate(rank=Value(0.0, output_field=FloatField()))
+
+        # the same expression as the GIN index from migration 0004, so the index is used
+        vector = SearchVector('name', 'notes', config='english')
+        query = SearchQuery(' & '.join(f'{word}:*' for word in words), config='english', search_type='raw')
+        return queryset.annotate(search=vector).filter(search=query).annotate(rank=SearchRank(vector, query))
+
+
+@functools.lru_cache(maxsize=None)
+def sqlite_has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE test USING fts5(content)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def get_backend(name=None):
+    name = name or settings.VIDEO_SEARCH_BACKEND
+
+    if name == 'contains':
+        return ContainsSearch()
+
+    if name not in ('auto', 'fulltext'):
+        raise ValueError(f'Unknown search backend {name}')
+
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        return SQLiteFullTextSearch()
+    if connection.vendor == 'postgresql':
+        return PostgresFullTextSearch()
+
+    if name == 'fulltext':
+        raise ValueError(f'No full text search for {connection.vendor} databases')
+    return ContainsSearch()
+
+
+# The triggers are dropped along with the table whenever a migration on SQLite
+# rebuilds video_collection_video to alter it, so they are put back after every
+# migrate and the index is rebuilt if they were missing.
+
+SQLITE_TRIGGERS = {
+    'video_collection_video_fts_insert': '''
+        CREATE TRIGGER video_collection_video_fts_insert AFTER INSERT ON video_collection_video BEGIN
+            INSERT INTO video_collection_video_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes);
+        END
+    ''',
+    'video_collection_video_fts_delete': '''
+        CREATE TRIGGER video_collection_video_fts_delete AFTER DELETE ON video_collection_video BEGIN
+            INSERT INTO video_collection_video_fts(video_collection_video_fts, rowid, name, notes)
+            VALUES ('delete', old.id, old.name, old.notes);
+        END
+    ''',
+    'video_collection_video_fts_update': '''
+        CREATE TRIGGER video_collection_video_fts_update AFTER UPDATE ON video_collection_video BEGIN
+            INSERT INTO video_collection_video_fts(video_collection_video_fts, rowid, name, notes)
+            VALUES ('delete', old.id, old.name, old.notes);
+            INSERT INTO video_collection_video_fts(rowid, name, notes) VALUES (new.id, new.name, new.notes);
+        END
+    ''',
+}
+
+
+def restore_sqlite_triggers(using='default', **kwargs):
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if 'video_collection_video_fts' not in existing:   # not migrated yet, or no FTS5
+            return
+
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            cursor.execute("INSERT INTO video_collection_video_fts(video_collection_video_fts) VALUES ('rebuild')")
+            cache.invalidate_list()   # search results may have changed
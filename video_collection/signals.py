@@ -0,0 +1,79 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Tag, Video
+from . import cache, duplicates, jobs, lookup, suggest
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def invalidate_cached_pages(sender, instance, **kwargs):
+    cache.invalidate_video(instance.pk)
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def forget_looked_up_video(sender, instance, **kwargs):
+    # and its video ID, which may have been cached as missing before it was added
+    lookup.forget([instance.pk], [instance.video_id])
+
+
+@receiver(post_save, sender=Video)
+def queue_enrichment(sender, instance, created, **kwargs):
+    # fetched by a worker, not while the request waits
+    if created:
+        jobs.enqueue_enrichment([instance.video_id])
+
+
+@receiver(post_save, sender=Video)
+def index_name(sender, instance, created, update_fields, **kwargs):
+    # keys for finding videos with nearly the same name, see duplicates.py
+    if created or update_fields is None or 'name' in update_fields:
+        duplicates.index([(instance.pk, instance.name)])
+
+
+@receiver(post_save, sender=Video)
+def suggest_saved_video(sender, instance, **kwargs):
+    # in this process's index of names, once the video is there for other requests to see
+    pk, name = instance.pk, instance.name
+    if instance.deleted_at:
+        transaction.on_commit(lambda: suggest.video_deleted(pk))
+    else:
+        transaction.on_commit(lambda: suggest.video_saved(pk, name))
+
+
+@receiver(post_delete, sender=Video)
+def suggest_deleted_video(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.video_deleted(pk))
+
+
+def touch_videos(pks):
+    # tags show on the video pages, so a change to them is a change to the
+    # videos: their updated time moves on for the ETags, and their pages go
+    pks = list(pks)
+    if pks:
+        Video.objects.filter(pk__in=pks).update(updated=timezone.now())
+        cache.invalidate([cache.LIST_GENERATION] + [cache.video_generation(pk) for pk in pks])
+        lookup.forget(pks)
+
+
+@receiver(m2m_changed, sender=Video.tags.through)
+def video_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:   # video.tags changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_videos([instance.pk])
+    elif action in ('post_add', 'post_remove'):   # tag.videos changed
+        touch_videos(pk_set)
+    elif action == 'pre_clear':   # the videos are gone after
+        touch_videos(instance.videos.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    # the list's tag filter offers every tag, even one no video has yet
+    cache.invalidate_list()
+    touch_videos(instance.videos.values_list('pk', flat=True))
@@ -0,0 +1,16 @@
+// Replace a video thumbnail with the YouTube player when it's clicked, see _player.html
+document.addEventListener('click', function (event) {
+    var button = event.target.closest('.video-facade-play');
+    if (!button) {
+        return;
+    }
+
+    var iframe = document.createElement('iframe');
+    iframe.width = 420;
+    iframe.height = 315;
+    iframe.src = 'https://youtube.com/embed/' + encodeURIComponent(button.dataset.videoId) + '?autoplay=1';
+    iframe.allow = 'autoplay; encrypted-media; picture-in-picture';
+    iframe.allowFullscreen = true;
+
+    button.parentNode.replaceChild(iframe, button);
+});
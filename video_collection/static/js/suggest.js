@@ -0,0 +1,30 @@
+// Fill the search box's datalist with video names as they're typed, see suggest.py
+(function () {
+    var list = document.getElementById('video-suggestions');
+    var input = document.querySelector('input[list="video-suggestions"]');
+    if (!list || !input) {
+        return;
+    }
+
+    var timer = null;
+    var latest = 0;
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var request = ++latest;
+            fetch(list.dataset.url + '?q=' + encodeURIComponent(input.value))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (request !== latest) {
+                        return;   // a later request is on its way
+                    }
+                    list.replaceChildren.apply(list, data.suggestions.map(function (suggestion) {
+                        var option = document.createElement('option');
+                        option.value = suggestion.name;
+                        return option;
+                    }));
+                });
+        }, 100);
+    });
+})();
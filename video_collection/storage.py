@@ -0,0 +1,68 @@
+"""
+Static files with hashed names, compressed when they're collected.
+
+CompressedManifestStaticFilesStorage is Django's ManifestStaticFilesStorage,
+which copies each file to a name with a hash of its contents, style.css to
+style.5e0c2a1b3d4f.css, and points {% static %} at it. A changed file gets a
+new name, so browsers can keep a file for a year and never ask again. As
+collectstatic saves the files, this also writes a gzip copy, style.css.gz,
+and a brotli copy, style.css.br, if the brotli package is installed, of each
+text file where that makes it smaller. StaticFilesMiddleware (middleware.py)
+serves them without compressing anything per request.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:   # optional, gzip alone without it
+    brotli = None
+
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html', '.xml')
+
+# not worth sending compressed unless it saves at least this much
+MIN_SAVING = 0.05
+
+
+def compressors():
+    """ (extension, function) of each compression available """
+    found = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        found.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if dry_run or isinstance(processed, Exception):
+                continue
+            # the original name is served too, to whatever asks for it without a hash
+            for path in (name, hashed_name):
+                if path and path not in compressed and path.endswith(COMPRESS_EXTENSIONS):
+                    compressed.add(path)
+                    for compressed_name in self.compress(path):
+                        yield path, compressed_name, True
+
+    def compress(self, name):
+        """ Save compressed copies of the file `name`, return their names """
+        with self.open(name) as file:
+            data = file.read()
+        saved = []
+        for extension, compress in compressors():
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                self._save(compressed_name, ContentFile(compressed))
+                saved.append(compressed_name)
+        return saved
+
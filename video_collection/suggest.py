@@ -0,0 +1,200 @@
+"""
+Search as you type suggestions, from an index of video names in memory.
+
+The index is a sorted list of keys, the lowercased name from the start of
+each of its words, so "yo" suggests "Yoga Flow" and "Morning Yoga". The first
+key with the prefix is found with bisect and the matches follow it, so a
+lookup takes microseconds where the database would scan every name.
+
+Each process builds its index from the database at its first lookup, and
+keeps it up to date as videos are saved and deleted (see signals.py).
+Changes from other processes, and bulk imports, which don't send signals,
+show once the index is VIDEO_SUGGEST_MAX_AGE seconds old and built again.
+One request rebuilds it, without holding the lock lookups take, and the
+others go on with the old index meanwhile.
+Memory is about 100 bytes a key. A collection with more than
+VIDEO_SUGGEST_MAX_KEYS keys isn't indexed, and suggestions come from the
+database instead.
+"""
+
+import array
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Video
+
+
+# keys are cut to this many characters, longer prefixes are checked against the names
+KEY_LENGTH = 40
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def keys(name):
+    """ The index keys of a name, from the start of each word """
+    words = normalize(name).split(' ')
+    return sorted({' '.join(words[i:])[:KEY_LENGTH] for i in range(len(words)) if words[i]})
+
+
+class SuggestIndex:
+
+    def __init__(self, max_keys):
+        self.keys = []
+        self.pks = array.array('q')   # pk of each key
+        self.names = {}
+        self.max_keys = max_keys
+
+    @classmethod
+    def build(cls, max_keys):
+        """ An index of every video, None if there would be more than max_keys keys """
+        entries = []
+        names = {}
+        for pk, name in Video.objects.values_list('pk', 'name').iterator(chunk_size=2000):
+            names[pk] = name
+            entries.extend((key, pk) for key in keys(name))
+            if len(entries) > max_keys:
+                return None
+        entries.sort()
+
+        index = cls(max_keys)
+        index.keys = [key for key, _ in entries]
+        index.pks = array.array('q', (pk for _, pk in entries))
+        index.names = names
+        return index
+
+    def add(self, pk, name):
+        """ Index a video's name in place of its old one, False if that would be more than max_keys keys """
+        self.remove(pk)
+        new_keys = keys(name)
+        if len(self.keys) + len(new_keys) > self.max_keys:
+            return False
+        self.names[pk] = name
+        for key in new_keys:
+            i = bisect.bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.pks.insert(i, pk)
+        return True
+
+    def remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is None:
+            return
+        for key in keys(name):
+            i = bisect.bisect_left(self.keys, key)
+            # among the videos with the same key, it may be missing if the index is out of step
+            while i < len(self.keys) and self.keys[i] == key and self.pks[i] != pk:
+                i += 1
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+                del self.pks[i]
+
+    def search(self, prefix, limit):
+        """ (pk, name) of up to `limit` videos with a word starting `prefix`, alphabetically """
+        key_prefix = prefix[:KEY_LENGTH]
+        found = {}
+        i = bisect.bisect_left(self.keys, key_prefix)
+        while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(key_prefix):
+            pk = self.pks[i]
+            if pk not in found and (len(prefix) <= KEY_LENGTH or _has_word_prefix(self.names[pk], prefix)):
+                found[pk] = self.names[pk]
+            i += 1
+        return list(found.items())
+
+
+def _has_word_prefix(name, prefix):
+    return f' {normalize(name)}'.find(f' {prefix}') != -1
+
+
+_index = None
+_built = None   # when the index was last built, or found too big to build
+_changes = None   # saves and deletes while the index is rebuilt, (pk, name or None)
+_lock = threading.Lock()   # held for lookups and changes, never for a build
+_build_lock = threading.Lock()
+
+
+def suggest(prefix, limit=None):
+    """ (pk, name) of videos with a word starting `prefix`, up to `limit` of them """
+    prefix = normalize(prefix)
+    limit = limit or settings.VIDEO_SUGGEST_LIMIT
+    if not prefix:
+        return []
+
+    _rebuild_if_old()
+    with _lock:
+        if _index is not None:
+            return _index.search(prefix, limit)
+
+    return database_suggest(prefix, limit)
+
+
+def _rebuild_if_old():
+    # one request rebuilds an old index while the others go on using it, or
+    # the database if there's none yet, and it's swapped in when it's ready
+    global _index, _built, _changes
+    with _lock:
+        if _built is not None and time.monotonic() - _built <= settings.VIDEO_SUGGEST_MAX_AGE:
+            return
+    if not _build_lock.acquire(blocking=False):
+        return   # being rebuilt
+
+    try:
+        with _lock:
+            if _built is not None and time.monotonic() - _built <= settings.VIDEO_SUGGEST_MAX_AGE:
+                return   # rebuilt while this request waited for the lock
+            changes = _changes = []
+        try:
+            index = SuggestIndex.build(settings.VIDEO_SUGGEST_MAX_KEYS)
+        except Exception:
+            with _lock:
+                if _changes is changes:
+                    _changes = None
+            raise
+        with _lock:
+            if _changes is not changes:
+                return   # reset meanwhile
+            for pk, name in changes:
+                if index is not None:
+                    if name is None:
+                        index.remove(pk)
+                    elif not index.add(pk, name):
+                        index = None
+            _index, _built, _changes = index, time.monotonic(), None
+    finally:
+        _build_lock.release()
+
+
+def database_suggest(prefix, limit):
+    """ Suggestions from the database, in name order, for a collection too big to index """
+    prefix = normalize(prefix)
+    videos = Video.objects.filter(Q(name__istartswith=prefix) | Q(name__icontains=f' {prefix}'))
+    return list(videos.order_by(Lower('name'), 'pk').values_list('pk', 'name')[:limit])
+
+
+def video_saved(pk, name):
+    global _index
+    with _lock:
+        if _changes is not None:
+            _changes.append((pk, name))
+        if _index is not None and not _index.add(pk, name):
+            _index = None   # too big now, suggestions come from the database until the next build
+
+
+def video_deleted(pk):
+    with _lock:
+        if _changes is not None:
+            _changes.append((pk, None))
+        if _index is not None:
+            _index.remove(pk)
+
+
+def reset():
+    global _index, _built, _changes
+    with _lock:
+        _index = _built = _changes = None
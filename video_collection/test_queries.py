@@ -0,0 +1,84 @@
+"""
+Query counts of the pages, so an N+1 query sneaking into a view or template
+fails a test. Each page is requested with a few videos and with many, and
+must take the same number of queries both times.
+
+Page caching is off here, every request runs its view, and so is the video
+lookup cache.
+"""
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Playlist, PlaylistEntry, Tag, Video
+
+
+@override_settings(VIDEO_CACHE_TIMEOUT=0, VIDEO_LOOKUP_TIMEOUT=0, VIDEO_LIST_PAGE_SIZE=50)
+class TestQueryCounts(TestCase):
+
+    def setUp(self):
+        self.yoga = Tag.objects.create(name='Yoga', slug='yoga')
+        self.core = Tag.objects.create(name='Core', slug='core')
+        self.playlist = Playlist.objects.create(name='Monday')
+
+
+    def add_videos(self, count):
+        start = Video.objects.count()
+        videos = Video.objects.bulk_create(
+            Video(name=f'yoga video {n}', notes='stretch', url=f'https://youtu.be/id{n}', video_id=f'id{n}')
+            for n in range(start, start + count))
+        for video in videos:
+            video.tags.add(self.yoga, self.core)
+        PlaylistEntry.objects.bulk_create(PlaylistEntry(playlist=self.playlist, video=video, position=video.pk)
+            for video in videos)
+
+
+    def assertQueriesDontGrow(self, queries, url, params=None):
+        # the page with 2 videos, and with 30, takes `queries` queries either way
+        for count in (2, 28):
+            self.add_videos(count)
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, params)
+            self.assertEqual(200, response.status_code)
+        return response
+
+
+    def test_video_list(self):
+        # count, page of videos, their tags, tag choices for the search form
+        response = self.assertQueriesDontGrow(4, reverse('video_list'))
+        self.assertEqual(30, len(response.context['videos']))
+        self.assertContains(response, 'href="/video_list?tag=core"', count=30)
+
+
+    def test_video_list_filtered_by_tag(self):
+        # and the tag from the query string
+        response = self.assertQueriesDontGrow(5, reverse('video_list'), {'tag': 'yoga'})
+        self.assertEqual(30, len(response.context['videos']))
+
+
+    def test_video_list_search(self):
+        response = self.assertQueriesDontGrow(4, reverse('video_list'), {'search_term': 'yoga'})
+        self.assertEqual(30, len(response.context['videos']))
+
+
+    def test_video_info(self):
+        # the video, for the ETag and the page, its tags
+        video = Video.objects.create(name='Yoga', url='https://www.youtube.com/watch?v=abc')
+        video.tags.add(self.yoga)
+        self.assertQueriesDontGrow(2, reverse('video_info', kwargs={'video_pk': video.pk}))
+
+
+    def test_playlists(self):
+        for n in range(5):
+            Playlist.objects.create(name=f'playlist {n}')
+        self.assertQueriesDontGrow(1, reverse('playlists'))
+
+
+    def test_playlist_info(self):
+        # the playlist, its entries with their videos, the videos' tags
+        response = self.assertQueriesDontGrow(3, reverse('playlist_info', kwargs={'playlist_pk': self.playlist.pk}))
+        self.assertEqual(30, len(response.context['entries']))
+
+
+    def test_api_videos(self):
+        self.assertQueriesDontGrow(2, reverse('api_videos'))
@@ -1,9 +1,56 @@
-from django.test import TestCase
-from django.urls import reverse
-from django.core.exceptions import ValidationError
-from django.db import IntegrityError, transaction
-
-from .models import Video
+import csv
+import gzip
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib import parse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings as django_settings
+from django.core.management import call_command, CommandError
+
+from django.test import RequestFactory, TestCase as DjangoTestCase, override_settings
+from django.template import Engine
+from django.urls import path, reverse
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import IntegrityError, transaction, connection, connections
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import DuplicateKey, Job, Playlist, PlaylistEntry, Tag, Video
+from .backends.sqlite3.base import DatabaseWrapper
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .routers import ReadReplicaRouter, read_replica
+from . import async_views, duplicates, enrichment, exporter, fragments, importer, jobs, lookup, metrics, search, storage, \
+    suggest, urls, warmup, youtube
+from .cache import get_cache
+
+
+# for the API's writes, with VIDEO_API_TOKEN overridden
+API_TOKEN = 'test-token'
+AUTHORIZATION = {'Authorization': f'Bearer {API_TOKEN}'}
+
+
+class TestCase(DjangoTestCase):
+
+    def setUp(self):
+        # cached pages and videos and the index of names for suggestions
+        # aren't rolled back with the database after each test
+        super().setUp()
+        get_cache().clear()
+        lookup.reset()
+        suggest.reset()
 
 
 
@@ -245,6 +292,193 @@ class TestAddVideos(TestCase):
             self.assertEqual(0, video_count)
 
 
+@override_settings(VIDEO_API_TOKEN=API_TOKEN)
+class TestImportVideos(TestCase):
+
+    csv_data = (
+        'name,url,notes\n'
+        'Yoga,https://www.youtube.com/watch?v=Nw2oBIrQGLo,Yoga for relaxation\n'
+        'Stretch,https://www.youtube.com/watch?v=A0pkEgZiRG4,\n'
+        'Not YouTube,https://github.com,nope\n'
+        ',https://www.youtube.com/watch?v=4vTJHUDB5ak,no name\n'
+        'Yoga again,https://www.youtube.com/watch?v=Nw2oBIrQGLo&t=14,same video\n'
+        'Existing,https://www.youtube.com/watch?v=IODxDxX7oi4,already added\n'
+        'Core,https://www.youtube.com/watch?v=12345,\n'
+    )
+
+    jsonl_data = (
+        '{"name": "Yoga", "url": "https://www.youtube.com/watch?v=Nw2oBIrQGLo", "notes": "Yoga for relaxation"}\n'
+        '\n'
+        '{"name": "Broken", "url": \n'
+        '["not", "an", "object"]\n'
+        '{"name": "Stretch", "url": "https://www.youtube.com/watch?v=A0pkEgZiRG4"}\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        Video.objects.create(name='Existing', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
+
+
+    def import_file(self, data, suffix, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'videos{suffix}')
+            with open(path, 'w') as file:
+                file.write(data)
+            out, err = StringIO(), StringIO()
+            call_command('import_videos', path, *args, stdout=out, stderr=err)
+            return out.getvalue(), err.getvalue()
+
+
+    def test_import_csv_command_reports_rejects_and_duplicates(self):
+        out, err = self.import_file(self.csv_data, '.csv', '--batch-size', '2')
+
+        self.assertIn('Imported 3 videos, 2 duplicates skipped, 2 rejected', out)
+        self.assertIn('Line 4: Not a YouTube URL https://github.com', err)
+        self.assertIn('Line 5: name: This field is required.', err)
+
+        self.assertEqual(4, Video.objects.count())
+        yoga = Video.objects.get(video_id='Nw2oBIrQGLo')
+        self.assertEqual('Yoga', yoga.name)
+        self.assertEqual('Yoga for relaxation', yoga.notes)
+        self.assertEqual('', Video.objects.get(video_id='12345').notes)
+
+
+    def test_import_jsonl_command(self):
+        out, err = self.import_file(self.jsonl_data, '.jsonl')
+
+        self.assertIn('Imported 2 videos, 0 duplicates skipped, 2 rejected', out)
+        self.assertIn('Line 3: Unable to parse JSON', err)
+        self.assertIn('Line 4: Expected a JSON object', err)
+        self.assertEqual(3, Video.objects.count())
+
+
+    def test_import_command_unknown_format(self):
+        with self.assertRaises(CommandError):
+            self.import_file(self.csv_data, '.txt')
+
+
+    def test_import_endpoint_csv(self):
+        response = self.client.post(reverse('import_videos'), data=self.csv_data, content_type='text/csv',
+            headers=AUTHORIZATION)
+        self.assertEqual(200, response.status_code)
+
+        report = response.json()
+        self.assertEqual(3, report['created'])
+        self.assertEqual(2, report['duplicates'])
+        self.assertEqual([4, 5], [reject['line'] for reject in report['rejected']])
+        self.assertEqual(4, Video.objects.count())
+
+
+    def test_import_endpoint_jsonl_by_query_parameter(self):
+        response = self.client.post(reverse('import_videos') + '?format=jsonl', data=self.jsonl_data,
+            content_type='text/plain', headers=AUTHORIZATION)
+        self.assertEqual(2, response.json()['created'])
+
+
+    def test_import_endpoint_rejects_unknown_format_and_get(self):
+        response = self.client.post(reverse('import_videos'), data=self.csv_data, content_type='text/plain',
+            headers=AUTHORIZATION)
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.get(reverse('import_videos'))
+        self.assertEqual(405, response.status_code)
+        self.assertEqual(1, Video.objects.count())
+
+
+    def test_import_endpoint_needs_the_token(self):
+        for headers in [{}, {'Authorization': 'Bearer wrong'}]:
+            response = self.client.post(reverse('import_videos'), data=self.csv_data, content_type='text/csv',
+                headers=headers)
+            self.assertEqual(401, response.status_code)
+        self.assertEqual(1, Video.objects.count())
+
+
+class TestExportVideos(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Video.objects.create(name='Yoga', notes='relaxing, "slow"', url='https://www.youtube.com/watch?v=Nw2oBIrQGLo')
+        Video.objects.create(name='Stretch', url='https://www.youtube.com/watch?v=A0pkEgZiRG4')
+
+
+    def export_file(self, filename, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, filename)
+            err = StringIO()
+            call_command('export_videos', path, *args, stderr=err)
+            opener = gzip.open if filename.endswith('.gz') else open
+            with opener(path, 'rt', newline='') as file:
+                return file.read(), err.getvalue()
+
+
+    def test_export_csv_command(self):
+        data, err = self.export_file('videos.csv')
+
+        rows = list(csv.DictReader(StringIO(data)))
+        self.assertEqual(['Yoga', 'Stretch'], [row['name'] for row in rows])
+        self.assertEqual('relaxing, "slow"', rows[0]['notes'])
+        self.assertEqual('A0pkEgZiRG4', rows[1]['video_id'])
+        self.assertIn('Exported 2 videos', err)
+
+
+    def test_exported_csv_imports_again(self):
+        data, _ = self.export_file('videos.csv')
+        Video.objects.all().delete()
+
+        report = importer.import_rows(importer.read_rows(StringIO(data), 'csv'))
+        self.assertEqual(2, report.created)
+        self.assertEqual('relaxing, "slow"', Video.objects.get(name='Yoga').notes)
+
+
+    def test_export_gzipped_jsonl_command(self):
+        data, err = self.export_file('videos.jsonl.gz')
+
+        rows = [json.loads(line) for line in data.splitlines()]
+        self.assertEqual(['Nw2oBIrQGLo', 'A0pkEgZiRG4'], [row['video_id'] for row in rows])
+        self.assertEqual(set(exporter.FIELDS), set(rows[0]))
+
+
+    def test_export_command_unknown_format(self):
+        with self.assertRaises(CommandError):
+            self.export_file('videos.xml')
+
+
+    @override_settings(VIDEO_EXPORT_CHUNK_SIZE=10)
+    def test_export_streams_rows_without_model_instances(self):
+        Video.objects.bulk_create(Video(name=f'video {n}', url=f'https://youtu.be/id{n}', video_id=f'id{n}')
+            for n in range(45))
+
+        with mock.patch.object(Video, 'from_db') as from_db, self.assertNumQueries(1):
+            data = b''.join(exporter.export('csv'))
+        from_db.assert_not_called()
+        self.assertEqual(48, len(data.decode().splitlines()))   # header and 47 videos
+
+
+    def test_gzip_export_is_written_in_pieces(self):
+        Video.objects.bulk_create(Video(name=f'video {n}', notes=os.urandom(100).hex(), url=f'https://youtu.be/id{n}',
+            video_id=f'id{n}') for n in range(2000))
+
+        pieces = list(exporter.export('jsonl', gzip=True))
+        self.assertGreater(len(pieces), 2)
+        self.assertEqual(2002, len(gzip.decompress(b''.join(pieces)).splitlines()))
+
+
+    def test_export_download(self):
+        response = self.client.get(reverse('export_videos'))
+        self.assertEqual('text/csv', response['Content-Type'])
+        self.assertEqual('attachment; filename="videos.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(b''.join(response).decode())))
+        self.assertEqual(['Yoga', 'Stretch'], [row['name'] for row in rows])
+
+        response = self.client.get(reverse('export_videos'), {'format': 'jsonl', 'gzip': '1'})
+        self.assertEqual('application/gzip', response['Content-Type'])
+        self.assertEqual('attachment; filename="videos.jsonl.gz"', response['Content-Disposition'])
+        self.assertEqual(2, len(gzip.decompress(b''.join(response)).splitlines()))
+
+        response = self.client.get(reverse('export_videos'), {'format': 'xml'})
+        self.assertEqual(400, response.status_code)
+
+
 class TestVideoList(TestCase):
     def test_all_videos_displayed_in_correct_order(self):
     
@@ -314,83 +548,2107 @@ class TestVideoList(TestCase):
 
 
 
-class TestVideoModel(TestCase):
-    def test_create_id(self):
-        video = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
-        self.assertEqual('IODxDxX7oi4', video.video_id)
+@override_settings(VIDEO_API_TOKEN=API_TOKEN)
+class TestVideoAPI(TestCase):
 
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', notes='relaxing', url='https://www.youtube.com/watch?v=101')
+        self.abs = Video.objects.create(name='abs', notes='core', url='https://www.youtube.com/watch?v=102')
+        self.hiit = Video.objects.create(name='HIIT', notes='intervals', url='https://www.youtube.com/watch?v=103')
 
-    def test_create_id_valid_url_with_time_parameter(self):
-        # a video that is playing and paused may have a timestamp in the query
-        video = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4&ts=14')
-        self.assertEqual('IODxDxX7oi4', video.video_id)
 
+    def test_list_in_video_list_order(self):
+        response = self.client.get(reverse('api_videos'))
+        data = response.json()
+        self.assertEqual(3, data['count'])
+        self.assertEqual(['abs', 'HIIT', 'Yoga'], [video['name'] for video in data['videos']])
+        self.assertEqual({'id', 'name', 'url', 'notes', 'video_id', 'created', 'updated', 'title', 'duration', 'channel',
+            'thumbnail_url'}, set(data['videos'][0]))
+        self.assertIsNone(data['next'])
 
-    def test_create_video_notes_optional(self):
-        v1 = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=67890')
-        v2 = Video.objects.create(name='different example', notes='example', url='https://www.youtube.com/watch?v=12345')
-        expected_videos = [v1, v2]
-        database_videos = Video.objects.all()
-        self.assertCountEqual(expected_videos, database_videos)  # check contents of two lists/iterables but order doesn't matter.
 
+    def test_list_search_fields_and_pages(self):
+        response = self.client.get(reverse('api_videos'), {'fields': 'id,name', 'limit': 2})
+        data = response.json()
+        self.assertEqual([{'id': self.abs.pk, 'name': 'abs'}, {'id': self.hiit.pk, 'name': 'HIIT'}], data['videos'])
 
-    def test_invalid_urls_raise_validation_error(self):
-        invalid_video_urls = [
-            'https://www.youtube.com/watch',
-            'https://www.youtube.com/watch/somethingelse',
-            'https://www.youtube.com/watch/somethingelse?v=1234567',
-            'https://www.youtube.com/watch?',
-            'https://www.youtube.com/watch?abc=123',
-            'https://www.youtube.com/watch?v=',
-            'https://www.youtube.com/watch?v1234',
-            'https://github.com',
-            '12345678',
-            'hhhhhhhhttps://www.youtube.com/watch',
-            'http://www.youtube.com/watch/somethingelse?v=1234567',
-            'https://minneapolis.edu'
-            'https://minneapolis.edu?v=123456'
-            ''
+        response = self.client.get(reverse('api_videos'), {'fields': 'name', 'cursor': data['next']})
+        self.assertEqual([{'name': 'Yoga'}], response.json()['videos'])
+
+        response = self.client.get(reverse('api_videos'), {'search_term': 'yoga', 'fields': 'video_id'})
+        self.assertEqual({'count': 1, 'next': None, 'previous': None, 'videos': [{'video_id': '101'}]}, response.json())
+
+
+    def test_bad_list_requests(self):
+        for params in [{'fields': 'name,password'}, {'fields': ','}, {'fields': ',', 'format': 'ndjson'},
+                {'cursor': 'nonsense'}, {'limit': 'ten'}]:
+            response = self.client.get(reverse('api_videos'), params)
+            self.assertEqual(400, response.status_code)
+            self.assertIn('error', response.json())
+
+
+    def test_stream_ndjson(self):
+        response = self.client.get(reverse('api_videos'), {'format': 'ndjson', 'fields': 'name,video_id'})
+        self.assertTrue(response.streaming)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+
+        lines = b''.join(response).decode().splitlines()
+        self.assertEqual([
+            {'name': 'abs', 'video_id': '102'},
+            {'name': 'HIIT', 'video_id': '103'},
+            {'name': 'Yoga', 'video_id': '101'},
+        ], [json.loads(line) for line in lines])
+
+        response = self.client.get(reverse('api_videos'), {'search_term': 'hiit'}, HTTP_ACCEPT='application/x-ndjson')
+        lines = b''.join(response).decode().splitlines()
+        self.assertEqual(['HIIT'], [json.loads(line)['name'] for line in lines])
+
+
+    def test_detail(self):
+        response = self.client.get(reverse('api_video', kwargs={'video_pk': self.yoga.pk}), {'fields': 'name,notes'})
+        self.assertEqual({'name': 'Yoga', 'notes': 'relaxing'}, response.json())
+
+        response = self.client.get(reverse('api_video', kwargs={'video_pk': 100}))
+        self.assertEqual(404, response.status_code)
+
+
+    def test_create(self):
+        video = {'name': 'Pilates', 'url': 'https://youtu.be/A0pkEgZiRG4', 'notes': 'core'}
+        response = self.client.post(reverse('api_videos'), data=video, content_type='application/json',
+            headers=AUTHORIZATION)
+        self.assertEqual(201, response.status_code)
+        self.assertEqual('A0pkEgZiRG4', response.json()['video_id'])
+        self.assertTrue(Video.objects.filter(video_id='A0pkEgZiRG4').exists())
+
+        response = self.client.post(reverse('api_videos'), data=video, content_type='application/json',
+            headers=AUTHORIZATION)
+        self.assertEqual(409, response.status_code)
+
+        for bad in [{'name': 'No URL'}, {'name': 'Bad URL', 'url': 'https://github.com'}, ['not', 'an', 'object']]:
+            response = self.client.post(reverse('api_videos'), data=bad, content_type='application/json',
+            headers=AUTHORIZATION)
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(4, Video.objects.count())
+
+
+    def test_bulk_create_json_array_and_ndjson(self):
+        videos = [
+            {'name': 'Pilates', 'url': 'https://youtu.be/A0pkEgZiRG4'},
+            {'name': 'Yoga again', 'url': 'https://www.youtube.com/watch?v=101'},
+            {'name': 'Bad', 'url': 'https://github.com'},
+            'nope',
         ]
+        response = self.client.post(reverse('api_bulk_create'), data=videos, content_type='application/json',
+            headers=AUTHORIZATION)
+        self.assertEqual(201, response.status_code)
+        report = response.json()
+        self.assertEqual(1, report['created'])
+        self.assertEqual(1, report['duplicates'])
+        self.assertEqual([3, 4], [reject['line'] for reject in report['rejected']])
 
-        for invalid_url in invalid_video_urls:
-            with self.assertRaises(ValidationError):
-                Video.objects.create(name='example', url=invalid_url, notes='example notes')
+        lines = '{"name": "Core", "url": "https://youtu.be/Nw2oBIrQGLo"}\n{"name": "Stretch", "url": "https://youtu.be/4vTJHUDB5ak"}\n'
+        response = self.client.post(reverse('api_bulk_create'), data=lines, content_type='application/x-ndjson',
+            headers=AUTHORIZATION)
+        self.assertEqual(2, response.json()['created'])
+        self.assertEqual(6, Video.objects.count())
 
-        video_count = Video.objects.count()
-        self.assertEqual(0, video_count)
 
+    def test_delete(self):
+        url = reverse('api_video', kwargs={'video_pk': self.yoga.pk})
+        response = self.client.delete(url, headers=AUTHORIZATION)
+        self.assertEqual(204, response.status_code)
+        self.assertFalse(Video.objects.filter(pk=self.yoga.pk).exists())
+        self.assertEqual(404, self.client.delete(url, headers=AUTHORIZATION).status_code)
 
-    def duplicate_video_raises_integrity_error(self):
-        Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
-        with self.assertRaises(IntegrityError):
-            Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
-class TestVideoInfo(TestCase):
-    
-    def test_video_list_shows_all_data(self):
-        #add videos
-        video_01 = Video.objects.create(name='test', notes='example1', url='https://www.youtube.com/watch?v=45asd6')
-        video_02 = Video.objects.create(name='test2', notes='example2', url='https://www.youtube.com/watch?v=789dasd')
-        
-        video_2 = Video.objects.get(pk=2)
 
-        response = self.client.get(reverse('video_info', kwargs={'video_pk':2} )) 
-        self.assertTemplateUsed(response, 'video_collection/video_info.html')
-        
-        #retrieve data sent to template
-        data_rendered = response.context['video']
-        #confirm that data is same as data for video_2
-        self.assertEqual(data_rendered, video_2)
-        #confirm correct data shown on page
-        self.assertContains(response, 'test')
-        self.assertContains(response, 'test2')
-        self.assertContains(response, 'https://www.youtube.com/watch?v=789dasd')
+    def test_writes_need_the_token(self):
+        video = {'name': 'Pilates', 'url': 'https://youtu.be/A0pkEgZiRG4'}
+        for headers in [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': API_TOKEN}]:
+            response = self.client.post(reverse('api_videos'), data=video, content_type='application/json',
+                headers=headers)
+            self.assertEqual(401, response.status_code)
+            self.assertEqual('Bearer', response['WWW-Authenticate'])
+            response = self.client.post(reverse('api_bulk_create'), data=[video], content_type='application/json',
+                headers=headers)
+            self.assertEqual(401, response.status_code)
+            response = self.client.delete(reverse('api_video', kwargs={'video_pk': self.yoga.pk}), headers=headers)
+            self.assertEqual(401, response.status_code)
 
-    def test_request_video_info_for_nonexistent_video_returns_404(self):
-        #add 2 videos
-        video_01 = Video.objects.create(name='test', notes='example1', url='https://www.youtube.com/watch?v=4512sa6')
-        video_02 = Video.objects.create(name='test2', notes='example2', url='https://www.youtube.com/watch?v=7asda389')
-        
-        
-        response = self.client.get(reverse('video_info', kwargs={'video_pk':23} )) 
-        
-        self.assertEqual(404, response.status_code)
\ No newline at end of file
+        self.assertEqual(3, Video.objects.count())
+        self.assertEqual(200, self.client.get(reverse('api_videos')).status_code)   # reads don't
+
+
+    @override_settings(VIDEO_API_TOKEN='')
+    def test_writes_refused_without_a_token_set(self):
+        response = self.client.delete(reverse('api_video', kwargs={'video_pk': self.yoga.pk}),
+            headers={'Authorization': 'Bearer '})
+        self.assertEqual(401, response.status_code)
+        self.assertTrue(Video.objects.filter(pk=self.yoga.pk).exists())
+
+
+# the app's URLs with the async views in place of the sync ones, for TestAsyncViews
+urlpatterns = [
+    path(str(pattern.pattern), getattr(async_views, pattern.callback.__name__, pattern.callback), name=pattern.name)
+    for pattern in urls.urlpatterns
+]
+
+
+@override_settings(ROOT_URLCONF='video_collection.tests', VIDEO_API_TOKEN=API_TOKEN)
+class TestAsyncViews(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', notes='relaxing', url='https://www.youtube.com/watch?v=101')
+        self.abs = Video.objects.create(name='abs', notes='core', url='https://www.youtube.com/watch?v=102')
+
+
+    async def test_async_views_routed(self):
+        response = await self.async_client.get(reverse('video_list'))
+        self.assertIs(async_views.video_list, response.resolver_match.func)
+
+
+    async def test_video_list(self):
+        response = await self.async_client.get(reverse('video_list'))
+        self.assertEqual([self.abs, self.yoga], response.context['videos'])
+        self.assertContains(response, '2 videos')
+
+        response = await self.async_client.get(reverse('video_list'), {'search_term': 'yoga'})
+        self.assertEqual([self.yoga], response.context['videos'])
+
+        for cursor in ['nonsense', encode_cursor('next', ['x', 'y'])]:
+            response = await self.async_client.get(reverse('video_list'), {'cursor': cursor})
+            self.assertEqual(400, response.status_code)
+            response = await self.async_client.get(reverse('api_videos'), {'cursor': cursor})
+            self.assertEqual(400, response.status_code)
+
+
+    async def test_video_list_not_modified(self):
+        response = await self.async_client.get(reverse('video_list'))
+        self.assertNotIn('Last-Modified', response)
+
+        response = await self.async_client.get(reverse('video_list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(304, response.status_code)
+
+
+    async def test_video_info(self):
+        url = reverse('video_info', kwargs={'video_pk': self.yoga.pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(self.yoga, response.context['video'])
+        self.assertContains(response, 'relaxing')
+
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(304, response.status_code)
+
+        response = await self.async_client.get(reverse('video_info', kwargs={'video_pk': 100}))
+        self.assertEqual(404, response.status_code)
+
+
+    async def test_api(self):
+        response = await self.async_client.get(reverse('api_videos'), {'fields': 'name'})
+        self.assertEqual({'count': 2, 'next': None, 'previous': None, 'videos': [{'name': 'abs'}, {'name': 'Yoga'}]},
+            response.json())
+
+        response = await self.async_client.get(reverse('api_videos'), {'format': 'ndjson', 'fields': 'video_id'})
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual([b'{"video_id": "102"}\n', b'{"video_id": "101"}\n'], lines)
+
+        response = await self.async_client.get(reverse('api_videos'), {'format': 'ndjson', 'fields': ','})
+        self.assertEqual(400, response.status_code)
+
+        url = reverse('api_video', kwargs={'video_pk': self.yoga.pk})
+        response = await self.async_client.get(url, {'fields': 'notes'})
+        self.assertEqual({'notes': 'relaxing'}, response.json())
+
+        response = await self.async_client.put(url)
+        self.assertEqual(405, response.status_code)
+
+        response = await self.async_client.delete(url)
+        self.assertEqual(401, response.status_code)
+
+        response = await self.async_client.delete(url, headers=AUTHORIZATION)
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(1, await Video.objects.acount())
+
+
+    async def test_api_create(self):
+        video = {'name': 'Pilates', 'url': 'https://youtu.be/A0pkEgZiRG4'}
+        for url in (reverse('api_videos'), reverse('api_bulk_create')):
+            response = await self.async_client.post(url, content_type='application/json',
+                data=video if url == reverse('api_videos') else [video])
+            self.assertEqual(401, response.status_code)
+
+        response = await self.async_client.post(reverse('api_videos'), content_type='application/json',
+            data=video, headers=AUTHORIZATION)
+        self.assertEqual(201, response.status_code)
+        self.assertTrue(await Video.objects.filter(video_id='A0pkEgZiRG4').aexists())
+
+
+class TestVideoEmbeds(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.video = Video.objects.create(name='Yoga', url='https://www.youtube.com/watch?v=Nw2oBIrQGLo')
+
+
+    def test_video_list_shows_lazy_thumbnails_not_players(self):
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, '<img src="https://i.ytimg.com/vi/Nw2oBIrQGLo/hqdefault.jpg"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'data-video-id="Nw2oBIrQGLo"')
+        self.assertContains(response, 'js/facade.js')
+        self.assertNotContains(response, '<iframe')
+
+
+    def test_video_info_shows_player(self):
+        response = self.client.get(reverse('video_info', kwargs={'video_pk': self.video.pk}))
+        self.assertContains(response, '<iframe width="420" height="315" src="https://youtube.com/embed/Nw2oBIrQGLo">')
+        self.assertNotContains(response, 'video-facade')
+
+
+@override_settings(VIDEO_LIST_PAGE_SIZE=2)
+class TestVideoListPagination(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # two videos with the same name apart from case, ordered by pk between themselves
+        self.v1 = Video.objects.create(name='def', notes='example', url='https://www.youtube.com/watch?v=101')
+        self.v2 = Video.objects.create(name='ABC', notes='example', url='https://www.youtube.com/watch?v=456')
+        self.v3 = Video.objects.create(name='abc', notes='example', url='https://www.youtube.com/watch?v=123')
+        self.v4 = Video.objects.create(name='XYZ', notes='example', url='https://www.youtube.com/watch?v=789')
+        self.v5 = Video.objects.create(name='lmn', notes='example', url='https://www.youtube.com/watch?v=111')
+
+    def test_pages_follow_next_and_previous_cursors(self):
+        response = self.client.get(reverse('video_list'))
+        self.assertEqual([self.v2, self.v3], response.context['videos'])
+        self.assertIsNone(response.context['prev_url'])
+        self.assertContains(response, '5 videos')   # count is for all videos, not just this page
+
+        response = self.client.get(reverse('video_list') + response.context['next_url'])
+        self.assertEqual([self.v1, self.v5], response.context['videos'])
+        self.assertContains(response, '5 videos')
+
+        response = self.client.get(reverse('video_list') + response.context['next_url'])
+        self.assertEqual([self.v4], response.context['videos'])
+        self.assertIsNone(response.context['next_url'])
+
+        response = self.client.get(reverse('video_list') + response.context['prev_url'])
+        self.assertEqual([self.v1, self.v5], response.context['videos'])
+
+        response = self.client.get(reverse('video_list') + response.context['prev_url'])
+        self.assertEqual([self.v2, self.v3], response.context['videos'])
+        self.assertIsNone(response.context['prev_url'])
+        self.assertIsNotNone(response.context['next_url'])
+
+    def test_cursor_keeps_search_term(self):
+        response = self.client.get(reverse('video_list') + '?search_term=abc')
+        self.assertEqual([self.v2, self.v3], response.context['videos'])
+        self.assertIsNone(response.context['next_url'])
+
+        Video.objects.create(name='abc cat', notes='example', url='https://www.youtube.com/watch?v=222')
+
+        response = self.client.get(reverse('video_list') + '?search_term=abc')
+        self.assertEqual([self.v2, self.v3], response.context['videos'])
+        self.assertIn('search_term=abc', response.context['next_url'])
+        self.assertContains(response, '3 videos')
+
+        response = self.client.get(reverse('video_list') + response.context['next_url'])
+        self.assertEqual(['abc cat'], [video.name for video in response.context['videos']])
+
+    def test_invalid_cursor_is_bad_request(self):
+        for cursor in ['nonsense', 'W10', '!!!!']:
+            response = self.client.get(reverse('video_list') + f'?cursor={cursor}')
+            self.assertEqual(400, response.status_code)
+
+    def test_forged_cursor_values_are_bad_request(self):
+        # well formed cursors with values the sort keys can't take
+        for values in [['a', None], ['x', 'y'], ['a', [1]], [{'a': 1}, 1]]:
+            cursor = encode_cursor('next', values)
+            for url in [reverse('video_list'), reverse('api_videos')]:
+                self.assertEqual(400, self.client.get(url, {'cursor': cursor}).status_code)
+            with override_settings(VIDEO_STREAM_LIST=True):
+                self.assertEqual(400, self.client.get(reverse('video_list'), {'cursor': cursor}).status_code)
+
+    def test_stale_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('video_list'))
+        response = self.client.get(reverse('video_list') + response.context['next_url'])
+        next_url = response.context['next_url']
+        self.v4.delete()   # the only video on the last page
+
+        response = self.client.get(reverse('video_list') + next_url)
+        self.assertEqual([self.v2, self.v3], response.context['videos'])
+
+
+class TestVideoSearch(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Morning Yoga', notes='gentle stretching', url='https://www.youtube.com/watch?v=101')
+        self.run = Video.objects.create(name='Running drills', notes='warm up with yoga first', url='https://www.youtube.com/watch?v=102')
+        self.hiit = Video.objects.create(name='HIIT', notes='intervals', url='https://www.youtube.com/watch?v=103')
+
+
+    def search(self, term):
+        response = self.client.get(reverse('video_list'), {'search_term': term})
+        return list(response.context['videos'])
+
+
+    def test_search_backend_for_database(self):
+        backend = search.get_backend()
+        if connection.vendor == 'sqlite':
+            self.assertIsInstance(backend, search.SQLiteFullTextSearch)
+        with override_settings(VIDEO_SEARCH_BACKEND='contains'):
+            self.assertIsInstance(search.get_backend(), search.ContainsSearch)
+        with self.assertRaises(ValueError):
+            search.get_backend('kittens')
+
+
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'needs full text search')
+    def test_search_matches_name_and_notes_ranked(self):
+        # yoga in the name, and in a longer notes field, ranks higher than yoga in notes alone
+        self.assertEqual([self.yoga, self.run], self.search('yoga'))
+
+
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'needs full text search')
+    def test_search_matches_word_prefixes_and_all_words(self):
+        self.assertEqual([self.run], self.search('run'))
+        self.assertEqual([self.yoga], self.search('YOGA stretch'))
+        self.assertEqual([], self.search('yoga intervals'))
+
+
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'needs full text search')
+    def test_search_index_follows_updates_and_deletes(self):
+        self.hiit.name = 'Yoga intervals'
+        self.hiit.save()
+        self.assertIn(self.hiit, self.search('yoga'))
+
+        self.yoga.delete()
+        self.assertNotIn(self.yoga, self.search('yoga'))
+        self.assertEqual([], self.search('gentle'))
+
+
+    def test_search_punctuation_only_matches_substring(self):
+        odd = Video.objects.create(name='Pilates?!', url='https://www.youtube.com/watch?v=104')
+        self.assertEqual([odd], self.search('?!'))
+
+
+    @override_settings(VIDEO_SEARCH_BACKEND='contains')
+    def test_contains_search_matches_partial_names_only(self):
+        self.assertEqual([self.yoga], self.search('oga'))
+        self.assertEqual([], self.search('stretching'))
+
+
+    @override_settings(VIDEO_LIST_PAGE_SIZE=2)
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'needs full text search')
+    def test_ranked_results_paginate(self):
+        for n in range(3):
+            Video.objects.create(name=f'Yoga {n}', notes='yoga ' * n, url=f'https://www.youtube.com/watch?v=20{n}')
+
+        pages = []
+        url = reverse('video_list') + '?search_term=yoga'
+        while url:
+            response = self.client.get(url)
+            pages.append(response.context['videos'])
+            next_url = response.context['next_url']
+            url = reverse('video_list') + next_url if next_url else None
+
+        found = [video for page in pages for video in page]
+        self.assertEqual([2, 2, 1], [len(page) for page in pages])
+        backend = search.get_backend()
+        ranked = backend.search(Video.objects.annotate(lower_name=Lower('name')), 'yoga').order_by(*backend.keys)
+        self.assertEqual(list(ranked), found)
+
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite triggers')
+    def test_missing_triggers_restored_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER video_collection_video_fts_insert')
+        Video.objects.create(name='Pilates', url='https://www.youtube.com/watch?v=104')
+        self.assertEqual([], self.search('pilates'))
+
+        search.restore_sqlite_triggers()
+
+        self.assertEqual(1, len(self.search('pilates')))
+        Video.objects.create(name='Pilates 2', url='https://www.youtube.com/watch?v=105')
+        self.assertEqual(2, len(self.search('pilates')))
+
+
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', notes='relaxing', url='https://www.youtube.com/watch?v=101')
+        self.run = Video.objects.create(name='Running', notes='fast', url='https://www.youtube.com/watch?v=102')
+
+
+    def get_info(self, video):
+        return self.client.get(reverse('video_info', kwargs={'video_pk': video.pk}))
+
+
+    def assertCached(self, url):
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return response
+
+
+    def test_list_page_cached_until_a_video_changes(self):
+        self.client.get(reverse('video_list'))
+        response = self.assertCached(reverse('video_list'))
+        self.assertContains(response, 'relaxing')
+
+        self.yoga.notes = 'stretching'
+        self.yoga.save()
+
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, 'stretching')
+        self.assertNotContains(response, 'relaxing')
+
+
+    def test_search_term_normalized_in_cache_key(self):
+        self.client.get(reverse('video_list'), {'search_term': 'Yoga'})
+        response = self.assertCached(reverse('video_list') + '?search_term=%20yOGA%20')
+        self.assertContains(response, '1 video')
+
+        response = self.client.get(reverse('video_list'), {'search_term': 'running'})
+        self.assertContains(response, 'Running')
+
+
+    def test_write_invalidates_only_that_videos_info_page(self):
+        self.get_info(self.yoga)   # sets the CSRF cookie, the delete form's token depends on it
+        for video in [self.yoga, self.run]:
+            self.get_info(video)
+            self.assertCached(reverse('video_info', kwargs={'video_pk': video.pk}))
+
+        self.yoga.name = 'Morning Yoga'
+        self.yoga.save()
+
+        self.assertCached(reverse('video_info', kwargs={'video_pk': self.run.pk}))
+        response = self.get_info(self.yoga)
+        self.assertContains(response, 'Morning Yoga')
+
+
+    def test_info_page_not_shared_between_csrf_cookies(self):
+        self.get_info(self.yoga)
+        self.get_info(self.yoga)
+
+        other = self.client_class()
+        response = other.get(reverse('video_info', kwargs={'video_pk': self.yoga.pk}))
+        self.assertIsNotNone(response.context)   # rendered, not another client's copy
+
+
+    def test_delete_invalidates_list_and_info_pages(self):
+        self.get_info(self.yoga)
+        self.get_info(self.yoga)
+        self.client.get(reverse('video_list'))
+
+        info_url = reverse('video_info', kwargs={'video_pk': self.yoga.pk})
+        self.yoga.delete()
+
+        self.assertEqual(404, self.client.get(info_url).status_code)
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, '1 video')
+        self.assertNotContains(response, 'Yoga')
+
+
+    @override_settings(VIDEO_API_TOKEN=API_TOKEN)
+    def test_import_invalidates_list(self):
+        self.client.get(reverse('video_list'))
+        self.client.post(reverse('import_videos'), content_type='text/csv',
+            data='name,url\nPilates,https://www.youtube.com/watch?v=103\n', headers=AUTHORIZATION)
+
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, 'Pilates')
+
+
+    @override_settings(VIDEO_CACHE_TIMEOUT=0, VIDEO_FRAGMENT_CACHE_TIMEOUT=0)
+    def test_cache_can_be_turned_off(self):
+        self.client.get(reverse('video_list'))
+        with self.assertNumQueries(4):   # page, count, tags of the page and the tag choices
+            self.client.get(reverse('video_list'))
+
+
+class TestVideoLookup(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.yoga = Video.objects.create(name='Yoga', notes='relaxing', url='https://www.youtube.com/watch?v=101')
+
+
+    def test_video_cached(self):
+        with self.assertNumQueries(1):
+            first = lookup.get_video(self.yoga.pk)
+        with self.assertNumQueries(0):
+            second = lookup.get_video(self.yoga.pk)
+        self.assertEqual(('Yoga', 'relaxing', '101'), (second.name, second.notes, second.video_id))
+        self.assertEqual(self.yoga.updated, second.updated)
+        self.assertIsNot(first, second)   # a new instance each time, safe to change
+
+
+    def test_missing_video_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(lookup.get_video(100))
+        with self.assertNumQueries(0):
+            self.assertIsNone(lookup.get_video(100))
+            self.assertIsNone(lookup.get_video(100))
+
+
+    def test_save_and_delete_forget_the_video(self):
+        lookup.get_video(self.yoga.pk)
+        self.yoga.name = 'Morning Yoga'
+        self.yoga.save()
+        self.assertEqual('Morning Yoga', lookup.get_video(self.yoga.pk).name)
+
+        self.yoga.soft_delete()
+        self.assertIsNone(lookup.get_video(self.yoga.pk))
+        self.yoga.restore()
+        self.assertIsNotNone(lookup.get_video(self.yoga.pk))
+
+
+    def test_tag_change_forgets_the_video(self):
+        updated = lookup.get_video(self.yoga.pk).updated
+        self.yoga.tags.add(Tag.objects.create(name='Stretch', slug='stretch'))
+        self.assertGreater(lookup.get_video(self.yoga.pk).updated, updated)
+
+
+    def test_by_video_id(self):
+        self.assertEqual(self.yoga.pk, lookup.get_video_by_video_id('101').pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.yoga.pk, lookup.get_video_by_video_id('101').pk)
+
+        self.assertIsNone(lookup.get_video_by_video_id('102'))
+        importer.import_rows([(2, {'name': 'Running', 'url': 'https://www.youtube.com/watch?v=102'}, None)])
+        self.assertEqual('Running', lookup.get_video_by_video_id('102').name)
+
+
+    def test_by_video_id_after_url_changed(self):
+        lookup.get_video_by_video_id('101')
+        self.yoga.url = 'https://www.youtube.com/watch?v=103'
+        self.yoga.save()
+        self.assertIsNone(lookup.get_video_by_video_id('101'))
+        self.assertEqual(self.yoga.pk, lookup.get_video_by_video_id('103').pk)
+
+
+    @override_settings(VIDEO_LOOKUP_SHARED=True)
+    def test_shared_cache(self):
+        lookup.get_video(self.yoga.pk)
+        lookup.reset()   # as in another process
+        with self.assertNumQueries(0):
+            self.assertEqual('Yoga', lookup.get_video(self.yoga.pk).name)
+
+        self.yoga.name = 'Morning Yoga'
+        self.yoga.save()
+        lookup.reset()
+        self.assertEqual('Morning Yoga', lookup.get_video(self.yoga.pk).name)
+
+
+    @override_settings(VIDEO_LOOKUP_LOCAL_TIMEOUT=0)
+    def test_local_entries_expire(self):
+        lookup.get_video(self.yoga.pk)
+        with self.assertNumQueries(1):
+            lookup.get_video(self.yoga.pk)
+
+
+    @override_settings(VIDEO_LOOKUP_TIMEOUT=0)
+    def test_cache_can_be_turned_off(self):
+        lookup.get_video(self.yoga.pk)
+        with self.assertNumQueries(1):
+            lookup.get_video(self.yoga.pk)
+
+
+    def test_missing_video_pages_without_queries(self):
+        url = reverse('video_info', kwargs={'video_pk': 100})
+        self.assertEqual(404, self.client.get(url).status_code)
+        with self.assertNumQueries(0):
+            self.assertEqual(404, self.client.get(url).status_code)
+            self.assertEqual(404, self.client.post(reverse('delete_video', kwargs={'video_pk': 100})).status_code)
+
+
+    def test_deleted_from_the_page(self):
+        lookup.get_video(self.yoga.pk)
+        self.client.post(reverse('delete_video', kwargs={'video_pk': self.yoga.pk}))
+        self.assertIsNotNone(Video.all_objects.get(pk=self.yoga.pk).deleted_at)
+        self.assertEqual(404, self.client.get(reverse('video_info', kwargs={'video_pk': self.yoga.pk})).status_code)
+
+
+    @override_settings(VIDEO_LOOKUP_CACHE_SIZE=2)
+    def test_counters_on_metrics_page(self):
+        run = Video.objects.create(name='Running', url='https://www.youtube.com/watch?v=102')
+        for pk in (self.yoga.pk, self.yoga.pk, 100, 100, run.pk):
+            lookup.get_video(pk)
+
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE video_lookup_cache_hits_total counter\n', text)
+        self.assertIn('video_lookup_cache_hits_total{layer="local",result="found"} 1\n', text)
+        self.assertIn('video_lookup_cache_hits_total{layer="local",result="missing"} 1\n', text)
+        self.assertIn('video_lookup_cache_misses_total{result="found"} 2\n', text)
+        self.assertIn('video_lookup_cache_misses_total{result="missing"} 1\n', text)
+        self.assertIn('video_lookup_cache_evictions_total 1\n', text)
+
+
+class TestConditionalGet(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', notes='relaxing', url='https://www.youtube.com/watch?v=101')
+        self.run = Video.objects.create(name='Running', notes='fast', url='https://www.youtube.com/watch?v=102')
+        self.info_url = reverse('video_info', kwargs={'video_pk': self.yoga.pk})
+
+
+    def test_timestamps(self):
+        self.assertIsNotNone(self.yoga.created)
+        updated = self.yoga.updated
+        self.yoga.notes = 'stretching'
+        self.yoga.save()
+        self.assertGreater(self.yoga.updated, updated)
+        self.assertLess(self.yoga.created, self.yoga.updated)
+
+
+    def test_video_info_not_modified(self):
+        response = self.client.get(self.info_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(self.info_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+        self.assertEqual([], response.templates)
+
+        response = self.client.get(self.info_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(304, response.status_code)
+
+
+    def test_video_info_modified_after_update(self):
+        etag = self.client.get(self.info_url)['ETag']
+        self.yoga.notes = 'stretching'
+        self.yoga.save()
+
+        response = self.client.get(self.info_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'stretching')
+        self.assertNotEqual(etag, response['ETag'])
+
+
+    def test_video_info_missing_video_still_404(self):
+        response = self.client.get(reverse('video_info', kwargs={'video_pk': 100}), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(404, response.status_code)
+
+
+    def test_video_list_not_modified(self):
+        etag = self.client.get(reverse('video_list'))['ETag']
+        response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual([], response.templates)
+
+
+    def test_video_list_has_no_last_modified(self):
+        # deleting a video doesn't change the latest update, so it can't say if the list changed
+        response = self.client.get(reverse('video_list'))
+        self.assertNotIn('Last-Modified', response)
+
+        self.run.soft_delete()
+        response = self.client.get(reverse('video_list'), HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(200, response.status_code)
+        self.assertNotContains(response, 'Running')
+
+
+    def test_video_list_etag_changes(self):
+        etags = {self.client.get(reverse('video_list'))['ETag']}
+
+        etags.add(self.client.get(reverse('video_list'), {'search_term': 'yoga'})['ETag'])
+
+        self.run.name = 'Sprints'
+        self.run.save()
+        etags.add(self.client.get(reverse('video_list'))['ETag'])
+
+        Video.objects.create(name='Pilates', url='https://www.youtube.com/watch?v=103')
+        etags.add(self.client.get(reverse('video_list'))['ETag'])
+
+        self.run.delete()   # count changes, latest update doesn't
+        etags.add(self.client.get(reverse('video_list'))['ETag'])
+
+        self.assertEqual(5, len(etags))
+
+
+    def test_video_list_modified_after_tag_change(self):
+        # no video changes, but the tag filter's choices do
+        etag = self.client.get(reverse('video_list'))['ETag']
+
+        tag = Tag.objects.create(name='Pilates', slug='pilates')
+        response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Pilates')
+
+        tag.name = 'Barre'
+        tag.save()
+        response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'Barre')
+
+        tag.delete()
+        response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, response.status_code)
+        self.assertNotContains(response, 'Barre')
+
+
+    def test_cached_page_answers_not_modified(self):
+        etag = self.client.get(reverse('video_list'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+
+class TestVideoListIndex(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(30):
+            Video.objects.create(name=f'Video {n}', url=f'https://www.youtube.com/watch?v=abc{n}')
+
+        if connection.vendor == 'postgresql':
+            # the planner prefers a sequential scan on a table this small
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+        self.paginator = KeysetPaginator(Video.objects.annotate(lower_name=Lower('name')),
+            keys=('lower_name', 'pk'), page_size=10)
+
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertIn('video_lower_name_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)   # SQLite's marker for sorting outside an index
+
+
+    def test_video_list_ordering_uses_lower_name_index(self):
+        queryset = Video.objects.annotate(lower_name=Lower('name')).order_by('lower_name', 'pk')[:11]
+        self.assertUsesIndex(queryset)
+
+
+    def test_keyset_queries_use_lower_name_index(self):
+        next_cursor = self.paginator.page().next_cursor
+        page = self.paginator.page(next_cursor)
+
+        for cursor, backwards in [(next_cursor, False), (page.prev_cursor, True)]:
+            _, values = decode_cursor(cursor, 2)
+            queryset = Video.objects.annotate(lower_name=Lower('name')).filter(self.paginator._seek(values, backwards))
+            ordering = ['-lower_name', '-pk'] if backwards else ['lower_name', 'pk']
+            self.assertUsesIndex(queryset.order_by(*ordering)[:11])
+            if connection.vendor == 'sqlite':
+                # seeks to the cursor rather than scanning the index from the start
+                self.assertIn('SEARCH', queryset.order_by(*ordering)[:11].explain())
+
+
+@override_settings(VIDEO_CACHE_TIMEOUT=0)
+class TestVideoListFragments(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', notes='stretch', url='https://www.youtube.com/watch?v=101')
+        self.abs = Video.objects.create(name='Abs', notes='core', url='https://www.youtube.com/watch?v=102')
+
+
+    def test_unchanged_videos_come_from_the_cache(self):
+        first = self.client.get(reverse('video_list'))
+        # count, page and tag choices, no tags of the page, and the same page
+        with self.assertNumQueries(3):
+            second = self.client.get(reverse('video_list'))
+        self.assertEqual(first.content, second.content)
+
+
+    def test_changed_video_rendered_again(self):
+        self.client.get(reverse('video_list'))
+
+        self.yoga.name = 'Morning Yoga'
+        self.yoga.save()
+        self.abs.tags.add(Tag.objects.create(name='Core', slug='core'))
+
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, 'Morning Yoga')
+        self.assertContains(response, 'href="/video_list?tag=core"', count=1)
+
+
+    def test_fragment_key_changes_with_updated(self):
+        key = fragments.fragment_key(self.yoga)
+        self.yoga.save()
+        self.assertNotEqual(key, fragments.fragment_key(self.yoga))
+
+
+    @override_settings(VIDEO_FRAGMENT_CACHE_TIMEOUT=0)
+    def test_fragment_cache_can_be_turned_off(self):
+        self.client.get(reverse('video_list'))
+        with self.assertNumQueries(4):   # the tags of the page every time
+            self.client.get(reverse('video_list'))
+
+
+    @override_settings(VIDEO_STREAM_LIST=True)
+    def test_streamed_page(self):
+        response = self.client.get(reverse('video_list'))
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response]
+
+        # header and search form first, then the videos
+        self.assertIn('name="search_term"', chunks[0])
+        self.assertIn('2 videos', chunks[0])
+        self.assertNotIn('Yoga', chunks[0])
+        self.assertLess(''.join(chunks).index('Abs'), ''.join(chunks).index('Yoga'))
+
+        # the same page as without streaming
+        with override_settings(VIDEO_STREAM_LIST=False):
+            self.assertEqual(self.client.get(reverse('video_list')).content.decode(), ''.join(chunks))
+
+
+    @override_settings(VIDEO_STREAM_LIST=True)
+    def test_streamed_page_invalid_cursor(self):
+        response = self.client.get(reverse('video_list'), {'cursor': 'nonsense'})
+        self.assertEqual(400, response.status_code)
+
+
+class TestWarmTemplates(TestCase):
+
+    def test_warm_templates(self):
+        out = StringIO()
+        call_command('warm_templates', stdout=out)
+        self.assertIn(f'Compiled {len(warmup.template_names())} templates', out.getvalue())
+
+        # every template is in the cached loader, compiled
+        engine = Engine.get_default()
+        cached = engine.template_loaders[0].get_template_cache
+        self.assertIn('video_collection/video_list.html', warmup.template_names())
+        for name in warmup.template_names():
+            self.assertIn(name, cached)
+
+
+    def test_template_that_does_not_compile(self):
+        engine = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+            'video_collection/home.html': '{% if %}',
+        })])
+        with mock.patch.object(warmup, 'template_names', return_value=['video_collection/home.html']):
+            with mock.patch.object(Engine, 'get_default', return_value=engine):
+                with self.assertRaisesMessage(CommandError, 'video_collection/home.html'):
+                    call_command('warm_templates', stdout=StringIO())
+
+
+class TestSettingsProfiles(DjangoTestCase):
+
+    def test_production_settings_use_cached_loader(self):
+        with mock.patch.dict(os.environ, {'DJANGO_SECRET_KEY': 'secret', 'VIDEO_ALLOWED_HOSTS': 'a.example,b.example'}):
+            production = importlib.import_module('video.settings.prod')
+        self.assertFalse(production.DEBUG)
+        self.assertEqual('secret', production.SECRET_KEY)
+        self.assertEqual(['a.example', 'b.example'], production.ALLOWED_HOSTS)
+        self.assertTrue(production.VIDEO_WARM_TEMPLATES)
+        self.assertEqual([], production.VIDEO_METRICS_ALLOWED_IPS)   # behind a proxy, the token instead
+        loader, _ = production.TEMPLATES[0]['OPTIONS']['loaders'][0]
+        self.assertEqual('django.template.loaders.cached.Loader', loader)
+        self.assertFalse(production.TEMPLATES[0]['APP_DIRS'])
+
+
+    def test_production_settings_need_a_secret_key(self):
+        environ = {name: value for name, value in os.environ.items() if name != 'DJANGO_SECRET_KEY'}
+        with mock.patch.dict(os.environ, environ, clear=True), mock.patch.dict(sys.modules):
+            sys.modules.pop('video.settings.prod', None)
+            with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SECRET_KEY'):
+                importlib.import_module('video.settings.prod')
+
+
+    def test_no_persistent_connections_under_asgi(self):
+        for environ, max_age in [({'VIDEO_ASGI': '1'}, 0), ({'VIDEO_ASGI': ''}, 600)]:
+            with mock.patch.dict(os.environ, environ), mock.patch.dict(sys.modules):
+                sys.modules.pop('video.settings.base', None)
+                base = importlib.import_module('video.settings.base')
+            self.assertEqual(max_age, base.DATABASES['default']['CONN_MAX_AGE'])
+
+
+    def test_worker_settings_load_only_the_app(self):
+        worker = importlib.import_module('video.settings.worker')
+        self.assertEqual(['video_collection'], worker.INSTALLED_APPS)
+        self.assertEqual([], worker.MIDDLEWARE)
+        self.assertEqual([], worker.TEMPLATES)
+        # the same database and cache as the pages
+        base = importlib.import_module('video.settings.base')
+        self.assertEqual(base.DATABASES, worker.DATABASES)
+        self.assertEqual(base.CACHES, worker.CACHES)
+
+
+class TestStaticFiles(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root)
+
+        # the static files of the production settings, only this app's
+        middleware = list(django_settings.MIDDLEWARE)
+        middleware.insert(1 + middleware.index('django.middleware.security.SecurityMiddleware'),
+            'video_collection.middleware.StaticFilesMiddleware')
+        production = override_settings(STATIC_ROOT=cls.root, MIDDLEWARE=middleware,
+            STATICFILES_DIRS=[os.path.join(os.path.dirname(__file__), 'static')],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'video_collection.storage.CompressedManifestStaticFilesStorage'},
+            })
+        production.enable()
+        cls.addClassCleanup(production.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        with open(os.path.join(cls.root, 'staticfiles.json')) as file:
+            cls.hashed_name = json.load(file)['paths']['css/water.css']
+        cls.original_size = os.path.getsize(os.path.join(cls.root, 'css', 'water.css'))
+
+
+    def compressed_size(self, extension):
+        return os.path.getsize(os.path.join(self.root, self.hashed_name + extension))
+
+
+    def test_compressed_copies(self):
+        path = os.path.join(self.root, self.hashed_name)
+        self.assertRegex(self.hashed_name, r'^css/water\.[0-9a-f]{12}\.css$')
+
+        with open(path, 'rb') as file, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(file.read(), compressed.read())
+        # CSS compresses to well under half
+        self.assertLess(self.compressed_size('.gz'), self.original_size / 2)
+        if storage.brotli:
+            self.assertLess(self.compressed_size('.br'), self.compressed_size('.gz'))
+        else:
+            self.assertFalse(os.path.exists(path + '.br'))
+
+
+    def test_pages_link_hashed_names(self):
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'/static/{self.hashed_name}')
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+
+
+    def test_hashed_name_cached_for_good(self):
+        response = self.client.get(f'/static/{self.hashed_name}', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('public, max-age=31536000, immutable', response['Cache-Control'])
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', response['Vary'])
+        self.assertEqual('text/css', response['Content-Type'])
+        self.assertEqual(str(self.compressed_size('.gz')), response['Content-Length'])
+        self.assertEqual('nosniff', response['X-Content-Type-Options'])   # after SecurityMiddleware
+
+
+    @skipUnless(storage.brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        response = self.client.get(f'/static/{self.hashed_name}', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual('br', response['Content-Encoding'])
+        self.assertEqual(str(self.compressed_size('.br')), response['Content-Length'])
+
+
+    def test_uncompressed(self):
+        for accept_encoding in ('', 'identity', 'gzip;q=0'):
+            response = self.client.get(f'/static/{self.hashed_name}', headers={'Accept-Encoding': accept_encoding})
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(str(self.original_size), response['Content-Length'])
+
+
+    def test_plain_name_cached_briefly(self):
+        response = self.client.get('/static/css/water.css')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('public, max-age=60', response['Cache-Control'])
+
+
+    def test_missing_file(self):
+        self.assertEqual(404, self.client.get('/static/css/missing.css').status_code)
+        self.assertEqual(404, self.client.get(f'/static/{self.hashed_name}.gz').status_code)
+
+
+class TestVideoModel(TestCase):
+    def test_create_id(self):
+        video = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
+        self.assertEqual('IODxDxX7oi4', video.video_id)
+
+
+    def test_create_id_valid_url_with_time_parameter(self):
+        # a video that is playing and paused may have a timestamp in the query
+        video = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4&ts=14')
+        self.assertEqual('IODxDxX7oi4', video.video_id)
+
+
+    def test_create_video_notes_optional(self):
+        v1 = Video.objects.create(name='example', url='https://www.youtube.com/watch?v=67890')
+        v2 = Video.objects.create(name='different example', notes='example', url='https://www.youtube.com/watch?v=12345')
+        expected_videos = [v1, v2]
+        database_videos = Video.objects.all()
+        self.assertCountEqual(expected_videos, database_videos)  # check contents of two lists/iterables but order doesn't matter.
+
+
+    def test_invalid_urls_raise_validation_error(self):
+        invalid_video_urls = [
+            'https://www.youtube.com/watch',
+            'https://www.youtube.com/watch/somethingelse',
+            'https://www.youtube.com/watch/somethingelse?v=1234567',
+            'https://www.youtube.com/watch?',
+            'https://www.youtube.com/watch?abc=123',
+            'https://www.youtube.com/watch?v=',
+            'https://www.youtube.com/watch?v1234',
+            'https://github.com',
+            '12345678',
+            'hhhhhhhhttps://www.youtube.com/watch',
+            'http://www.youtube.com/watch/somethingelse?v=1234567',
+            'https://minneapolis.edu'
+            'https://minneapolis.edu?v=123456'
+            ''
+        ]
+
+        for invalid_url in invalid_video_urls:
+            with self.assertRaises(ValidationError):
+                Video.objects.create(name='example', url=invalid_url, notes='example notes')
+
+        video_count = Video.objects.count()
+        self.assertEqual(0, video_count)
+
+
+    def duplicate_video_raises_integrity_error(self):
+        Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
+        with self.assertRaises(IntegrityError):
+            Video.objects.create(name='example', url='https://www.youtube.com/watch?v=IODxDxX7oi4')
+
+
+class TestYouTubeURLParser(TestCase):
+
+    def test_url_shapes(self):
+        urls = [
+            'https://www.youtube.com/watch?v=IODxDxX7oi4',
+            'https://www.youtube.com/watch?v=IODxDxX7oi4&t=14',
+            'https://www.youtube.com/watch?feature=share&v=IODxDxX7oi4',
+            'https://youtube.com/watch?v=IODxDxX7oi4',
+            'https://m.youtube.com/watch?v=IODxDxX7oi4',
+            'https://youtu.be/IODxDxX7oi4',
+            'https://youtu.be/IODxDxX7oi4?t=14',
+            'https://www.youtube.com/shorts/IODxDxX7oi4',
+            'https://www.youtube.com/embed/IODxDxX7oi4',
+            'https://www.youtube.com/embed/IODxDxX7oi4/',
+        ]
+        for url in urls:
+            self.assertEqual('IODxDxX7oi4', youtube.parse_video_id(url), url)
+
+
+    def test_invalid_urls(self):
+        urls = [
+            'https://youtu.be/',
+            'https://youtu.be/abc/def',
+            'https://www.youtube.com/shorts/',
+            'https://www.youtube.com/embed/abc/def',
+            'https://www.youtube.com/watch?v=abc def',
+            'https://www.youtube.com/watch?v=caf\u00e9',
+            'https://youtu.be/abc\n',
+            'https://www.youtube.com.example.com/watch?v=abc',
+            'http://youtu.be/IODxDxX7oi4',
+        ]
+        for url in urls:
+            with self.assertRaises(youtube.InvalidYouTubeURL, msg=url):
+                youtube.parse_video_id(url)
+
+
+    def test_results_are_cached(self):
+        youtube.cache_clear()
+        for _ in range(3):
+            youtube.parse_video_id('https://youtu.be/IODxDxX7oi4')
+            with self.assertRaises(youtube.InvalidYouTubeURL):
+                youtube.parse_video_id('https://github.com')
+
+        info = youtube.cache_info()
+        self.assertEqual(2, info.misses)
+        self.assertEqual(4, info.hits)
+        self.assertEqual(youtube.CACHE_SIZE, info.maxsize)
+
+
+    def test_save_skips_parsing_unchanged_url(self):
+        Video.objects.create(name='example', url='https://youtu.be/IODxDxX7oi4')
+        video = Video.objects.get()
+
+        with mock.patch('video_collection.models.extract_video_id') as extract:
+            video.notes = 'new notes'
+            video.save()
+            extract.assert_not_called()
+
+        video.url = 'https://www.youtube.com/shorts/A0pkEgZiRG4'
+        video.save()
+        self.assertEqual('A0pkEgZiRG4', Video.objects.get().video_id)
+
+        with self.assertRaises(ValidationError):
+            video.url = 'https://github.com'
+            video.save()
+
+
+class TestVideoInfo(TestCase):
+    
+    def test_video_list_shows_all_data(self):
+        #add videos
+        video_01 = Video.objects.create(name='test', notes='example1', url='https://www.youtube.com/watch?v=45asd6')
+        video_02 = Video.objects.create(name='test2', notes='example2', url='https://www.youtube.com/watch?v=789dasd')
+        
+        video_2 = Video.objects.get(pk=2)
+
+        response = self.client.get(reverse('video_info', kwargs={'video_pk':2} )) 
+        self.assertTemplateUsed(response, 'video_collection/video_info.html')
+        
+        #retrieve data sent to template
+        data_rendered = response.context['video']
+        #confirm that data is same as data for video_2
+        self.assertEqual(data_rendered, video_2)
+        #confirm correct data shown on page
+        self.assertContains(response, 'test')
+        self.assertContains(response, 'test2')
+        self.assertContains(response, 'https://www.youtube.com/watch?v=789dasd')
+
+    def test_request_video_info_for_nonexistent_video_returns_404(self):
+        #add 2 videos
+        video_01 = Video.objects.create(name='test', notes='example1', url='https://www.youtube.com/watch?v=4512sa6')
+        video_02 = Video.objects.create(name='test2', notes='example2', url='https://www.youtube.com/watch?v=7asda389')
+        
+        
+        response = self.client.get(reverse('video_info', kwargs={'video_pk':23} )) 
+        
+        self.assertEqual(404, response.status_code)
+
+
+class StubYouTubeAPI(BaseHTTPRequestHandler):
+    """ Local stand in for the YouTube Data API videos endpoint, see TestEnrichment """
+
+    videos = {}        # video ID to API item
+    requests = []      # query of each request
+    failures = []      # statuses to answer the next requests with, instead of the items
+
+    def do_GET(self):
+        query = parse.parse_qs(parse.urlsplit(self.path).query)
+        self.requests.append(query)
+
+        if self.failures:
+            self.send_response(self.failures.pop(0))
+            self.end_headers()
+            return
+
+        ids = query['id'][0].split(',')
+        body = json.dumps({'items': [self.videos[video_id] for video_id in ids if video_id in self.videos]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def api_item(video_id, title='Morning yoga', duration='PT12M30S', channel='Yoga Channel'):
+    return {
+        'id': video_id,
+        'snippet': {'title': title, 'channelTitle': channel,
+            'thumbnails': {'default': {'url': f'https://i.ytimg.com/vi/{video_id}/default.jpg'},
+                'high': {'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}}},
+        'contentDetails': {'duration': duration},
+    }
+
+
+class TestEnrichment(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubYouTubeAPI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_url = f'http://127.0.0.1:{cls.server.server_port}/youtube/v3/videos'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        StubYouTubeAPI.videos = {}
+        StubYouTubeAPI.requests = []
+        StubYouTubeAPI.failures = []
+
+    def fetcher(self, **kwargs):
+        return enrichment.YouTubeFetcher('test-key', self.api_url, backoff=0, **kwargs)
+
+
+    def test_enrich_fills_in_metadata(self):
+        video = Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        StubYouTubeAPI.videos['abc'] = api_item('abc')
+
+        report = enrichment.enrich(fetcher=self.fetcher())
+
+        self.assertEqual(1, report.enriched)
+        video.refresh_from_db()
+        self.assertEqual('Morning yoga', video.title)
+        self.assertEqual(timedelta(minutes=12, seconds=30), video.duration)
+        self.assertEqual('Yoga Channel', video.channel)
+        self.assertEqual('https://i.ytimg.com/vi/abc/hqdefault.jpg', video.thumbnail_url)
+        self.assertIsNotNone(video.enriched_at)
+        self.assertEqual(['test-key'], StubYouTubeAPI.requests[0]['key'])
+
+
+    def test_enrich_looks_up_videos_in_batches_of_50(self):
+        Video.objects.bulk_create(Video(name=f'video {n}', url=f'https://youtu.be/id{n}', video_id=f'id{n}')
+            for n in range(120))
+        StubYouTubeAPI.videos = {f'id{n}': api_item(f'id{n}') for n in range(120)}
+
+        report = enrichment.enrich(fetcher=self.fetcher(), workers=3)
+
+        self.assertEqual(120, report.enriched)
+        self.assertEqual([50, 50, 20], sorted((len(query['id'][0].split(',')) for query in StubYouTubeAPI.requests),
+            reverse=True))
+        self.assertFalse(Video.objects.filter(enriched_at__isnull=True).exists())
+
+
+    def test_enrich_skips_enriched_videos(self):
+        Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        StubYouTubeAPI.videos['abc'] = api_item('abc')
+        enrichment.enrich(fetcher=self.fetcher())
+
+        report = enrichment.enrich(fetcher=self.fetcher())
+        self.assertEqual(0, report.enriched)
+        self.assertEqual(1, len(StubYouTubeAPI.requests))
+
+
+    def test_video_not_on_youtube_is_marked_missing(self):
+        video = Video.objects.create(name='gone', url='https://www.youtube.com/watch?v=gone')
+
+        report = enrichment.enrich(fetcher=self.fetcher())
+
+        self.assertEqual(1, report.missing)
+        video.refresh_from_db()
+        self.assertEqual('', video.title)
+        self.assertIsNotNone(video.enriched_at)
+
+
+    def test_server_errors_are_retried(self):
+        video = Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        StubYouTubeAPI.videos['abc'] = api_item('abc')
+        StubYouTubeAPI.failures = [503, 429]
+
+        report = enrichment.enrich(fetcher=self.fetcher(retries=2))
+
+        self.assertEqual(1, report.enriched)
+        self.assertEqual(3, len(StubYouTubeAPI.requests))
+
+
+    def test_failed_batch_is_left_for_next_time(self):
+        video = Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        StubYouTubeAPI.failures = [503, 503, 400]
+
+        report = enrichment.enrich(fetcher=self.fetcher(retries=5))
+
+        self.assertEqual(1, report.failed_count)
+        self.assertIn('400', report.failed[0][1])
+        self.assertEqual(3, len(StubYouTubeAPI.requests))   # no retry after the 400
+        video.refresh_from_db()
+        self.assertIsNone(video.enriched_at)
+
+
+    def test_enriched_video_info_page_shows_metadata(self):
+        video = Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        url = reverse('video_info', kwargs={'video_pk': video.pk})
+        self.assertNotContains(self.client.get(url), 'Yoga Channel')
+
+        StubYouTubeAPI.videos['abc'] = api_item('abc')
+        enrichment.enrich(fetcher=self.fetcher())
+
+        self.assertContains(self.client.get(url), 'Morning yoga from Yoga Channel, 0:12:30')
+
+
+    def test_rate_limiter_spaces_calls(self):
+        with mock.patch.object(enrichment, 'time') as clock:
+            clock.monotonic.return_value = 100.0
+            limiter = enrichment.RateLimiter(rate=100, burst=2)
+            for _ in range(4):
+                limiter.wait()
+        # the burst goes straight through, the two after it wait 10 and 20ms
+        delays = [args[0] for args, _ in clock.sleep.call_args_list]
+        self.assertEqual(2, len(delays))
+        self.assertAlmostEqual(0.01, delays[0])
+        self.assertAlmostEqual(0.02, delays[1])
+
+
+    def test_enrich_videos_command(self):
+        Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        Video.objects.create(name='gone', url='https://www.youtube.com/watch?v=gone')
+        StubYouTubeAPI.videos['abc'] = api_item('abc')
+
+        out = StringIO()
+        with override_settings(VIDEO_YOUTUBE_API_KEY='test-key', VIDEO_YOUTUBE_API_URL=self.api_url):
+            call_command('enrich_videos', stdout=out)
+        self.assertIn('Enriched 1 videos, 1 not found on YouTube, 0 failed', out.getvalue())
+
+
+    @override_settings(VIDEO_YOUTUBE_API_KEY='')
+    def test_enrich_videos_command_needs_api_key(self):
+        with self.assertRaises(CommandError):
+            call_command('enrich_videos')
+
+
+class StubFetcher(enrichment.Fetcher):
+
+    def fetch(self, video_ids):
+        return {video_id: enrichment.VideoMetadata(video_id, f'Title of {video_id}', None, 'Channel', '')
+            for video_id in video_ids}
+
+
+class TestJobQueue(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        handlers = mock.patch.dict(jobs.HANDLERS)
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+        self.ran = []
+        jobs.handler('test', batch_size=2)(lambda claimed: self.ran.append([job.video_id for job in claimed]))
+        jobs.handler('broken')(self.broken)
+
+    def broken(self, claimed):
+        raise jobs.JobError('Broken')
+
+
+    @override_settings(VIDEO_YOUTUBE_API_KEY='test-key')
+    def test_adding_video_queues_enrichment_instead_of_fetching(self):
+        with mock.patch.object(enrichment.YouTubeFetcher, 'fetch') as fetch:
+            response = self.client.post(reverse('add_video'),
+                {'name': 'yoga', 'url': 'https://www.youtube.com/watch?v=abc', 'notes': ''})
+        self.assertRedirects(response, reverse('video_list'))
+        fetch.assert_not_called()
+
+        job = Job.objects.get()
+        self.assertEqual(('enrich', 'abc', Job.PENDING), (job.kind, job.video_id, job.status))
+
+        Video.objects.get(video_id='abc').save()   # not a new video, nothing queued
+        self.assertEqual(1, Job.objects.count())
+
+
+    @override_settings(VIDEO_YOUTUBE_API_KEY='')
+    def test_no_enrichment_queued_without_api_key(self):
+        Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        self.assertFalse(Job.objects.exists())
+
+
+    @override_settings(VIDEO_YOUTUBE_API_KEY='test-key')
+    def test_import_queues_enrichment_for_new_videos(self):
+        Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        rows = [(1, {'name': 'yoga', 'url': 'https://youtu.be/abc'}, None),
+            (2, {'name': 'core', 'url': 'https://youtu.be/def'}, None)]
+        importer.import_rows(rows)
+        self.assertEqual(['abc', 'def'], sorted(Job.objects.values_list('video_id', flat=True)))
+
+
+    def test_queued_job_for_video_is_not_queued_twice(self):
+        jobs.enqueue('test', 'abc')
+        jobs.enqueue_many('test', ['abc', 'def'])
+        jobs.enqueue('broken', 'abc')   # a different kind of job
+        self.assertEqual(3, Job.objects.count())
+
+        Job.objects.filter(kind='test', video_id='abc').update(status=Job.DEAD)
+        jobs.enqueue('test', 'abc')
+        self.assertEqual(4, Job.objects.count())
+
+
+    def test_work_runs_jobs_in_batches_and_deletes_them(self):
+        jobs.enqueue_many('test', ['a', 'b', 'c'])
+
+        self.assertEqual(3, jobs.work(burst=True))
+        self.assertEqual([['a', 'b'], ['c']], self.ran)
+        self.assertFalse(Job.objects.exists())
+
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        jobs.enqueue_many('test', ['a', 'b', 'c'])
+
+        first = jobs.claim('worker-1')
+        second = jobs.claim('worker-2')
+        self.assertEqual(['a', 'b'], [job.video_id for job in first])
+        self.assertEqual(['c'], [job.video_id for job in second])
+        self.assertEqual([], jobs.claim('worker-3'))
+        self.assertEqual({Job.RUNNING}, set(Job.objects.values_list('status', flat=True)))
+
+
+    @override_settings(VIDEO_JOB_TIMEOUT=60)
+    def test_job_of_lost_worker_is_claimed_again(self):
+        jobs.enqueue('test', 'a')
+        jobs.claim('worker-1')
+        self.assertEqual([], jobs.claim('worker-2'))
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=2))
+        claimed = jobs.claim('worker-2')
+        self.assertEqual(['a'], [job.video_id for job in claimed])
+        self.assertEqual(2, claimed[0].attempts)
+
+
+    @override_settings(VIDEO_JOB_RETRY_DELAY=30)
+    def test_failed_job_is_retried_later(self):
+        jobs.enqueue('broken', 'a')
+
+        self.assertEqual(1, jobs.run_next('worker'))
+        job = Job.objects.get()
+        self.assertEqual((Job.PENDING, 1, 'Broken'), (job.status, job.attempts, job.last_error))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(0, jobs.run_next('worker'))   # not due yet
+
+
+    @override_settings(VIDEO_JOB_RETRY_DELAY=0, VIDEO_JOB_MAX_ATTEMPTS=3)
+    def test_job_is_dead_after_too_many_attempts(self):
+        jobs.enqueue('broken', 'a')
+
+        jobs.run_next('worker')
+        jobs.run_next('worker')
+        with self.assertLogs('video_collection.jobs', 'ERROR') as logs:
+            self.assertEqual(1, jobs.work(burst=True))
+        self.assertEqual(1, len(logs.records))
+        self.assertIn('gave up: Broken', logs.records[0].getMessage())
+        job = Job.objects.get()
+        self.assertEqual((Job.DEAD, 3), (job.status, job.attempts))
+
+        self.assertEqual(1, jobs.retry_dead())
+        job.refresh_from_db()
+        self.assertEqual((Job.PENDING, 0), (job.status, job.attempts))
+
+
+    def test_job_without_handler_fails(self):
+        jobs.enqueue('unknown')
+        jobs.run_next('worker')
+        self.assertEqual('No handler for unknown jobs', Job.objects.get().last_error)
+
+
+    def test_enrich_jobs(self):
+        Video.objects.create(name='yoga', url='https://www.youtube.com/watch?v=abc')
+        jobs.enqueue('enrich', 'abc')
+
+        with mock.patch.object(enrichment, 'get_fetcher', return_value=StubFetcher()):
+            jobs.work(burst=True)
+
+        self.assertEqual('Title of abc', Video.objects.get().title)
+        self.assertFalse(Job.objects.exists())
+
+
+    def test_queued_import_is_run_by_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'videos.csv')
+            with open(path, 'w') as file:
+                file.write('name,url,notes\nYoga,https://youtu.be/abc,\nCore,https://youtu.be/def,\n')
+
+            out = StringIO()
+            call_command('import_videos', path, '--queue', stdout=out)
+            self.assertIn('Queued import', out.getvalue())
+            self.assertFalse(Video.objects.exists())
+
+            out = StringIO()
+            call_command('run_workers', '--burst', stdout=out)
+            self.assertIn('Ran 1 jobs', out.getvalue())
+
+        self.assertEqual(2, Video.objects.count())
+
+
+    def use_database_file(self):
+        # the workers are other processes, which can't see the in-memory test
+        # database, so the test's default is a migrated database file instead
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory.name, 'videos.sqlite3')},
+            alias='default')
+        self.addCleanup(connections.__setitem__, 'default', connections['default'])
+        self.addCleanup(database.close)
+        connections['default'] = database
+        call_command('migrate', verbosity=0)
+
+
+    def test_concurrent_workers_run_queued_jobs(self):
+        self.use_database_file()
+        jobs.enqueue_many('test', ['a', 'b', 'c', 'd', 'e'])
+
+        out = StringIO()
+        call_command('run_workers', '--concurrency', '2', '--burst', stdout=out)
+        self.assertIn('2 workers stopped', out.getvalue())
+        self.assertFalse(Job.objects.exists())
+
+
+    def test_failed_worker_fails_command(self):
+        self.use_database_file()
+        jobs.handler('exit')(lambda claimed: os._exit(3))
+        jobs.enqueue('exit', 'a')
+
+        with self.assertRaisesMessage(CommandError, '1 of 2 workers failed, exit codes [3]'):
+            call_command('run_workers', '--concurrency', '2', '--burst', stdout=StringIO())
+
+
+class TestTagsAndPlaylists(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga_tag = Tag.objects.create(name='Yoga', slug='yoga')
+        self.cardio_tag = Tag.objects.create(name='Cardio', slug='cardio')
+        self.stretch = Video.objects.create(name='Morning stretch', url='https://www.youtube.com/watch?v=101')
+        self.run = Video.objects.create(name='Interval run', url='https://www.youtube.com/watch?v=102')
+        self.flow = Video.objects.create(name='Evening flow', url='https://www.youtube.com/watch?v=103')
+        self.stretch.tags.add(self.yoga_tag)
+        self.flow.tags.add(self.yoga_tag)
+        self.run.tags.add(self.cardio_tag)
+
+
+    def test_filter_video_list_by_tag(self):
+        response = self.client.get(reverse('video_list'), {'tag': 'yoga'})
+        self.assertEqual([self.flow, self.stretch], response.context['videos'])
+        self.assertContains(response, '2 videos')
+
+
+    def test_filter_by_tag_and_search_term(self):
+        response = self.client.get(reverse('video_list'), {'tag': 'yoga', 'search_term': 'morning'})
+        self.assertEqual([self.stretch], response.context['videos'])
+
+
+    def test_unknown_tag_shows_every_video(self):
+        response = self.client.get(reverse('video_list'), {'tag': 'zumba'})
+        self.assertEqual(3, len(response.context['videos']))
+
+
+    def test_video_list_links_to_tags(self):
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, '<a href="/video_list?tag=yoga">Yoga</a>', count=2, html=True)
+
+
+    def test_tagging_video_updates_its_pages(self):
+        url = reverse('video_info', kwargs={'video_pk': self.run.pk})
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Yoga')
+        etag = response['ETag']
+
+        self.run.tags.add(self.yoga_tag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'Yoga')
+
+
+    def test_renaming_tag_updates_video_list(self):
+        self.client.get(reverse('video_list'))
+        self.yoga_tag.name = 'Stretching'
+        self.yoga_tag.save()
+        self.assertContains(self.client.get(reverse('video_list')), '<a href="/video_list?tag=yoga">Stretching</a>',
+            count=2, html=True)
+
+
+    def test_new_and_unused_tags_update_the_cached_list(self):
+        self.client.get(reverse('video_list'))
+        core = Tag.objects.create(name='Core', slug='core')
+        self.assertContains(self.client.get(reverse('video_list')), '<option value="core">Core</option>', html=True)
+
+        core.name = 'Abs'
+        core.save()
+        self.assertContains(self.client.get(reverse('video_list')), '<option value="core">Abs</option>', html=True)
+
+        core.delete()
+        self.assertNotContains(self.client.get(reverse('video_list')), '<option value="core">')
+
+
+    def test_playlist_in_order(self):
+        playlist = Playlist.objects.create(name='Monday')
+        for position, video in enumerate([self.run, self.stretch, self.run], start=1):
+            PlaylistEntry.objects.create(playlist=playlist, video=video, position=position)
+
+        response = self.client.get(reverse('playlist_info', kwargs={'playlist_pk': playlist.pk}))
+        self.assertEqual([self.run, self.stretch, self.run], [entry.video for entry in response.context['entries']])
+
+        response = self.client.get(reverse('playlists'))
+        self.assertContains(response, '3 videos')
+
+
+    def test_playlist_position_is_unique(self):
+        playlist = Playlist.objects.create(name='Monday')
+        PlaylistEntry.objects.create(playlist=playlist, video=self.run, position=1)
+        with self.assertRaises(IntegrityError):
+            PlaylistEntry.objects.create(playlist=playlist, video=self.flow, position=1)
+
+
+@override_settings(VIDEO_CACHE_TIMEOUT=0, VIDEO_FRAGMENT_CACHE_TIMEOUT=0)
+class TestRequestMetrics(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        Video.objects.create(name='Yoga', url='https://www.youtube.com/watch?v=101')
+        Video.objects.create(name='Running', url='https://www.youtube.com/watch?v=102')
+
+
+    def server_timing(self, response):
+        return dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('video_list'))
+        timing = self.server_timing(response)
+        self.assertEqual({'db', 'template', 'total'}, set(timing))
+        self.assertIn('desc="4 queries"', timing['db'])
+        self.assertNotEqual('dur=0.0', timing['template'])
+
+
+    async def test_async_request_counts_queries_from_sync_threads(self):
+        response = await self.async_client.get(reverse('video_list'))
+        self.assertIn('desc="4 queries"', self.server_timing(response)['db'])
+
+
+    def test_request_log_line(self):
+        with self.assertLogs('video_collection.requests', 'INFO') as logs:
+            self.client.get(reverse('video_list'), {'search_term': 'yoga'})
+        self.assertIn('GET /video_list?search_term=yoga 200 view=video_list', logs.output[0])
+        self.assertIn('queries=4', logs.output[0])
+        self.assertEqual(4, logs.records[0].request_metrics['queries'])
+
+
+    def test_metrics_page(self):
+        for _ in range(3):
+            self.client.get(reverse('video_list'))
+        self.client.get(reverse('video_info', kwargs={'video_pk': 100}))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual('text/plain; version=0.0.4; charset=utf-8', response['Content-Type'])
+        text = response.content.decode()
+        self.assertIn('# TYPE video_request_duration_seconds summary', text)
+        self.assertIn('video_request_duration_seconds{view="video_list",quantile="0.99"}', text)
+        self.assertIn('video_request_db_queries{view="video_list",quantile="0.5"} 4\n', text)
+        self.assertIn('video_request_db_queries_count{view="video_list"} 3\n', text)
+        self.assertIn('video_request_duration_seconds_count{view="video_info"} 1\n', text)
+
+
+    @override_settings(VIDEO_API_TOKEN=API_TOKEN)
+    def test_metrics_page_is_local_only(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(403, response.status_code)
+
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9', headers=AUTHORIZATION)
+        self.assertEqual(200, response.status_code)
+
+        with override_settings(VIDEO_METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(403, self.client.get(reverse('metrics')).status_code)
+
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, metrics.percentile(values, 0.5))
+        self.assertEqual(95, metrics.percentile(values, 0.95))
+        self.assertEqual(99, metrics.percentile(values, 0.99))
+        self.assertEqual(7, metrics.percentile([7], 0.99))
+
+
+class TestSQLiteBackend(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # a database file of its own, the test database is in memory and can't use WAL
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'videos.sqlite3')
+
+
+    def open(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path,
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], **options}}
+        database = DatabaseWrapper(settings_dict, alias='tuned')
+        self.addCleanup(database.close)
+        database.ensure_connection()
+        return database
+
+
+    def pragma(self, database, name):
+        with database.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+
+    def test_pragmas_set_on_new_connections(self):
+        database = self.open()
+        self.assertEqual('wal', self.pragma(database, 'journal_mode'))
+        self.assertEqual(1, self.pragma(database, 'synchronous'))   # NORMAL
+        self.assertEqual(5000, self.pragma(database, 'busy_timeout'))
+        self.assertEqual(-64 * 1024, self.pragma(database, 'cache_size'))
+
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        database = self.open()
+        database._start_transaction_under_autocommit()
+        self.addCleanup(database.connection.rollback)
+
+        # nothing written yet, but another writer has to wait
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+
+
+    def test_deferred_transactions(self):
+        database = self.open(transaction_mode=None)
+        database._start_transaction_under_autocommit()
+        self.addCleanup(database.connection.rollback)
+
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+
+
+    def test_unknown_transaction_mode(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'transaction_mode must be one of'):
+            self.open(transaction_mode='LATER')
+
+
+class TestReadReplicaRouter(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.router = ReadReplicaRouter()
+        self.request_factory = RequestFactory()
+
+
+    def db_for_read_in_view(self, method):
+        @read_replica
+        def view(request):
+            return self.router.db_for_read(Video)
+        return view(getattr(self.request_factory, method)('/'))
+
+
+    def test_reads_of_read_only_views_from_replica(self):
+        with mock.patch.dict(connections.settings, {'replica': connection.settings_dict}):
+            self.assertEqual('replica', self.db_for_read_in_view('get'))
+            self.assertEqual('replica', self.db_for_read_in_view('head'))
+            self.assertIsNone(self.db_for_read_in_view('post'))
+            self.assertIsNone(self.router.db_for_read(Video))
+            self.assertEqual('default', self.router.db_for_write(Video))
+
+
+    async def test_async_views(self):
+        @read_replica
+        async def view(request):
+            # and in the threads of sync_to_async
+            return await sync_to_async(self.router.db_for_read)(Video)
+
+        with mock.patch.dict(connections.settings, {'replica': connection.settings_dict}):
+            self.assertEqual('replica', await view(self.request_factory.get('/')))
+
+
+    def test_no_replica_configured(self):
+        self.assertIsNone(self.db_for_read_in_view('get'))
+
+
+    def test_replica_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'video_collection'))
+        self.assertTrue(self.router.allow_migrate('default', 'video_collection'))
+
+
+class TestDuplicates(TestCase):
+
+    def add(self, name, video_id):
+        return Video.objects.create(name=name, url=f'https://www.youtube.com/watch?v={video_id}')
+
+
+    def test_similarity(self):
+        self.assertEqual(1.0, duplicates.similarity('Morning Yoga Flow', 'morning yoga  flow!'))
+        self.assertGreater(duplicates.similarity('Morning Yoga Flow', 'Mornng Yoga Flow'), 0.7)
+        self.assertLess(duplicates.similarity('Morning Yoga Flow', 'Evening Kettlebell Swings'), 0.2)
+        self.assertEqual(0.0, duplicates.similarity('!!!', 'Yoga'))
+
+
+    def test_numbered_series_are_not_duplicates(self):
+        self.assertFalse(duplicates.is_duplicate('30 Day Yoga Day 1', '30 Day Yoga Day 2'))
+        self.assertTrue(duplicates.is_duplicate('30 Day Yoga Day 1', '30 day yoga, day 1'))
+
+
+    def test_keys_are_the_same_in_every_process(self):
+        keys = duplicates.keys('Morning Yoga Flow')
+        self.assertEqual(duplicates.BANDS, len(keys))
+        self.assertEqual(keys, duplicates.keys('morning yoga flow'))
+        self.assertTrue(all(0 <= key < 2 ** 63 for key in keys))
+        self.assertEqual([], duplicates.keys('...'))
+
+
+    def test_similar_videos(self):
+        original = self.add('Morning Yoga Flow', 'aaa')
+        self.add('Morning Yoga Flow for Beginners', 'bbb')
+        self.add('Evening Kettlebell Swings', 'ccc')
+        video = self.add('Mornng Yoga Flow', 'ddd')
+
+        self.assertEqual([original], duplicates.similar(video))
+        self.assertEqual([], duplicates.similar(Video.objects.get(video_id='ccc')))
+
+
+    def test_renamed_videos_reindexed(self):
+        self.add('Morning Yoga Flow', 'aaa')
+        video = self.add('Evening Kettlebell Swings', 'bbb')
+        video.name = 'Morning Yoga Flow!'
+        video.save()
+        self.assertEqual(['aaa'], [other.video_id for other in duplicates.similar(video)])
+
+
+    def test_add_warns_of_near_duplicates(self):
+        self.add('Morning Yoga Flow', 'aaa')
+        response = self.client.post(reverse('add_video'), {'name': 'morning yoga flow!',
+            'url': 'https://youtu.be/bbb', 'notes': ''}, follow=True)
+
+        self.assertTemplateUsed(response, 'video_collection/video_list.html')
+        self.assertContains(response, 'Added morning yoga flow!, but it looks like a video already in the '
+            'collection: Morning Yoga Flow')
+        self.assertEqual(2, Video.objects.count())
+
+
+    def test_imported_videos_indexed(self):
+        importer.import_rows(importer.read_rows(StringIO('name,url,notes\n'
+            'Morning Yoga Flow,https://youtu.be/aaa,\n'
+            'Evening Kettlebell Swings,https://youtu.be/bbb,\n'), 'csv'))
+        video = self.add('Morning Yoga Flow.', 'ccc')
+        self.assertEqual(['aaa'], [other.video_id for other in duplicates.similar(video)])
+
+
+    def test_find_duplicates_command(self):
+        yoga = [self.add('Morning Yoga Flow', 'a1'), self.add('morning yoga flow', 'a2'),
+            self.add('Mornng Yoga Flow', 'a3')]
+        swings = [self.add('Kettlebell Swings', 'b1'), self.add('Kettlebell swings!', 'b2')]
+        self.add('Evening Stretch', 'c1')
+        self.add('Yoga Day 1', 'd1')
+        self.add('Yoga Day 2', 'd2')
+
+        self.assertEqual([[(video.pk, video.name) for video in group] for group in (yoga, swings)],
+            duplicates.find())
+
+        out = StringIO()
+        call_command('find_duplicates', '--reindex', stdout=out, stderr=StringIO())
+        self.assertIn(f'{yoga[0].pk}\tMorning Yoga Flow\n', out.getvalue())
+        self.assertIn('Found 2 groups of near duplicates, 5 videos', out.getvalue())
+
+
+    def test_find_duplicates_bad_threshold(self):
+        with self.assertRaisesMessage(CommandError, '--threshold must be between 0 and 1'):
+            call_command('find_duplicates', '--threshold', '2')
+
+
+class TestSuggestions(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n, name in enumerate(['Morning Yoga Flow', 'Yoga for Runners', 'Evening  Stretch', 'Kettlebell Swings']):
+            Video.objects.create(name=name, url=f'https://youtu.be/v{n}')
+
+
+    def names(self, prefix, limit=None):
+        return [name for _, name in suggest.suggest(prefix, limit)]
+
+
+    def test_suggestions_from_any_word(self):
+        # in order of the name from the word matched
+        self.assertEqual(['Morning Yoga Flow', 'Yoga for Runners'], self.names('yo'))
+        self.assertEqual(['Morning Yoga Flow'], self.names('  MORNING  yoga '))
+        self.assertEqual(['Evening  Stretch'], self.names('evening s'))
+        self.assertEqual(['Morning Yoga Flow'], self.names('yo', limit=1))
+        self.assertEqual([], self.names('oga'))
+        self.assertEqual([], self.names(''))
+
+
+    def test_index_built_once(self):
+        self.names('yo')
+        with self.assertNumQueries(0):
+            self.assertEqual(['Kettlebell Swings'], self.names('kettle'))
+
+
+    def test_index_follows_saves_and_deletes(self):
+        self.names('yo')
+        with self.captureOnCommitCallbacks(execute=True):
+            video = Video.objects.create(name='Yoga Nidra', url='https://youtu.be/new')
+        self.assertEqual(['Morning Yoga Flow', 'Yoga for Runners', 'Yoga Nidra'], self.names('yo'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            video.name = 'Chair Yoga'
+            video.save()
+        self.assertEqual(['Chair Yoga', 'Morning Yoga Flow', 'Yoga for Runners'], self.names('yo'))
+        self.assertEqual(['Chair Yoga'], self.names('chair'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            video.delete()
+        self.assertEqual([], self.names('chair'))
+        self.assertEqual(['Morning Yoga Flow', 'Yoga for Runners'], self.names('yo'))
+
+
+    def test_long_prefixes(self):
+        name = 'Full Body Mobility Routine For Desk Workers Who Sit All Day Long'
+        Video.objects.create(name=name, url='https://youtu.be/long')
+        self.assertEqual([name], self.names(name))
+        self.assertEqual([], self.names(name + ' again'))
+
+
+    @override_settings(VIDEO_SUGGEST_MAX_AGE=0)
+    def test_rebuild_doesnt_hold_up_lookups_or_lose_changes(self):
+        self.names('yo')
+        build = suggest.SuggestIndex.build
+        during = []
+
+        def slow_build(max_keys):
+            index = build(max_keys)
+            during.append(self.names('kettle'))   # from the old index, not waiting for this one
+            suggest.video_saved(999, 'Yoga Nidra')   # saved after the build read the videos
+            return index
+
+        with mock.patch.object(suggest.SuggestIndex, 'build', side_effect=slow_build):
+            self.names('yo')
+        self.assertEqual([['Kettlebell Swings']], during)
+        self.assertEqual([(999, 'Yoga Nidra')], suggest._index.search('yoga n', 10))
+
+
+    @override_settings(VIDEO_SUGGEST_MAX_KEYS=11)
+    def test_saves_past_max_keys_drop_the_index(self):
+        self.names('yo')   # 10 keys
+        suggest.video_saved(999, 'Chair Yoga')
+        self.assertIsNone(suggest._index)
+        with self.assertNumQueries(1):   # from the database until the next build
+            self.assertEqual(['Morning Yoga Flow', 'Yoga for Runners'], self.names('yo'))
+
+
+    def test_remove_from_index_out_of_step(self):
+        index = suggest.SuggestIndex(max_keys=100)
+        index.add(1, 'Yoga Flow')
+        index.add(2, 'Yoga')
+        index.names[3] = 'Yoga Flow'   # never indexed
+        index.remove(3)
+        index.remove(2)
+        self.assertEqual([(1, 'Yoga Flow')], index.search('yoga', 10))
+
+
+    @override_settings(VIDEO_SUGGEST_MAX_KEYS=5)
+    def test_too_many_names_for_the_index(self):
+        with self.assertNumQueries(2):   # building the index gives up, then the database
+            self.assertEqual(['Morning Yoga Flow', 'Yoga for Runners'], self.names('yo'))
+
+
+    def test_suggest_api(self):
+        response = self.client.get(reverse('api_suggest'), {'q': 'yo', 'limit': 1})
+        self.assertEqual({'suggestions': [{'pk': Video.objects.get(name='Morning Yoga Flow').pk,
+            'name': 'Morning Yoga Flow'}]}, response.json())
+
+        response = self.client.get(reverse('api_suggest'), {'q': 'yo', 'limit': 'ten'})
+        self.assertEqual(400, response.status_code)
+
+
+    def test_search_box_offers_suggestions(self):
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, 'list="video-suggestions"')
+        self.assertContains(response, f'<datalist id="video-suggestions" data-url="{reverse("api_suggest")}">')
+
+
+class TestSoftDelete(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.yoga = Video.objects.create(name='Yoga', url='https://www.youtube.com/watch?v=101')
+        self.run = Video.objects.create(name='Running', url='https://www.youtube.com/watch?v=102')
+
+
+    def delete(self, video):
+        return self.client.post(reverse('delete_video', kwargs={'video_pk': video.pk}))
+
+
+    def deleted_ago(self, video, **kwargs):
+        video.soft_delete()
+        Video.all_objects.filter(pk=video.pk).update(deleted_at=timezone.now() - timedelta(**kwargs))
+
+
+    def test_delete_is_post_only(self):
+        response = self.client.get(reverse('delete_video', kwargs={'video_pk': self.yoga.pk}))
+        self.assertEqual(405, response.status_code)
+        self.assertTrue(Video.objects.filter(pk=self.yoga.pk).exists())
+
+
+    def test_deleted_videos_hidden(self):
+        response = self.delete(self.yoga)
+        self.assertRedirects(response, reverse('deleted_video', kwargs={'video_pk': self.yoga.pk}))
+
+        self.assertEqual([self.run], list(Video.objects.all()))
+        self.assertIsNotNone(Video.all_objects.get(pk=self.yoga.pk).deleted_at)
+        self.assertEqual(404, self.client.get(reverse('video_info', kwargs={'video_pk': self.yoga.pk})).status_code)
+        response = self.client.get(reverse('video_list'))
+        self.assertContains(response, '1 video')
+        self.assertNotContains(response, 'Yoga')
+
+
+    def test_undo(self):
+        response = self.delete(self.yoga)
+        response = self.client.get(response.url)
+        self.assertContains(response, 'Deleted Yoga')
+        self.assertContains(response, 'You can undo this for 15 minutes')
+
+        response = self.client.post(reverse('restore_video', kwargs={'video_pk': self.yoga.pk}))
+        self.assertRedirects(response, reverse('video_info', kwargs={'video_pk': self.yoga.pk}))
+        self.assertContains(self.client.get(reverse('video_list')), '2 videos')
+
+
+    def test_no_undo_after_the_window(self):
+        self.deleted_ago(self.yoga, minutes=16)
+        url = reverse('restore_video', kwargs={'video_pk': self.yoga.pk})
+        self.assertEqual(404, self.client.post(url).status_code)
+        self.assertEqual(404, self.client.get(reverse('deleted_video', kwargs={'video_pk': self.yoga.pk})).status_code)
+        self.assertFalse(Video.objects.filter(pk=self.yoga.pk).exists())
+
+
+    def test_deleted_video_can_be_added_again(self):
+        self.delete(self.yoga)
+        again = Video.objects.create(name='Yoga again', url='https://youtu.be/101')
+
+        response = self.client.post(reverse('restore_video', kwargs={'video_pk': self.yoga.pk}), follow=True)
+        self.assertContains(response, 'That video has been added again since it was deleted')
+        self.assertEqual([again], list(Video.objects.filter(video_id='101')))
+
+
+    def test_restore_warning_shown_on_unchanged_list(self):
+        self.delete(self.yoga)
+        Video.objects.create(name='Yoga again', url='https://youtu.be/101')
+        etag = self.client.get(reverse('video_list'))['ETag']
+
+        # nothing on the list changes, the browser revalidates the page it has
+        response = self.client.post(reverse('restore_video', kwargs={'video_pk': self.yoga.pk}))
+        self.assertRedirects(response, reverse('video_list'), fetch_redirect_response=False)
+        response = self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'That video has been added again since it was deleted')
+        self.assertNotEqual(etag, response['ETag'])
+
+        self.assertEqual(304, self.client.get(reverse('video_list'), HTTP_IF_NONE_MATCH=etag).status_code)
+
+
+    @override_settings(VIDEO_API_TOKEN=API_TOKEN)
+    def test_api_delete(self):
+        response = self.client.delete(reverse('api_video', kwargs={'video_pk': self.yoga.pk}), headers=AUTHORIZATION)
+        self.assertEqual(204, response.status_code)
+        self.assertTrue(Video.all_objects.filter(pk=self.yoga.pk, deleted_at__isnull=False).exists())
+
+
+    def test_playlists_leave_out_deleted_videos(self):
+        playlist = Playlist.objects.create(name='Monday')
+        PlaylistEntry.objects.create(playlist=playlist, video=self.yoga, position=1)
+        PlaylistEntry.objects.create(playlist=playlist, video=self.run, position=2)
+        self.yoga.soft_delete()
+
+        self.assertContains(self.client.get(reverse('playlists')), '1 video')
+        response = self.client.get(reverse('playlist_info', kwargs={'playlist_pk': playlist.pk}))
+        self.assertEqual([self.run], [entry.video for entry in response.context['entries']])
+
+
+    def test_purge_deleted(self):
+        tag = Tag.objects.create(name='Cardio', slug='cardio')
+        self.run.tags.add(tag)
+        old = [Video.objects.create(name=f'Old {n}', url=f'https://youtu.be/old{n}') for n in range(5)]
+        for video in old + [self.run]:
+            self.deleted_ago(video, hours=1)
+        self.deleted_ago(self.yoga, minutes=5)   # still undoable
+
+        out = StringIO()
+        call_command('purge_deleted', '--batch-size', '2', '--pause', '0', stdout=out)
+        self.assertIn('Purged 6 deleted videos', out.getvalue())
+
+        self.assertEqual([self.yoga.pk], list(Video.all_objects.values_list('pk', flat=True)))
+        self.assertFalse(tag.videos.through.objects.exists())
+        self.assertFalse(DuplicateKey.objects.exclude(video=self.yoga).exists())
+
+
+    def test_purge_in_batches(self):
+        for n in range(5):
+            Video.objects.create(name=f'Old {n}', url=f'https://youtu.be/old{n}').soft_delete()
+        self.assertEqual([2, 2, 1], list(Video.all_objects.filter(deleted_at__isnull=False).purge(batch_size=2)))
@@ -1,11 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, api, async_views
+
+
+# async views for the read-only pages and the API under ASGI, see async_views.py
+if settings.VIDEO_ASYNC_VIEWS:
+    read_views, api_views = async_views, async_views
+else:
+    read_views, api_views = views, api
 
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('add', views.add, name='add_video'),
-    path('video_list', views.video_list, name='video_list'),
-    path('video/<int:video_pk>', views.video_info, name='video_info'),
-    path('video/<int:video_pk>/delete', views.delete_video, name='delete_video')
+    path('import', views.import_videos, name='import_videos'),
+    path('export', views.export_videos, name='export_videos'),
+    path('video_list', read_views.video_list, name='video_list'),
+    path('video/<int:video_pk>', read_views.video_info, name='video_info'),
+    path('video/<int:video_pk>/delete', views.delete_video, name='delete_video'),
+    path('video/<int:video_pk>/deleted', views.deleted_video, name='deleted_video'),
+    path('video/<int:video_pk>/restore', views.restore_video, name='restore_video'),
+    path('playlists', views.playlists, name='playlists'),
+    path('playlist/<int:playlist_pk>', views.playlist_info, name='playlist_info'),
+    path('metrics', views.metrics_page, name='metrics'),
+    path('api/videos', api_views.videos, name='api_videos'),
+    path('api/videos/bulk', api_views.bulk_create, name='api_bulk_create'),
+    # from memory, no await needed, see suggest.py
+    path('api/videos/suggest', api.suggestions, name='api_suggest'),
+    path('api/videos/<int:video_pk>', api_views.video, name='api_video'),
 ]
\ No newline at end of file
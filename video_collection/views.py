@@ -1,15 +1,33 @@
+import codecs
+import hashlib
+from datetime import timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib import messages
+from django.contrib.messages import get_messages
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
 from django.db.models.functions import Lower
-from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.utils import timezone
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseBadRequest, JsonResponse, \
+    StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
 
 
-from .models import Video
+from .models import Playlist, Video
+from .auth import token_required
 from .forms import VideoForm, SearchForm
+from .pagination import KeysetPaginator, InvalidCursor
+from . import auth, duplicates, exporter, fragments, importer, lookup, metrics
+from .cache import cache_page, generations, LIST_GENERATION, video_generation
+from .routers import read_replica
 
 
+@cache_page(lambda: [LIST_GENERATION])
 def home(request):
     app_name = 'Exercise Videos'
     return render(request, 'video_collection/home.html', {'app_name': app_name})
@@ -20,7 +38,11 @@ def add(request):
         new_video_form = VideoForm(request.POST)
         if new_video_form.is_valid():
             try:
-                new_video_form.save()
+                video = new_video_form.save()
+                similar = duplicates.similar(video)
+                if similar:
+                    messages.warning(request, f'Added {video.name}, but it looks like a video already in the '
+                        f'collection: {", ".join(other.name for other in similar[:3])}')
                 return redirect('video_list')
 
             except ValidationError:
@@ -37,33 +59,257 @@ def add(request):
     return render(request, 'video_collection/add.html', {'new_video_form': new_video_form} )
 
 
-def video_list(request):
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/jsonlines': 'jsonl',
+}
+
+
+@csrf_exempt   # posted by scripts with the API token, not from a form
+@require_POST
+@token_required
+def import_videos(request):
+
+    format = request.GET.get('format') or IMPORT_CONTENT_TYPES.get(request.content_type)
+    if format not in importer.FORMATS:
+        return HttpResponseBadRequest(f'Send text/csv or application/x-ndjson, or use ?format={"|".join(importer.FORMATS)}')
+
+    # the request body is read a line at a time as it's imported, not loaded into memory first
+    lines = codecs.iterdecode(request, request.encoding or 'utf-8')
+    try:
+        report = importer.import_rows(importer.read_rows(lines, format))
+    except UnicodeDecodeError:
+        return HttpResponseBadRequest('Request body is not valid UTF-8')
+
+    return JsonResponse(report.as_dict())
+
+
+@require_GET
+def export_videos(request):
+    format = request.GET.get('format', 'csv')
+    if format not in exporter.FORMATS:
+        return HttpResponseBadRequest(f'Unknown format, use ?format={"|".join(exporter.FORMATS)}')
+    gzip = request.GET.get('gzip') == '1'
+
+    # streamed from the database as it's sent, see exporter.py
+    response = StreamingHttpResponse(exporter.export(format, gzip),
+        content_type='application/gzip' if gzip else exporter.CONTENT_TYPES[format])
+    filename = f'videos.{format}' + ('.gz' if gzip else '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def search_videos(request):
+    """ Return the search form, the videos it matches, and the keys they are ordered by """
+
+    # the ETag, the page and the count all need this, validate the form once
+    if not hasattr(request, '_search_videos'):
+        request._search_videos = _search_videos(request)
+    return request._search_videos
+
 
+def _search_videos(request):
     # build form from data user has sent to app
     search_form = SearchForm(request.GET)
 
     if search_form.is_valid():
+        videos = Video.objects.all()
+        keys = ('lower_name', 'pk')
+
+        tag = search_form.cleaned_data['tag']
+        if tag:
+            videos = videos.filter(tags=tag)
+
         search_term = search_form.cleaned_data['search_term'] # search term to search on db
-        videos = Video.objects.filter(name__icontains=search_term).order_by(Lower('name'))
+        if search_term:
+            backend = search_form.get_backend()
+            videos = backend.search(videos, search_term)
+            keys = backend.keys   # best matches first
+        return search_form, videos, keys
     
-    else: # form is not filled in or this is the first time the user sess the page
-        search_form = SearchForm() # make a new search form here
-        videos = Video.objects.order_by(Lower('name'))
+    # form is not filled in or this is the first time the user sess the page
+    return SearchForm(), Video.objects.all(), ('lower_name', 'pk')
+
+
+def _video_list_stats(request):
+    # count and last change of the videos on the list, one query shared by the
+    # ETag and the count shown on the page
+    if not hasattr(request, '_video_list_stats'):
+        _, videos, _ = search_videos(request)
+        request._video_list_stats = videos.aggregate(count=Count('pk'), updated=Max('updated'))
+    return request._video_list_stats
+
+
+def _video_list_etag(request):
+    if len(get_messages(request)):
+        return None   # no 304 for a page with a message on it, like restore_video's warning
+    stats = _video_list_stats(request)
+    updated = stats['updated'].isoformat() if stats['updated'] else ''
+    # the list's generation moves when a tag is added, renamed or deleted too,
+    # which changes the search form's tag choices but no video
+    generation, = generations([LIST_GENERATION])
+    # the query string has the search term and the cursor for the page
+    version = f'{stats["count"]}:{updated}:{generation}:{request.GET.urlencode()}:{settings.VIDEO_LIST_PAGE_SIZE}'
+    return 'W/"%s"' % hashlib.md5(version.encode(), usedforsecurity=False).hexdigest()
+
+
+@read_replica
+@cache_page(lambda: [LIST_GENERATION])
+# no Last-Modified: the latest update doesn't move when a video is deleted, the ETag's count does
+@condition(etag_func=_video_list_etag)
+def video_list(request):
+
+    search_form, videos, keys = search_videos(request)
+
+    # one page at a time, sorted by name (or rank), with pk to break ties between equal names
+    paginator = KeysetPaginator(videos.annotate(lower_name=Lower('name')), keys=keys,
+        page_size=settings.VIDEO_LIST_PAGE_SIZE)
+    cursor = request.GET.get('cursor')
+
+    # count comes from its own aggregate query, the full list is never loaded just to count it
+    context = {'video_count': _video_list_stats(request)['count'], 'search_form': search_form}
+
+    try:
+        if settings.VIDEO_STREAM_LIST:
+            paginator.check(cursor)
+            head, tail = _video_list_head_and_tail(request, context)
+            return StreamingHttpResponse(_stream_video_list(request, head, tail, lambda: paginator.page(cursor)))
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
 
+    return render(request, 'video_collection/video_list.html', {**context, **_video_list_rows(request, page)})
 
-    return render(request, 'video_collection/video_list.html', {'videos': videos, 'search_form': search_form})
 
+def _video_list_rows(request, page):
+    # each video's HTML comes from the fragment cache, only the ones not there are rendered
+    return {
+        'videos': page.object_list,
+        'items': fragments.render_items(page.object_list),
+        'next_url': _page_url(request, page.next_cursor),
+        'prev_url': _page_url(request, page.prev_cursor),
+    }
 
+
+def _video_list_head_and_tail(request, context):
+    # the page either side of its videos, rendered before the response is
+    # returned, so the messages shown in it count as seen
+    html = render_to_string('video_collection/video_list.html', {**context, 'streamed': True}, request)
+    head, _, tail = html.partition(fragments.ROWS_MARKER)
+    return head, tail
+
+
+def _stream_video_list(request, head, tail, get_page):
+    # the header and search form go out while the page of videos is fetched
+    yield head
+    rows = _video_list_rows(request, get_page())
+    yield render_to_string('video_collection/_video_list_rows.html', rows)
+    yield tail
+
+
+def _page_url(request, cursor):
+    # same query string as this page, including the search term, with the new cursor
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'?{params.urlencode()}'
+
+
+def _video(request, video_pk):
+    # looked up once for the ETag, Last-Modified and the page, None if there's no such video
+    if not hasattr(request, '_video'):
+        request._video = lookup.get_video(video_pk)
+    return request._video
+
+
+def _video_updated(request, video_pk):
+    video = _video(request, video_pk)
+    return video.updated if video else None
+
+
+def _video_info_etag(request, video_pk):
+    updated = _video_updated(request, video_pk)
+    if updated is None:
+        return None   # no such video, the view returns 404
+    return f'W/"{video_pk}-{updated.timestamp()}"'
+
+
+def _video_info_last_modified(request, video_pk):
+    return _video_updated(request, video_pk)
+
+
+@read_replica
+@cache_page(lambda video_pk: [video_generation(video_pk)], vary_on_csrf=True)
+@condition(etag_func=_video_info_etag, last_modified_func=_video_info_last_modified)
 def video_info(request, video_pk):
 
-    # retrieve the video with pk 
-    video = get_object_or_404(Video, pk = video_pk)
+    # retrieve the video with pk, usually from the lookup cache
+    video = _video(request, video_pk)
+    if video is None:
+        raise Http404('No Video matches the given query.')
 
     return render(request, 'video_collection/video_info.html', {'video': video})
 
 
 
+@require_POST
 def delete_video(request, video_pk):
-    video = get_object_or_404(Video, pk=video_pk)
-    video.delete()
-    return redirect('video_list')
\ No newline at end of file
+    # hidden, not gone, until purge_deleted, the next page offers to undo it
+    video = lookup.get_video(video_pk)
+    if video is None:
+        raise Http404('No Video matches the given query.')
+    video.soft_delete()
+    return redirect('deleted_video', video_pk=video.pk)
+
+
+def _undoable(video_pk):
+    # a video deleted recently enough to undo, or 404
+    since = timezone.now() - timedelta(seconds=settings.VIDEO_UNDO_DELETE_SECONDS)
+    return get_object_or_404(Video.all_objects, pk=video_pk, deleted_at__gte=since)
+
+
+def deleted_video(request, video_pk):
+    video = _undoable(video_pk)
+    return render(request, 'video_collection/deleted_video.html', {'video': video,
+        'undo_minutes': settings.VIDEO_UNDO_DELETE_SECONDS // 60})
+
+
+@require_POST
+def restore_video(request, video_pk):
+    video = _undoable(video_pk)
+    try:
+        with transaction.atomic():
+            video.restore()
+    except IntegrityError:
+        messages.warning(request, 'That video has been added again since it was deleted')
+        return redirect('video_list')
+    return redirect('video_info', video_pk=video.pk)
+
+
+@read_replica
+def playlists(request):
+    # deleted videos stay in their playlists until they're purged, but don't count
+    video_count = Count('entries', filter=Q(entries__video__deleted_at__isnull=True))
+    playlists = Playlist.objects.annotate(video_count=video_count).order_by('name')
+    return render(request, 'video_collection/playlists.html', {'playlists': playlists})
+
+
+@read_replica
+def playlist_info(request, playlist_pk):
+    playlist = get_object_or_404(Playlist, pk=playlist_pk)
+    # the videos and all their tags in two more queries, however long the playlist is
+    entries = playlist.entries.filter(video__deleted_at__isnull=True).select_related('video') \
+        .prefetch_related('video__tags')
+    return render(request, 'video_collection/playlist_info.html', {'playlist': playlist, 'entries': entries})
+
+
+@require_GET
+def metrics_page(request):
+    # for a Prometheus scraper on the same machine, or one sending the API token,
+    # not for the world. Behind a proxy every request is from the proxy's address
+    if request.META.get('REMOTE_ADDR') not in settings.VIDEO_METRICS_ALLOWED_IPS and not auth.has_token(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,39 @@
+"""
+Templates parsed before the first request.
+
+The cached template loader reads and compiles each template the first time
+it's used and keeps it for the life of the process. Django turns it on by
+default since 4.1, the production settings list it explicitly. The first
+request to each page still pays for reading and compiling its templates.
+warm_templates() compiles every template of the app at startup instead.
+wsgi.py and asgi.py call it when VIDEO_WARM_TEMPLATES is on, and
+`manage.py warm_templates` runs it as a check that every template compiles.
+"""
+
+import os
+
+from django.apps import apps
+from django.template import Engine, TemplateSyntaxError
+
+
+def template_names():
+    """ Names of the templates under video_collection/templates, like video_collection/home.html """
+    root = os.path.join(apps.get_app_config('video_collection').path, 'templates')
+    names = []
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if file.endswith('.html'):
+                names.append(os.path.relpath(os.path.join(directory, file), root).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates(engine=None):
+    """ Compile every template into the loader's cache, return their names """
+    engine = engine or Engine.get_default()
+    names = template_names()
+    for name in names:
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as e:
+            raise TemplateSyntaxError(f'{name}: {e}') from e
+    return names
@@ -0,0 +1,97 @@
+"""
+YouTube URL parsing.
+
+parse_video_id() finds the video ID in the URL shapes YouTube uses:
+
+    https://www.youtube.com/watch?v=<id>    (also youtube.com and m.youtube.com)
+    https://youtu.be/<id>
+    https://www.youtube.com/shorts/<id>
+    https://www.youtube.com/embed/<id>
+
+It has no side effects, so results, including rejections, are memoized in a
+bounded LRU cache. The same URL is often parsed again, for example when a
+video is edited or imported twice.
+"""
+
+import functools
+import re
+from urllib import parse
+
+
+CACHE_SIZE = 4096
+
+URL = re.compile(r'^https://(?P<host>[^/?#]+)(?P<path>/[^?#]*)?(?:\?(?P<query>[^#]*))?(?:#.*)?\Z')
+
+WATCH_HOSTS = frozenset(['www.youtube.com', 'youtube.com', 'm.youtube.com'])
+
+SHORT_HOST = 'youtu.be'
+
+# /shorts/<id> and /embed/<id> on a watch host, /<id> on youtu.be
+VIDEO_PATH = re.compile(r'^/(?:shorts|embed)/(?P<id>[\w-]+)/?\Z', re.ASCII)
+SHORT_PATH = re.compile(r'^/(?P<id>[\w-]+)/?\Z', re.ASCII)
+
+VIDEO_ID = re.compile(r'^[\w-]+\Z', re.ASCII)
+
+
+class InvalidYouTubeURL(ValueError):
+    pass
+
+
+def parse_video_id(url):
+    """ Return the video ID from a YouTube URL, raise InvalidYouTubeURL if it isn't one """
+    video_id, error = _parse(url)
+    if error:
+        raise InvalidYouTubeURL(error)
+    return video_id
+
+
+def cache_info():
+    return _parse.cache_info()
+
+
+def cache_clear():
+    _parse.cache_clear()
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse(url):
+    # returns (video ID, None) or (None, error message), so rejections are cached too
+    match = URL.match(url)
+    if not match:
+        return None, f'Not a YouTube URL {url}'
+
+    host, path, query = match.group('host').lower(), match.group('path') or '', match.group('query')
+
+    if host == SHORT_HOST:
+        id_match = SHORT_PATH.match(path)
+        if not id_match:
+            return None, f'Invalid YouTube URL, missing video ID {url}'
+        return id_match.group('id'), None
+
+    if host not in WATCH_HOSTS:
+        return None, f'Not a YouTube URL {url}'
+
+    id_match = VIDEO_PATH.match(path)
+    if id_match:
+        return id_match.group('id'), None
+
+    if path != '/watch':
+        return None, f'Not a YouTube URL {url}'
+
+    if not query:
+        return None, f'Invalid YouTube URL {url}'
+
+    try:
+        parameters = parse.parse_qs(query, strict_parsing=True)
+    except ValueError:
+        return None, f'Unable to parse URL {url}'
+
+    v_parameters_list = parameters.get('v')
+    if not v_parameters_list:
+        return None, f'Invalid YouTube URL, missing parameters {url}'
+
+    video_id = v_parameters_list[0]
+    if not VIDEO_ID.match(video_id):
+        return None, f'Invalid YouTube URL, bad video ID {url}'
+
+    return video_id, None